@@ -0,0 +1,93 @@
+"""
+Micro-benchmark of the client side of RedactRequests.write_output_to_file: throughput of iterating the response and
+writing the result file with the default DownloadOptions compared to the previous behaviour (httpx' default
+chunking, default write buffer, no preallocation).
+
+The response body is generated in memory and handed out in chunks of --network-chunk-size bytes (like reads from a
+socket), so the numbers show the overhead of the client rather than the network.
+
+Usage (from the repository root):
+    python -m benchmarks.download_benchmark --size 2 --repeat 3
+"""
+import argparse
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Iterator
+
+import httpx
+
+from redact.commons.download import DownloadOptions, FsyncPolicy
+from redact.v4 import OutputType, RedactRequests, ServiceType
+
+GB = 1024**3
+
+OPTIONS: Dict[str, DownloadOptions] = {
+    "previous": DownloadOptions(chunk_size=None, buffer_size=-1, preallocate=False),
+    "default": DownloadOptions(),
+    "default+fsync": DownloadOptions(fsync=FsyncPolicy.file),
+}
+
+
+def _client(size: int, network_chunk_size: int) -> httpx.Client:
+    block = bytes(range(256)) * (network_chunk_size // 256)
+
+    def body() -> Iterator[bytes]:
+        remaining = size
+        while remaining > 0:
+            chunk = block[:remaining]
+            remaining -= len(chunk)
+            yield chunk
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(
+            200,
+            headers={
+                "Content-Length": str(size),
+                "Content-Disposition": 'attachment; filename="output.mp4"',
+            },
+            content=body(),
+        )
+
+    return httpx.Client(transport=httpx.MockTransport(handler))
+
+
+def run(name: str, size: int, network_chunk_size: int, out_dir: Path) -> float:
+    redact_requests = RedactRequests(
+        httpx_client=_client(size, network_chunk_size),
+        download_options=OPTIONS[name],
+    )
+    start = time.monotonic()
+    result_path = redact_requests.write_output_to_file(
+        service=ServiceType.blur,
+        out_type=OutputType.videos,
+        output_id=uuid.uuid4(),
+        file=out_dir / "output.mp4",
+    )
+    seconds = time.monotonic() - start
+    result_path.unlink()
+    return seconds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--size", type=float, default=1.0, help="Result size in GB")
+    parser.add_argument("--network-chunk-size", type=int, default=64 * 1024)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out-dir", default=None, help="Where to write the results")
+    args = parser.parse_args()
+
+    size = int(args.size * GB)
+    print(f"{'options':>14} {'best time':>10} {'throughput':>12}")
+    with tempfile.TemporaryDirectory(dir=args.out_dir) as out_dir:
+        for name in OPTIONS:
+            seconds = min(
+                run(name, size, args.network_chunk_size, Path(out_dir))
+                for _ in range(args.repeat)
+            )
+            print(f"{name:>14} {seconds:>9.2f}s {size / seconds / 1024**2:>8.1f}MB/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Benchmarks memory (RSS) and throughput of uploading large files with RedactRequests.post_job against the local mock
+server (tests/v4/integration/mock_server.py, started on 127.0.0.1:8787).
+
+The test files are sparse, so they take no disk space and the numbers show the client side (encoding, HTTP) rather
+than the disk.
+
+The mock server is imported from the tests package, so the benchmark needs a checkout of the repository (with the
+test requirements installed) and has to be run from its root; it doesn't work against an installed redact package.
+
+Usage (from the repository root):
+    python -m benchmarks.upload_benchmark --sizes 1 5 20
+    python -m benchmarks.upload_benchmark --sizes 1 --httpx-files  # compare with httpx's multipart encoder
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+import httpx
+
+from redact.v4 import OutputType, RedactRequests, ServiceType
+from tests.v4.integration.mock_server import mock_redact_server
+
+GB = 1024**3
+
+
+def _rss() -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+class _PeakRss:
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak = 0
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self) -> "_PeakRss":
+        self.peak = _rss()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.peak = max(self.peak, _rss())
+
+
+def _upload(redact_requests: RedactRequests, path: Path, httpx_files: bool) -> None:
+    with open(path, "rb") as f:
+        if httpx_files:
+            response = httpx.post(
+                "http://127.0.0.1:8787/blur/v4/videos",
+                files={"file": f},
+                timeout=None,
+            )
+            response.raise_for_status()
+        else:
+            redact_requests.post_job(
+                file=f, service=ServiceType.blur, out_type=OutputType.videos
+            )
+
+
+def run(sizes_gb: List[float], httpx_files: bool) -> List[Tuple[float, int, float]]:
+    results = []
+    redact_requests = RedactRequests(
+        redact_url="http://127.0.0.1:8787", start_job_timeout=3600
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir, mock_redact_server(drain_body=True):
+        for size_gb in sizes_gb:
+            path = Path(tmp_dir) / f"video_{size_gb}gb.mp4"
+            with open(path, "wb") as f:
+                f.truncate(int(size_gb * GB))
+
+            rss_before = _rss()
+            start = time.monotonic()
+            with _PeakRss() as peak_rss:
+                _upload(redact_requests, path, httpx_files=httpx_files)
+            seconds = time.monotonic() - start
+            os.unlink(path)
+
+            results.append((size_gb, peak_rss.peak - rss_before, seconds))
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=float, nargs="+", default=[1, 5, 20])
+    parser.add_argument(
+        "--httpx-files",
+        action="store_true",
+        help="Upload with httpx' files argument instead of post_job",
+    )
+    args = parser.parse_args()
+
+    print(f"{'size':>8} {'peak RSS growth':>16} {'time':>9} {'throughput':>12}")
+    for size_gb, rss_growth, seconds in run(args.sizes, args.httpx_files):
+        throughput = size_gb * GB / seconds / 1024**2
+        print(
+            f"{size_gb:>6.1f}GB {rss_growth / 1024**2:>14.1f}MB {seconds:>8.1f}s {throughput:>8.1f}MB/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,12 @@ Python client for "brighter Redact"
 
 __version__ = "10.1.0"
 
+from .commons.result_buffer import ResultBuffer
+from .commons.result_cache import ResultCache
 from .errors import RedactConnectError, RedactResponseError
+from .v4.async_redact_instance import AsyncRedactInstance
+from .v4.async_redact_job import AsyncRedactJob
+from .v4.async_redact_requests import AsyncRedactRequests
 from .v4.data_models import (
     InputType,
     JobArguments,
@@ -16,9 +21,11 @@ from .v4.data_models import (
     Region,
     ServiceType,
 )
+from .v4.job_batch import BatchJob, JobBatch
 from .v4.redact_instance import RedactInstance
 from .v4.redact_job import RedactJob
 from .v4.redact_requests import RedactRequests
+from .v4.redact_requests_pool import RedactRequestsPool
 from .v4.tools.redact_file import redact_file
 from .v4.tools.redact_folder import redact_folder
 
@@ -36,7 +43,15 @@ __all__ = [
     RedactResponseError,
     Region,
     ServiceType,
+    AsyncRedactInstance,
+    AsyncRedactJob,
+    AsyncRedactRequests,
+    BatchJob,
+    JobBatch,
     RedactInstance,
     RedactJob,
     RedactRequests,
+    RedactRequestsPool,
+    ResultBuffer,
+    ResultCache,
 ]
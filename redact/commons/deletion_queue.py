@@ -0,0 +1,197 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, List, Optional, Tuple
+
+from redact.errors import RedactResponseError
+
+log = logging.getLogger("redact-requests")
+
+
+class _Deletion:
+    def __init__(self, job: Any, on_deleted: Optional[Callable[[], None]]):
+        self.job = job
+        self.on_deleted = on_deleted
+        self.attempts = 0
+
+
+class JobDeletionQueue:
+    """
+    Deletes jobs (anything with a delete() method, e.g. RedactJob of v3 and v4) in the background, so the thread that
+    downloaded a result is free for the next file right away. n_workers threads take up to batch_size queued jobs at
+    a time. A deletion that fails is tried again after retry_delay seconds, doubling with every attempt, up to
+    max_attempts. Jobs that are already gone (404) count as deleted.
+
+    shutdown() (or leaving the queue as context manager) waits until all jobs are deleted, also when it is
+    interrupted by SIGINT (KeyboardInterrupt), so server-side jobs are still cleaned up. A second interrupt while
+    waiting gives up and logs the jobs that are left.
+    """
+
+    def __init__(
+        self,
+        n_workers: int = 2,
+        batch_size: int = 16,
+        max_attempts: int = 3,
+        retry_delay: float = 1.0,
+    ):
+        self.n_workers = n_workers
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.n_deleted = 0
+        self.failed: List[Any] = []
+
+        self._ready: Deque[_Deletion] = deque()
+        self._retries: List[Tuple[float, int, _Deletion]] = []
+        self._counter = itertools.count()
+        self._n_in_progress = 0
+        self._condition = threading.Condition()
+        self._workers: List[threading.Thread] = []
+        self._stopped = False
+
+    def __enter__(self) -> "JobDeletionQueue":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.shutdown()
+
+    @property
+    def n_pending(self) -> int:
+        with self._condition:
+            return len(self._ready) + len(self._retries) + self._n_in_progress
+
+    def put(self, job: Any, on_deleted: Optional[Callable[[], None]] = None) -> None:
+        """
+        Queues job for deletion, on_deleted is called (in a worker thread) once it is deleted.
+        """
+        deletion = _Deletion(job, on_deleted)
+        with self._condition:
+            if not self._stopped:
+                self._start_workers()
+                self._ready.append(deletion)
+                self._condition.notify()
+                return
+        # too late for the workers, one attempt right away
+        deletion.attempts = self.max_attempts - 1
+        self._delete(deletion)
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """
+        Blocks until all queued jobs are deleted (or given up), returns False if timeout seconds passed before.
+        """
+        with self._condition:
+            return self._condition.wait_for(self._is_drained, timeout=timeout)
+
+    def _is_drained(self) -> bool:
+        return not (self._ready or self._retries or self._n_in_progress)
+
+    def shutdown(self, wait: bool = True) -> None:
+        if wait:
+            try:
+                self.drain()
+            except KeyboardInterrupt:
+                log.info(
+                    f"Interrupted, deleting the remaining {self.n_pending} jobs ..."
+                )
+                try:
+                    self.drain()
+                except KeyboardInterrupt:
+                    self._log_leftovers()
+                    raise
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+            workers, self._workers = self._workers, []
+        if wait:
+            for worker in workers:
+                worker.join()
+
+    def _start_workers(self) -> None:
+        while len(self._workers) < self.n_workers:
+            worker = threading.Thread(
+                target=self._run,
+                name=f"redact-job-deletion-{len(self._workers)}",
+                daemon=True,
+            )
+            worker.start()
+            self._workers.append(worker)
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            for deletion in batch:
+                self._delete(deletion)
+            with self._condition:
+                self._n_in_progress -= len(batch)
+                self._condition.notify_all()
+
+    def _next_batch(self) -> Optional[List[_Deletion]]:
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                while self._retries and self._retries[0][0] <= now:
+                    self._ready.append(heapq.heappop(self._retries)[2])
+                if self._ready:
+                    n = min(self.batch_size, len(self._ready))
+                    batch = [self._ready.popleft() for _ in range(n)]
+                    self._n_in_progress += n
+                    return batch
+                if self._stopped:
+                    return None
+                timeout = self._retries[0][0] - now if self._retries else None
+                self._condition.wait(timeout)
+
+    def _delete(self, deletion: _Deletion) -> None:
+        job = deletion.job
+        try:
+            job.delete()
+        except RedactResponseError as e:
+            if e.status_code != 404:
+                self._retry(deletion, e)
+                return
+            log.debug(f"Job {job.output_id} was already deleted")
+        except Exception as e:
+            self._retry(deletion, e)
+            return
+
+        log.debug(f"Deleted job {job.output_id}")
+        with self._condition:
+            self.n_deleted += 1
+        if deletion.on_deleted is not None:
+            try:
+                deletion.on_deleted()
+            except Exception as e:
+                log.warning(f"Callback for deleted job {job.output_id} failed: {e}")
+
+    def _retry(self, deletion: _Deletion, error: Exception) -> None:
+        deletion.attempts += 1
+        if deletion.attempts >= self.max_attempts:
+            log.warning(f"Failed to delete job {deletion.job.output_id}: {error}")
+            with self._condition:
+                self.failed.append(deletion.job)
+            return
+        delay = self.retry_delay * 2 ** (deletion.attempts - 1)
+        log.debug(
+            f"Deleting job {deletion.job.output_id} failed ({error}), retrying after {delay:.2f}s"
+        )
+        with self._condition:
+            heapq.heappush(
+                self._retries,
+                (time.monotonic() + delay, next(self._counter), deletion),
+            )
+            self._condition.notify()
+
+    def _log_leftovers(self) -> None:
+        with self._condition:
+            leftovers = [d.job.output_id for d in self._ready]
+            leftovers += [d.job.output_id for _, _, d in self._retries]
+        if leftovers:
+            output_ids = ", ".join(str(output_id) for output_id in leftovers)
+            log.warning(
+                f"Not waiting for the deletion of {len(leftovers)} queued jobs: {output_ids}"
+            )
@@ -0,0 +1,518 @@
+import logging
+import os
+import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import IO, Any, Callable, Dict, List, Optional, Tuple, Union
+from uuid import UUID
+
+import httpx
+from pydantic import BaseModel
+from strenum import StrEnum
+
+from redact.commons.result_buffer import ResultBuffer
+from redact.commons.utils import fadvise
+from redact.errors import FileDownloadError, RedactResponseError
+from redact.utils import retrieve_file_name
+
+log = logging.getLogger("redact-requests")
+
+_CONTENT_RANGE_RE = re.compile(r"bytes (\d+)-(\d+)/(\d+|\*)")
+
+DEFAULT_MIN_SEGMENT_SIZE = 8 * 1024**2
+
+
+class FsyncPolicy(StrEnum):
+    # leave writing back to the OS
+    none = "none"
+    # the result is on disk before it is renamed to its final name
+    file = "file"
+    # ... and the rename is on disk as well
+    file_and_dir = "file_and_dir"
+
+
+class DownloadOptions(BaseModel):
+    """
+    Tuning of result downloads. chunk_size is the size of the chunks handed out by httpx, None passes on the chunks
+    as they are read from the connection (re-chunking costs a copy of every byte, see benchmarks/download_benchmark).
+    buffer_size is the write buffer of the result file, which merges small reads into fewer writes. With preallocate,
+    the space of the result is reserved up front when its size is known (Content-Length), which avoids fragmentation
+    and failing halfway on a full disk.
+    """
+
+    chunk_size: Optional[int] = None
+    buffer_size: int = 1024**2
+    preallocate: bool = True
+    fsync: FsyncPolicy = FsyncPolicy.none
+
+
+class PartialDownload:
+    """
+    Temp file of a download that survives failed attempts. If the server advertised 'Accept-Ranges: bytes', the next
+    attempt asks for the missing bytes only (with If-Range, so a changed result is downloaded completely). Otherwise,
+    or if the server answers the range request with the whole file, the download starts over.
+    """
+
+    def __init__(self, target_dir: Path, options: Optional[DownloadOptions] = None):
+        self.target_dir = target_dir
+        self.options = options or DownloadOptions()
+        self.path: Optional[Path] = None
+        self.n_bytes = 0
+        self.resumable = False
+        # of the last response with the whole file, 206 responses may lack e.g. Content-Disposition
+        self.headers: httpx.Headers = httpx.Headers()
+        self._validator: Optional[str] = None
+
+    def request_headers(self, headers: Dict[str, str]) -> Dict[str, str]:
+        if not (self.resumable and self.n_bytes):
+            return headers
+        log.debug(f"Resuming download into {self.path} at byte {self.n_bytes}")
+        range_headers = {"Range": f"bytes={self.n_bytes}-"}
+        if self._validator:
+            range_headers["If-Range"] = self._validator
+        return {**headers, **range_headers}
+
+    def open(self, response: httpx.Response) -> IO[bytes]:
+        """
+        Opens the temp file for the body of response, either to continue the partial download (206 response) or from
+        scratch. Raises RangeMismatch if a 206 response doesn't start where the download stopped.
+        """
+        if response.status_code == 206:
+            content_range = parse_content_range(response.headers.get("Content-Range"))
+            if not content_range or content_range[0] != self.n_bytes or not self.path:
+                raise RangeMismatch(response.headers.get("Content-Range"))
+            # not in append mode, the file may be preallocated beyond the bytes written so far
+            f = open(self.path, "r+b", buffering=self.options.buffer_size)
+            f.seek(self.n_bytes)
+            return f
+
+        self.discard()
+        self.headers = response.headers
+        # ranges refer to the encoded body, but httpx hands out the decoded one
+        accept_ranges = response.headers.get("Accept-Ranges", "").lower()
+        encoded = "Content-Encoding" in response.headers
+        self.resumable = accept_ranges == "bytes" and not encoded
+        self._validator = response.headers.get("ETag") or response.headers.get(
+            "Last-Modified"
+        )
+        temp_file = tempfile.NamedTemporaryFile(
+            "wb",
+            buffering=self.options.buffer_size,
+            dir=str(self.target_dir),
+            delete=False,
+        )
+        self.path = Path(temp_file.name)
+        content_length = response.headers.get("Content-Length")
+        if self.options.preallocate and content_length and not encoded:
+            preallocate(temp_file.fileno(), int(content_length))
+        return temp_file
+
+    def iter_bytes(self, response: httpx.Response):
+        return response.iter_bytes(chunk_size=self.options.chunk_size)
+
+    def write(self, f: IO[bytes], chunk: bytes) -> None:
+        f.write(chunk)
+        self.n_bytes += len(chunk)
+
+    def move_to(self, target: Path) -> None:
+        # drop the preallocated space the body didn't fill (e.g. a wrong Content-Length)
+        os.truncate(self.path, self.n_bytes)
+        sync_file(self.path, self.options.fsync)
+        self.path.rename(target)
+        sync_dir(target.parent, self.options.fsync)
+        self.path = None
+        self.n_bytes = 0
+
+    def keep_for_retry(self) -> None:
+        """
+        Called when an attempt failed with a retryable error.
+        """
+        if not self.resumable:
+            self.discard()
+
+    def discard(self) -> None:
+        if self.path is not None:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+        self.path = None
+        self.n_bytes = 0
+
+    def __enter__(self) -> "PartialDownload":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        # a finished download was renamed away before
+        self.discard()
+
+
+class RangeMismatch(Exception):
+    """
+    The server answered a range request with another range than asked for.
+    """
+
+
+def parse_content_range(
+    value: Optional[str],
+) -> Optional[Tuple[int, int, Optional[int]]]:
+    """
+    Returns first byte, last byte and total length (None if unknown) of a Content-Range header.
+    """
+    match = _CONTENT_RANGE_RE.fullmatch((value or "").strip())
+    if not match:
+        return None
+    total = None if match[3] == "*" else int(match[3])
+    return int(match[1]), int(match[2]), total
+
+
+def split_ranges(
+    start: int, total: int, n_segments: int, min_segment_size: int
+) -> List[Tuple[int, int]]:
+    """
+    Splits the bytes from start to total into at most n_segments ranges (first and last byte) of at least
+    min_segment_size bytes.
+    """
+    remaining = total - start
+    if remaining <= 0:
+        return []
+    segment_size = max(min_segment_size, -(-remaining // n_segments))
+    return [
+        (first, min(first + segment_size, total) - 1)
+        for first in range(start, total, segment_size)
+    ]
+
+
+def preallocate(fd: int, size: int) -> None:
+    """
+    Reserves size bytes for the file, so parallel writes at any offset don't fragment it or fail on a full disk
+    halfway.
+    """
+    if hasattr(os, "posix_fallocate"):
+        try:
+            os.posix_fallocate(fd, 0, size)
+            return
+        except OSError:
+            # e.g. not supported by the file system
+            pass
+    os.ftruncate(fd, size)
+
+
+def write_response_at(
+    response: httpx.Response, fd: int, offset: int, chunk_size: Optional[int] = None
+) -> int:
+    """
+    Writes the body of response into the file at offset (pwrite, so several threads can write into one file).
+    Returns the number of bytes written.
+    """
+    n_bytes = 0
+    for chunk in response.iter_bytes(chunk_size=chunk_size):
+        view = memoryview(chunk)
+        while view:
+            written = os.pwrite(fd, view, offset + n_bytes)
+            n_bytes += written
+            view = view[written:]
+    return n_bytes
+
+
+def sync_file(file: Union[Path, int], policy: FsyncPolicy) -> None:
+    """
+    Flushes the written data of file (a path or an open file descriptor) to disk according to policy. The synced
+    pages are dropped from the page cache, results are rarely read again right away.
+    """
+    if policy == FsyncPolicy.none:
+        return
+    fd = file if isinstance(file, int) else os.open(file, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+        fadvise(fd, 0, 0, "POSIX_FADV_DONTNEED")
+    finally:
+        if fd is not file:
+            os.close(fd)
+
+
+def sync_dir(dir: Path, policy: FsyncPolicy) -> None:
+    if policy != FsyncPolicy.file_and_dir:
+        return
+    try:
+        fd = os.open(dir, os.O_RDONLY)
+    except OSError:
+        # e.g. directories can't be opened on Windows
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def read_into_buffer(
+    client: httpx.Client,
+    url: str,
+    params: Dict,
+    headers: Dict[str, str],
+    output_id: UUID,
+    debug_uuid: UUID,
+    max_memory_size: int,
+    chunk_size: Optional[int] = None,
+) -> ResultBuffer:
+    """
+    Downloads the result at url into a ResultBuffer, preallocated from the Content-Length of the response.
+    """
+    with client.stream("GET", url, params=params, headers=headers) as response:
+        if response.status_code != 200:
+            raise RedactResponseError(
+                response=response,
+                msg=f"Error downloading job result for output_id {output_id}, debug_uuid {debug_uuid}: "
+                f"{response.read().decode()}",
+            )
+        content_length = response.headers.get("Content-Length")
+        # the size of a compressed response is not the size of the result
+        expected_size = (
+            int(content_length)
+            if content_length and "Content-Encoding" not in response.headers
+            else None
+        )
+        result_buffer = ResultBuffer(
+            media_type=response.headers["Content-Type"],
+            file_name=retrieve_file_name(headers=response.headers),
+            expected_size=expected_size,
+            max_memory_size=max_memory_size,
+        )
+        try:
+            for chunk in response.iter_bytes(chunk_size=chunk_size):
+                result_buffer.write(chunk)
+            result_buffer.finish()
+        except BaseException:
+            result_buffer.close()
+            raise
+        return result_buffer
+
+
+def stream_to_file(
+    client: httpx.Client,
+    url: str,
+    params: Dict,
+    headers: Dict[str, str],
+    file: Path,
+    partial_download: PartialDownload,
+    output_id: UUID,
+    debug_uuid: UUID,
+) -> Path:
+    """
+    Downloads the result at url into partial_download, continuing where a previous attempt stopped if possible, and
+    moves it next to file, with the suffix of the file name sent by the server. Returns the path of the result.
+    """
+    while True:
+        request_headers = partial_download.request_headers(headers)
+        with client.stream(
+            "GET", url, params=params, headers=request_headers
+        ) as response:
+            if response.status_code == 416 and partial_download.n_bytes:
+                log.debug(f"Range of resumed download not satisfiable: {file}")
+                partial_download.discard()
+                continue
+            if response.status_code not in (200, 206):
+                raise RedactResponseError(
+                    response=response,
+                    msg=f"Error downloading job result for output_id {output_id}, debug_uuid {debug_uuid}: "
+                    f"{response.read().decode()}",
+                )
+            try:
+                temp_file = partial_download.open(response)
+            except RangeMismatch as e:
+                if not partial_download.n_bytes:
+                    raise FileDownloadError(
+                        f"failed to download the file {file}"
+                    ) from e
+                log.debug(f"Unexpected range {e} of resumed download: {file}")
+                partial_download.discard()
+                continue
+
+            try:
+                with temp_file:
+                    for chunk in partial_download.iter_bytes(response):
+                        partial_download.write(temp_file, chunk)
+            except (
+                httpx.NetworkError,
+                httpx.TimeoutException,
+                httpx.ProtocolError,
+            ):
+                # retried by the caller, resuming at the last byte if possible
+                partial_download.keep_for_retry()
+                raise
+            except Exception as e:
+                partial_download.discard()
+                raise FileDownloadError(f"failed to download the file {file}") from e
+
+            file_name = Path(retrieve_file_name(headers=partial_download.headers))
+            log.debug(f"getting headers file type suffix {file_name}")
+            anonymized_path = Path(file).parent / f"{file.stem}{file_name.suffix}"
+            target_file = partial_download.path
+            partial_download.move_to(anonymized_path)
+            log.debug(
+                f"temp file {target_file} has been renamed into {anonymized_path}"
+            )
+            return anonymized_path
+
+
+def write_segmented(
+    client: httpx.Client,
+    url: str,
+    params: Dict,
+    headers: Dict[str, str],
+    file: Path,
+    retry: Callable[..., Any],
+    n_segments: int,
+    min_segment_size: int,
+    options: DownloadOptions,
+    output_id: UUID,
+    debug_uuid: UUID,
+) -> Path:
+    """
+    Downloads the result at url as up to n_segments byte ranges of at least min_segment_size bytes in parallel (the
+    whole result at once if the server doesn't support range requests) and moves it next to file, with the suffix of
+    the file name sent by the server. Each range is requested through retry, which calls its first argument with the
+    others and retries it on network problems (e.g. the retry loop of RedactRequests).
+    """
+    temp_file = tempfile.NamedTemporaryFile("wb", dir=str(file.parent), delete=False)
+    temp_path = Path(temp_file.name)
+    try:
+        with temp_file:
+            fd = temp_file.fileno()
+            # the first segment tells the size of the result and whether the server supports range requests
+            response_headers, total, n_bytes = retry(
+                download_first_segment,
+                client,
+                url,
+                params,
+                headers,
+                fd,
+                min_segment_size,
+                output_id,
+                debug_uuid,
+                chunk_size=options.chunk_size,
+            )
+            ranges = split_ranges(n_bytes, total, n_segments, min_segment_size)
+            if ranges:
+                log.debug(
+                    f"Downloading {total} bytes of output_id {output_id} in {len(ranges) + 1} segments"
+                )
+                with ThreadPoolExecutor(max_workers=n_segments) as executor:
+                    futures = [
+                        executor.submit(
+                            retry,
+                            download_segment,
+                            client,
+                            url,
+                            params,
+                            headers,
+                            fd,
+                            first,
+                            last,
+                            output_id,
+                            debug_uuid,
+                            chunk_size=options.chunk_size,
+                        )
+                        for first, last in ranges
+                    ]
+                    n_bytes += sum(future.result() for future in futures)
+            if n_bytes != total:
+                raise FileDownloadError(
+                    f"failed to download the file {file}: got {n_bytes} of {total} bytes"
+                )
+            sync_file(fd, options.fsync)
+
+        file_name = Path(retrieve_file_name(headers=response_headers))
+        anonymized_path = Path(file).parent / f"{file.stem}{file_name.suffix}"
+        temp_path.rename(anonymized_path)
+        sync_dir(anonymized_path.parent, options.fsync)
+        return anonymized_path
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+
+
+def download_first_segment(
+    client: httpx.Client,
+    url: str,
+    params: Dict,
+    headers: Dict[str, str],
+    fd: int,
+    segment_size: int,
+    output_id: UUID,
+    debug_uuid: UUID,
+    chunk_size: Optional[int] = None,
+) -> Tuple[httpx.Headers, int, int]:
+    """
+    Writes the first segment_size bytes of the result at url into fd. Returns the headers of the response, the total
+    size of the result and the number of bytes written.
+    """
+    # ranges refer to the encoded body, so it must not be compressed
+    headers = {
+        **headers,
+        "Range": f"bytes=0-{segment_size - 1}",
+        "Accept-Encoding": "identity",
+    }
+    with client.stream("GET", url, params=params, headers=headers) as response:
+        if response.status_code not in (200, 206):
+            raise RedactResponseError(
+                response=response,
+                msg=f"Error downloading job result for output_id {output_id}, debug_uuid {debug_uuid}: "
+                f"{response.read().decode()}",
+            )
+        if response.status_code == 200:
+            # no support of range requests, the whole result comes in one piece
+            n_bytes = write_response_at(response, fd, 0, chunk_size=chunk_size)
+            os.ftruncate(fd, n_bytes)
+            return response.headers, n_bytes, n_bytes
+
+        content_range = parse_content_range(response.headers.get("Content-Range"))
+        if content_range is None or content_range[0] != 0 or not content_range[2]:
+            raise FileDownloadError(
+                f"unexpected Content-Range {response.headers.get('Content-Range')} "
+                f"downloading output_id {output_id}"
+            )
+        total = content_range[2]
+        preallocate(fd, total)
+        return (
+            response.headers,
+            total,
+            write_response_at(response, fd, 0, chunk_size=chunk_size),
+        )
+
+
+def download_segment(
+    client: httpx.Client,
+    url: str,
+    params: Dict,
+    headers: Dict[str, str],
+    fd: int,
+    first: int,
+    last: int,
+    output_id: UUID,
+    debug_uuid: UUID,
+    chunk_size: Optional[int] = None,
+) -> int:
+    """
+    Writes the bytes first to last (inclusive) of the result at url into fd. Returns the number of bytes written.
+    """
+    headers = {
+        **headers,
+        "Range": f"bytes={first}-{last}",
+        "Accept-Encoding": "identity",
+    }
+    with client.stream("GET", url, params=params, headers=headers) as response:
+        if response.status_code != 206:
+            raise RedactResponseError(
+                response=response,
+                msg=f"Error downloading bytes {first}-{last} of job result for output_id {output_id}, "
+                f"debug_uuid {debug_uuid}: {response.read().decode()}",
+            )
+        content_range = parse_content_range(response.headers.get("Content-Range"))
+        if content_range is None or content_range[:2] != (first, last):
+            raise FileDownloadError(
+                f"unexpected Content-Range {response.headers.get('Content-Range')} "
+                f"downloading bytes {first}-{last} of output_id {output_id}"
+            )
+        return write_response_at(response, fd, first, chunk_size=chunk_size)
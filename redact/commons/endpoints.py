@@ -0,0 +1,38 @@
+import urllib.parse
+from typing import Optional
+from uuid import UUID
+
+
+class RedactEndpointsMixin:
+    """
+    URLs of the endpoints of the Redact instance at redact_url, for the API_VERSION of the requests class using it
+    (sync or async, v3 or v4).
+    """
+
+    API_VERSION: str
+    redact_url: str
+
+    def _get_job_url(self, service: str, out_type: str) -> str:
+        return urllib.parse.urljoin(
+            self.redact_url, f"{service}/{self.API_VERSION}/{out_type}"
+        )
+
+    def _get_output_url(
+        self,
+        service: str,
+        out_type: str,
+        output_id: UUID,
+        endpoint: Optional[str] = None,
+    ) -> str:
+        url = f"{self._get_job_url(service, out_type)}/{output_id}"
+        return f"{url}/{endpoint}" if endpoint else url
+
+    def _get_output_download_url(
+        self, service: str, out_type: str, output_id: UUID
+    ) -> str:
+        return self._get_output_url(service, out_type, output_id)
+
+    def _get_output_download_query_params(self, ignore_warnings: bool):
+        return {
+            "ignore_warnings": ignore_warnings,
+        }
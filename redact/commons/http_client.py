@@ -0,0 +1,202 @@
+import atexit
+import threading
+from typing import Any, Dict, Optional, Tuple, Union
+
+import httpx
+from httpx._utils import URLPattern, get_environment_proxies
+from pydantic import BaseModel
+
+from redact.utils import normalize_url
+
+# httpx' default
+DEFAULT_TIMEOUT = httpx.Timeout(5.0)
+
+
+class HttpClientOptions(BaseModel):
+    """
+    Transport of the httpx clients talking to Redact. With http2, concurrent requests (e.g. the status checks of many
+    jobs) are multiplexed over a few connections, it needs the optional h2 package (pip install redact[http2]). The
+    connection pool is limited to max_connections, of which max_keepalive_connections are kept open for
+    keepalive_expiry seconds when idle. None means no limit.
+    """
+
+    http2: bool = False
+    max_connections: Optional[int] = 100
+    max_keepalive_connections: Optional[int] = 20
+    keepalive_expiry: Optional[float] = 5.0
+
+    @classmethod
+    def from_settings(cls) -> "HttpClientOptions":
+        from redact.settings import Settings
+
+        settings = Settings()
+        return cls(
+            http2=settings.http2,
+            max_connections=settings.max_connections,
+            max_keepalive_connections=settings.max_keepalive_connections,
+            keepalive_expiry=settings.keepalive_expiry,
+        )
+
+    @property
+    def limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+
+def create_http_client(
+    options: Optional[HttpClientOptions] = None, **kwargs: Any
+) -> httpx.Client:
+    """
+    Creates an httpx.Client with the transport of options (the default options if None), kwargs are passed on.
+    """
+    options = options or get_default_http_client_options()
+    _check_http2_support(options)
+    return httpx.Client(http2=options.http2, limits=options.limits, **kwargs)
+
+
+def create_async_http_client(
+    options: Optional[HttpClientOptions] = None, **kwargs: Any
+) -> httpx.AsyncClient:
+    options = options or get_default_http_client_options()
+    _check_http2_support(options)
+    return httpx.AsyncClient(http2=options.http2, limits=options.limits, **kwargs)
+
+
+def _check_http2_support(options: HttpClientOptions) -> None:
+    if not options.http2:
+        return
+    try:
+        import h2  # noqa: F401
+    except ImportError as e:
+        raise ImportError(
+            "HTTP/2 needs the h2 package, install it with: pip install redact[http2]"
+        ) from e
+
+
+_default_options_lock = threading.Lock()
+_default_options: Optional[HttpClientOptions] = None
+
+
+def get_default_http_client_options() -> HttpClientOptions:
+    """
+    Returns the options of the clients created by redact (v3 and v4), which come from the settings unless they were
+    set with set_default_http_client_options().
+    """
+    global _default_options
+    with _default_options_lock:
+        if _default_options is None:
+            _default_options = HttpClientOptions.from_settings()
+        return _default_options
+
+
+def set_default_http_client_options(options: HttpClientOptions) -> None:
+    """
+    Sets the options of clients created afterwards.
+    """
+    global _default_options
+    with _default_options_lock:
+        _default_options = options
+
+
+class HttpClientRegistry:
+    """
+    httpx clients by Redact node: every base URL (scheme, host and port) gets its own connection pool, sized by the
+    HttpClientOptions it was asked for with. Clients with different timeouts (e.g. of v3 and v4) share the pool of a
+    node. Like httpx.Client, the pool of a node goes through the proxy of the environment (HTTPS_PROXY, HTTP_PROXY,
+    ALL_PROXY and NO_PROXY) that applies to it. close() closes all pools, the registry of get_http_client() is closed
+    at exit.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._transports: Dict[Tuple, httpx.HTTPTransport] = {}
+        self._clients: Dict[Tuple, httpx.Client] = {}
+
+    def get(
+        self,
+        base_url: str,
+        options: Optional[HttpClientOptions] = None,
+        timeout: Union[None, float, httpx.Timeout] = DEFAULT_TIMEOUT,
+    ) -> httpx.Client:
+        options = options or get_default_http_client_options()
+        proxy = _environment_proxy(base_url)
+        pool_key = (_origin(base_url), proxy, *sorted(options.dict().items()))
+        client_key = (*pool_key, *sorted(httpx.Timeout(timeout).as_dict().items()))
+        with self._lock:
+            client = self._clients.get(client_key)
+            if client is None:
+                transport = self._transports.get(pool_key)
+                if transport is None:
+                    _check_http2_support(options)
+                    transport = httpx.HTTPTransport(
+                        http2=options.http2,
+                        limits=options.limits,
+                        proxy=httpx.Proxy(proxy) if proxy else None,
+                    )
+                    self._transports[pool_key] = transport
+                client = httpx.Client(transport=transport, timeout=timeout)
+                self._clients[client_key] = client
+            return client
+
+    def close(self) -> None:
+        with self._lock:
+            clients = list(self._clients.values())
+            transports = list(self._transports.values())
+            self._clients.clear()
+            self._transports.clear()
+        for client in clients:
+            client.close()
+        # in case a client was closed before
+        for transport in transports:
+            transport.close()
+
+
+def _origin(base_url: str) -> Tuple[str, str, Optional[int]]:
+    url = httpx.URL(normalize_url(base_url))
+    default_port = {"http": 80, "https": 443}.get(url.scheme)
+    return url.scheme, url.host, url.port or default_port
+
+
+def _environment_proxy(base_url: str) -> Optional[str]:
+    """
+    The proxy httpx.Client would use for base_url, None for direct connections.
+    """
+    url = httpx.URL(normalize_url(base_url))
+    # the most specific pattern wins, like the proxy mounts of httpx.Client
+    patterns = sorted(
+        (
+            (URLPattern(pattern), proxy)
+            for pattern, proxy in get_environment_proxies().items()
+        ),
+        key=lambda item: item[0],
+    )
+    for pattern, proxy in patterns:
+        if pattern.matches(url):
+            return proxy
+    return None
+
+
+_registry = HttpClientRegistry()
+atexit.register(_registry.close)
+
+
+def get_http_client(
+    base_url: str,
+    options: Optional[HttpClientOptions] = None,
+    timeout: Union[None, float, httpx.Timeout] = DEFAULT_TIMEOUT,
+) -> httpx.Client:
+    """
+    Returns the shared client for the Redact instance at base_url, with its own connection pool per instance. options
+    default to get_default_http_client_options().
+    """
+    return _registry.get(base_url, options=options, timeout=timeout)
+
+
+def close_http_clients() -> None:
+    """
+    Closes the clients of get_http_client() and their connections, clients asked for afterwards are created anew.
+    """
+    _registry.close()
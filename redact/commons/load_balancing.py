@@ -0,0 +1,211 @@
+import itertools
+import threading
+import time
+from typing import Any, Dict, Optional, Sequence
+from uuid import UUID
+
+from strenum import StrEnum
+
+
+class LoadBalancingPolicyType(StrEnum):
+    round_robin = "round_robin"
+    least_outstanding = "least_outstanding"
+    eta_aware = "eta_aware"
+
+
+class RedactNode:
+    """
+    One Redact instance of a pool with the jobs it is working on and its health.
+
+    A node is ejected for ejection_time seconds after max_failures consecutive failures (connection errors or 5xx
+    responses). Every further ejection doubles the time, up to max_ejection_time, until a request succeeds again.
+    """
+
+    def __init__(
+        self,
+        redact_requests: Any,
+        max_failures: int = 3,
+        ejection_time: float = 10.0,
+        max_ejection_time: float = 300.0,
+        default_job_duration: float = 60.0,
+    ):
+        self.redact_requests = redact_requests
+        self.max_failures = max_failures
+        self.ejection_time = ejection_time
+        self.max_ejection_time = max_ejection_time
+        self.ejected_until = 0.0
+        self.n_ejections = 0
+        self.n_failures = 0
+        # set when ejected, the node gets a health check before it is used again
+        self.health_check_due = False
+        # jobs started on the node, with their time of upload and last estimated_time_to_completion
+        self._jobs: Dict[UUID, _NodeJob] = {}
+        self._n_uploads = 0
+        # moving average of the time from upload to the end of a job, for jobs without estimate
+        self.job_duration = default_job_duration
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return self.redact_requests.redact_url
+
+    @property
+    def outstanding_jobs(self) -> int:
+        """
+        Uploads in progress and jobs that were not seen finished yet.
+        """
+        with self._lock:
+            return self._n_uploads + sum(job.running for job in self._jobs.values())
+
+    def expected_load(self) -> float:
+        """
+        Seconds of work the node has left, from the estimates of the server where known.
+        """
+        now = time.monotonic()
+        with self._lock:
+            load = self._n_uploads * self.job_duration
+            for job in self._jobs.values():
+                if not job.running:
+                    continue
+                if job.eta is not None:
+                    load += max(0.0, job.eta - (now - job.eta_time))
+                else:
+                    load += max(0.0, self.job_duration - (now - job.start_time))
+            return load
+
+    def is_ejected(self, now: Optional[float] = None) -> bool:
+        return (now or time.monotonic()) < self.ejected_until
+
+    def upload_started(self) -> None:
+        with self._lock:
+            self._n_uploads += 1
+
+    def upload_finished(self, output_id: Optional[UUID]) -> None:
+        """
+        Called after every upload, output_id is None if it failed.
+        """
+        with self._lock:
+            self._n_uploads -= 1
+            if output_id is not None:
+                self._jobs[output_id] = _NodeJob(time.monotonic())
+
+    def job_status(
+        self, output_id: UUID, running: bool, eta: Optional[float] = None
+    ) -> None:
+        now = time.monotonic()
+        with self._lock:
+            job = self._jobs.get(output_id)
+            if job is None or not job.running:
+                return
+            job.eta, job.eta_time = eta, now
+            if not running:
+                job.running = False
+                self.job_duration = 0.8 * self.job_duration + 0.2 * (
+                    now - job.start_time
+                )
+
+    def job_deleted(self, output_id: UUID) -> None:
+        with self._lock:
+            self._jobs.pop(output_id, None)
+
+    def job_done(self, output_id: UUID) -> None:
+        """
+        Called once the result of a job was downloaded. The node forgets the job, which also covers jobs whose end
+        it didn't see (e.g. completed by a status webhook) and jobs that are never deleted.
+        """
+        self.job_status(output_id, running=False)
+        self.job_deleted(output_id)
+
+    def succeeded(self) -> None:
+        with self._lock:
+            self.n_failures = 0
+            self.n_ejections = 0
+
+    def failed(self) -> bool:
+        """
+        Returns whether the node was ejected by this failure.
+        """
+        with self._lock:
+            self.n_failures += 1
+            if self.n_failures < self.max_failures:
+                return False
+            self.eject()
+            return True
+
+    def eject(self) -> None:
+        self.ejected_until = time.monotonic() + min(
+            self.ejection_time * 2**self.n_ejections, self.max_ejection_time
+        )
+        self.n_ejections += 1
+        self.health_check_due = True
+        # one more failure after re-admission ejects the node again
+        self.n_failures = self.max_failures - 1
+
+
+class _NodeJob:
+    def __init__(self, start_time: float):
+        self.start_time = start_time
+        self.running = True
+        self.eta: Optional[float] = None
+        self.eta_time = start_time
+
+
+class LoadBalancingPolicy:
+    """
+    Decides which node of a pool gets the next job.
+    """
+
+    def choose(self, nodes: Sequence[RedactNode]) -> RedactNode:
+        """
+        Returns one of nodes, which is never empty.
+        """
+        raise NotImplementedError
+
+
+class RoundRobinPolicy(LoadBalancingPolicy):
+    def __init__(self):
+        self._counter = itertools.count()
+
+    def choose(self, nodes: Sequence[RedactNode]) -> RedactNode:
+        return nodes[next(self._counter) % len(nodes)]
+
+
+class LeastOutstandingPolicy(LoadBalancingPolicy):
+    """
+    Chooses the node with the fewest uploads and unfinished jobs, ties are broken round-robin.
+    """
+
+    def __init__(self):
+        self._counter = itertools.count()
+
+    def choose(self, nodes: Sequence[RedactNode]) -> RedactNode:
+        offset = next(self._counter)
+        rotated = [nodes[(offset + i) % len(nodes)] for i in range(len(nodes))]
+        return min(rotated, key=lambda node: node.outstanding_jobs)
+
+
+class EtaAwarePolicy(LoadBalancingPolicy):
+    """
+    Chooses the node that will be done with its jobs first, according to the estimated_time_to_completion of the job
+    statuses (or the average duration of the node's jobs, for jobs without estimate).
+    """
+
+    def __init__(self):
+        self._counter = itertools.count()
+
+    def choose(self, nodes: Sequence[RedactNode]) -> RedactNode:
+        offset = next(self._counter)
+        rotated = [nodes[(offset + i) % len(nodes)] for i in range(len(nodes))]
+        return min(rotated, key=lambda node: node.expected_load())
+
+
+def create_load_balancing_policy(
+    policy_type: LoadBalancingPolicyType,
+) -> LoadBalancingPolicy:
+    if policy_type == LoadBalancingPolicyType.round_robin:
+        return RoundRobinPolicy()
+    if policy_type == LoadBalancingPolicyType.least_outstanding:
+        return LeastOutstandingPolicy()
+    if policy_type == LoadBalancingPolicyType.eta_aware:
+        return EtaAwarePolicy()
+    raise ValueError(f"Unsupported load balancing policy {policy_type}.")
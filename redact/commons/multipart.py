@@ -0,0 +1,159 @@
+import asyncio
+import mimetypes
+import os
+import re
+from pathlib import Path
+from typing import (
+    IO,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from redact.commons.utils import fadvise
+
+# bytes_sent, total_bytes
+ProgressCallback = Callable[[int, int], None]
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+# same escaping of form parameters as httpx (HTML5 form encoding)
+_FORM_PARAM_REPLACEMENTS = {'"': "%22", "\\": "\\\\"}
+_FORM_PARAM_REPLACEMENTS.update(
+    {chr(c): f"%{c:02X}" for c in range(0x1F + 1) if c != 0x1B}
+)
+_FORM_PARAM_RE = re.compile(
+    "|".join(re.escape(c) for c in _FORM_PARAM_REPLACEMENTS.keys())
+)
+
+
+class StreamingMultipartBody:
+    """
+    multipart/form-data request body that streams its files in chunks of chunk_size instead of loading them, so the
+    memory used by an upload does not depend on the size of the file. The length of the body is known up front and
+    sent as Content-Length. The parts are encoded like httpx does for its files argument.
+
+    The body can be iterated several times (e.g. when a request is retried), every iteration starts at the beginning
+    of the files. progress_callback is called with the number of bytes sent so far and the total number of bytes.
+    """
+
+    def __init__(
+        self,
+        files: Dict[str, Union[IO[bytes], bytes]],
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        progress_callback: Optional[ProgressCallback] = None,
+        boundary: Optional[bytes] = None,
+    ):
+        self.boundary = boundary or os.urandom(16).hex().encode("ascii")
+        self.chunk_size = chunk_size
+        self.progress_callback = progress_callback
+        self._parts: List[Tuple[bytes, Union[IO[bytes], bytes], int]] = [
+            (self._render_part_headers(name, value), value, _content_length(value))
+            for name, value in files.items()
+        ]
+        self._closing = b"--%s--\r\n" % self.boundary
+        self._length = len(self._closing) + sum(
+            len(headers) + length + 2 for headers, _, length in self._parts
+        )
+
+    def __len__(self) -> int:
+        return self._length
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {
+            "Content-Type": f"multipart/form-data; boundary={self.boundary.decode('ascii')}",
+            "Content-Length": str(self._length),
+        }
+
+    def __iter__(self) -> Iterator[bytes]:
+        bytes_sent = 0
+        for headers, value, _ in self._parts:
+            for chunk in self._iter_part(headers, value):
+                bytes_sent += len(chunk)
+                yield chunk
+                if self.progress_callback is not None:
+                    self.progress_callback(bytes_sent, self._length)
+        yield self._closing
+        if self.progress_callback is not None:
+            self.progress_callback(self._length, self._length)
+
+    async def aiter_bytes(self) -> AsyncIterator[bytes]:
+        """
+        The body for an httpx.AsyncClient. The files are read in the default executor of the running event loop, so
+        reading them doesn't block the loop. Like iterating the body, every call starts at the beginning.
+        """
+        loop = asyncio.get_running_loop()
+        chunks = iter(self)
+        while True:
+            chunk = await loop.run_in_executor(None, next, chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+
+    def _iter_part(self, headers: bytes, value: Union[IO[bytes], bytes]):
+        yield headers
+        if isinstance(value, bytes):
+            if value:
+                yield value
+        else:
+            yield from _iter_file(value, self.chunk_size)
+        yield b"\r\n"
+
+    def _render_part_headers(self, name: str, value: Union[IO[bytes], bytes]) -> bytes:
+        filename = Path(str(getattr(value, "name", "upload"))).name
+        content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        parts = [
+            b"--%s\r\n" % self.boundary,
+            b"Content-Disposition: form-data; ",
+            _format_form_param("name", name),
+            b"; ",
+            _format_form_param("filename", filename),
+            f"\r\nContent-Type: {content_type}\r\n\r\n".encode(),
+        ]
+        return b"".join(parts)
+
+
+def _format_form_param(name: str, value: str) -> bytes:
+    value = _FORM_PARAM_RE.sub(lambda match: _FORM_PARAM_REPLACEMENTS[match[0]], value)
+    return f'{name}="{value}"'.encode()
+
+
+def _content_length(value: Union[IO[bytes], bytes]) -> int:
+    if isinstance(value, bytes):
+        return len(value)
+    try:
+        return os.fstat(value.fileno()).st_size
+    except (AttributeError, OSError):
+        # e.g. BytesIO
+        value.seek(0, os.SEEK_END)
+        length = value.tell()
+        value.seek(0)
+        return length
+
+
+def _iter_file(file: IO[bytes], chunk_size: int) -> Iterator[bytes]:
+    file.seek(0)
+    fd = _fileno(file)
+    fadvise(fd, 0, 0, "POSIX_FADV_SEQUENTIAL")
+    offset = 0
+    while True:
+        # let the kernel read the next chunk while this one is sent
+        fadvise(fd, offset + chunk_size, chunk_size, "POSIX_FADV_WILLNEED")
+        chunk = file.read(chunk_size)
+        if not chunk:
+            return
+        offset += len(chunk)
+        yield chunk
+
+
+def _fileno(file: IO[bytes]) -> Optional[int]:
+    try:
+        return file.fileno()
+    except (AttributeError, OSError):
+        return None
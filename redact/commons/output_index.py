@@ -0,0 +1,173 @@
+import logging
+import os
+import re
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, Optional, Set, Tuple, Union
+
+from redact.commons.utils import iter_files_in_dir
+
+log = logging.getLogger()
+
+# partial downloads of tempfile.NamedTemporaryFile next to the outputs
+_TEMP_FILE_NAME = re.compile(r"tmp[a-z0-9_]{8}")
+
+
+class OutputIndex:
+    """
+    The outputs in an output directory, listed once up front instead of checking every output path on its own.
+
+    An input is processed already if an output with its relative path exists. With match_stems, for output types
+    whose suffix is taken from the file name the server sends (e.g. an mp4 result of an avi input), an output with
+    the same folder and stem counts as well: input_dir/a/b.avi is processed already if output_dir/a/b.mp4 exists.
+    This is only done for inputs whose stem is unique among the inputs (files accepted by input_filter) in their
+    folder of input_dir, if given, as the outputs of a.jpg and a.png can't be told apart.
+
+    Hidden files (like the job journal) and partial downloads are no outputs.
+    """
+
+    def __init__(
+        self,
+        dir: Union[str, Path],
+        outputs: Iterable[str] = (),
+        match_stems: bool = True,
+        input_dir: Optional[Union[str, Path]] = None,
+        input_filter: Optional[Callable[[str], bool]] = None,
+    ):
+        self.dir = Path(dir)
+        self.match_stems = match_stems
+        self.input_dir = Path(input_dir) if input_dir is not None else None
+        self.input_filter = input_filter
+        # names of the outputs by folder (relative to dir) and stem
+        self._names: Dict[str, Dict[str, Set[str]]] = {}
+        self._dirs: Set[str] = set()
+        # stems that occur more than once in a folder of input_dir, by folder
+        self._ambiguous_input_stems: Dict[str, Set[str]] = {}
+        self._warned: Set[Tuple[str, str]] = set()
+        for output in outputs:
+            self._add(output)
+
+    @classmethod
+    def scan(
+        cls,
+        dir: Union[str, Path],
+        n_workers: int = 1,
+        match_stems: bool = True,
+        input_dir: Optional[Union[str, Path]] = None,
+        input_filter: Optional[Callable[[str], bool]] = None,
+    ) -> "OutputIndex":
+        """
+        Indexes the outputs in dir (and its subfolders), in one walk of the tree.
+        """
+        dir = Path(dir)
+        outputs = (
+            os.path.relpath(path, dir)
+            for path in iter_files_in_dir(dir, n_workers=n_workers)
+            if _is_output(os.path.basename(path))
+        )
+        index = cls(
+            dir,
+            outputs,
+            match_stems=match_stems,
+            input_dir=input_dir,
+            input_filter=input_filter,
+        )
+        log.debug(f"Found {len(index)} existing outputs in {dir}")
+        return index
+
+    def __len__(self) -> int:
+        return sum(
+            len(names) for stems in self._names.values() for names in stems.values()
+        )
+
+    def __contains__(self, relative_path: Union[str, Path]) -> bool:
+        folder, stem, name = _key(relative_path)
+        names = self._names.get(folder, {}).get(stem, ())
+        if name in names:
+            return True
+        if not names or not self.match_stems:
+            return False
+        if stem in self._input_stems_in_conflict(folder):
+            if (folder, stem) not in self._warned:
+                self._warned.add((folder, stem))
+                log.warning(
+                    f"Not skipping {relative_path}: an output with its stem exists, but several inputs in "
+                    f"{folder or '.'} have this stem"
+                )
+            return False
+        return True
+
+    def filter_missing(
+        self,
+        relative_paths: Iterable[Path],
+        create_dirs: bool = True,
+        refresh: bool = False,
+    ) -> Iterator[Path]:
+        """
+        Lazily yields the relative_paths without an output. With create_dirs, the output folders of the yielded paths
+        are created, once per folder. With refresh (e.g. while watching a folder), the output folder of a path is
+        listed again before it is yielded, so outputs written since the scan are found.
+        """
+        for relative_path in relative_paths:
+            exists = relative_path in self
+            if not exists and refresh:
+                self._rescan(os.path.dirname(os.path.normpath(relative_path)))
+                exists = relative_path in self
+            if exists:
+                log.debug(f"Skipping because output already exists: {relative_path}")
+                continue
+            if create_dirs:
+                self._make_dir(os.path.dirname(relative_path))
+            yield relative_path
+
+    def _add(self, relative_path: str) -> None:
+        folder, stem, name = _key(relative_path)
+        self._names.setdefault(folder, {}).setdefault(stem, set()).add(name)
+        while folder not in self._dirs:
+            self._dirs.add(folder)
+            folder = os.path.dirname(folder)
+
+    def _rescan(self, folder: str) -> None:
+        try:
+            with os.scandir(self.dir / folder) as entries:
+                for entry in entries:
+                    if entry.is_file() and _is_output(entry.name):
+                        self._add(os.path.join(folder, entry.name))
+        except FileNotFoundError:
+            pass
+        self._ambiguous_input_stems.pop(folder, None)
+
+    def _input_stems_in_conflict(self, folder: str) -> Set[str]:
+        if self.input_dir is None:
+            return set()
+        if folder not in self._ambiguous_input_stems:
+            seen: Set[str] = set()
+            ambiguous: Set[str] = set()
+            try:
+                with os.scandir(self.input_dir / folder) as entries:
+                    for entry in entries:
+                        if entry.name.startswith(".") or not entry.is_file():
+                            continue
+                        if self.input_filter and not self.input_filter(entry.name):
+                            continue
+                        stem = os.path.splitext(entry.name)[0]
+                        (ambiguous if stem in seen else seen).add(stem)
+            except FileNotFoundError:
+                pass
+            self._ambiguous_input_stems[folder] = ambiguous
+        return self._ambiguous_input_stems[folder]
+
+    def _make_dir(self, folder: str) -> None:
+        if folder in self._dirs:
+            return
+        (self.dir / folder).mkdir(parents=True, exist_ok=True)
+        self._dirs.add(folder)
+
+
+def _is_output(name: str) -> bool:
+    return not name.startswith(".") and not _TEMP_FILE_NAME.fullmatch(name)
+
+
+def _key(relative_path: Union[str, Path]) -> Tuple[str, str, str]:
+    folder, name = os.path.split(os.path.normpath(relative_path))
+    stem, _ = os.path.splitext(name)
+    return folder, stem, name
@@ -0,0 +1,156 @@
+import random
+from typing import Any, Optional
+
+from strenum import StrEnum
+
+
+class PollingStrategyType(StrEnum):
+    fixed = "fixed"
+    backoff = "backoff"
+    adaptive = "adaptive"
+
+
+class PollingStrategy:
+    """
+    Decides how long to wait before the next status request of a running job.
+
+    Job statuses are expected to provide 'progress' and 'estimated_time_to_completion' (both may be None), which is
+    the case for the JobStatus models of all API versions.
+    """
+
+    def first_interval(self) -> float:
+        raise NotImplementedError
+
+    def next_interval(
+        self,
+        last_interval: float,
+        job_status: Any,
+        previous_job_status: Optional[Any] = None,
+    ) -> float:
+        """
+        Returns the seconds to wait after job_status was received. last_interval is the time that passed since
+        previous_job_status (if any) was received.
+        """
+        raise NotImplementedError
+
+
+class FixedPollingStrategy(PollingStrategy):
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+
+    def first_interval(self) -> float:
+        return self.interval
+
+    def next_interval(
+        self,
+        last_interval: float,
+        job_status: Any,
+        previous_job_status: Optional[Any] = None,
+    ) -> float:
+        return self.interval
+
+
+class BackoffPollingStrategy(PollingStrategy):
+    """
+    Starts with the given interval and multiplies it by factor after each status request, up to max_interval.
+    """
+
+    def __init__(
+        self, interval: float = 0.5, factor: float = 1.5, max_interval: float = 30.0
+    ):
+        self.interval = interval
+        self.factor = factor
+        self.max_interval = max_interval
+
+    def first_interval(self) -> float:
+        return self.interval
+
+    def next_interval(
+        self,
+        last_interval: float,
+        job_status: Any,
+        previous_job_status: Optional[Any] = None,
+    ) -> float:
+        return min(last_interval * self.factor, self.max_interval)
+
+
+class AdaptivePollingStrategy(PollingStrategy):
+    """
+    Schedules the next status request from the remaining time of the job, taken from the server's
+    estimated_time_to_completion or, if that is missing, extrapolated from the observed progress rate.
+
+    The job is checked again after a fraction of the expected remaining time, so the last request ends up close to
+    the actual completion. Without any estimate the interval grows by backoff_factor. Intervals are clamped to
+    [min_interval, max_interval] and randomized by +/- jitter (relative) to spread the requests of many jobs.
+    """
+
+    def __init__(
+        self,
+        min_interval: float = 0.5,
+        max_interval: float = 30.0,
+        remaining_time_fraction: float = 0.5,
+        backoff_factor: float = 1.5,
+        jitter: float = 0.1,
+    ):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.remaining_time_fraction = remaining_time_fraction
+        self.backoff_factor = backoff_factor
+        self.jitter = jitter
+
+    def first_interval(self) -> float:
+        return self._randomize(self.min_interval)
+
+    def next_interval(
+        self,
+        last_interval: float,
+        job_status: Any,
+        previous_job_status: Optional[Any] = None,
+    ) -> float:
+        remaining_time = self.estimate_remaining_time(
+            last_interval, job_status, previous_job_status
+        )
+        if remaining_time is None:
+            interval = last_interval * self.backoff_factor
+        else:
+            interval = remaining_time * self.remaining_time_fraction
+        return self._randomize(interval)
+
+    @staticmethod
+    def estimate_remaining_time(
+        last_interval: float, job_status: Any, previous_job_status: Optional[Any]
+    ) -> Optional[float]:
+        if job_status.estimated_time_to_completion is not None:
+            return max(job_status.estimated_time_to_completion, 0)
+
+        if previous_job_status is None or last_interval <= 0:
+            return None
+        if job_status.progress is None or previous_job_status.progress is None:
+            return None
+
+        progress_delta = job_status.progress - previous_job_status.progress
+        progress_rate = progress_delta / last_interval
+        if progress_rate <= 0:
+            return None
+        return (1 - job_status.progress) / progress_rate
+
+    def _randomize(self, interval: float) -> float:
+        interval = min(max(interval, self.min_interval), self.max_interval)
+        interval *= 1 + random.uniform(-self.jitter, self.jitter)
+        return min(max(interval, self.min_interval), self.max_interval)
+
+
+def create_polling_strategy(
+    polling_strategy_type: PollingStrategyType, interval: float = 0.5
+) -> PollingStrategy:
+    """
+    Creates a polling strategy. interval is the fixed or the initial backoff interval, respectively. The adaptive
+    strategy derives its intervals from the job status and always uses its default bounds.
+    """
+    if polling_strategy_type == PollingStrategyType.fixed:
+        return FixedPollingStrategy(interval=interval)
+    if polling_strategy_type == PollingStrategyType.backoff:
+        return BackoffPollingStrategy(interval=interval)
+    if polling_strategy_type == PollingStrategyType.adaptive:
+        return AdaptivePollingStrategy()
+    raise ValueError(f"Unsupported polling strategy {polling_strategy_type}.")
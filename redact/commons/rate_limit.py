@@ -0,0 +1,202 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+from strenum import StrEnum
+
+log = logging.getLogger("redact-requests")
+
+
+class EndpointClass(StrEnum):
+    post = "post"
+    status = "status"
+    download = "download"
+    delete = "delete"
+
+
+class RateLimiter:
+    """
+    Client-side token-bucket rate limiter for the requests to Redact, with one bucket per endpoint class. rates are
+    the allowed requests per second of an endpoint class, classes without rate are not limited. A bucket holds the
+    tokens of burst seconds (at least one token). Requests reserve their token right away and sleep until it is
+    due, so waiting requests are served in order.
+    """
+
+    def __init__(
+        self,
+        rates: Optional[Dict[EndpointClass, float]] = None,
+        burst: float = 1.0,
+    ):
+        self.rates: Dict[EndpointClass, float] = {}
+        for endpoint_class, rate in (rates or {}).items():
+            if rate is None:
+                continue
+            if rate <= 0:
+                raise ValueError(
+                    f"The rate limit of {endpoint_class} must be positive, got {rate}."
+                )
+            self.rates[EndpointClass(endpoint_class)] = float(rate)
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, List[float]] = {}
+
+    def acquire(self, endpoint_class: EndpointClass) -> float:
+        """
+        Blocks until a request of endpoint_class may be sent. Returns the seconds waited.
+        """
+        delay = self._reserve_token(endpoint_class)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    async def async_acquire(self, endpoint_class: EndpointClass) -> float:
+        """
+        Like acquire(), but waits without blocking the event loop.
+        """
+        delay = self._reserve_token(endpoint_class)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+    def _reserve_token(self, endpoint_class: EndpointClass) -> float:
+        rate = self.rates.get(endpoint_class)
+        if rate is None:
+            return 0.0
+        delay = self._reserve(endpoint_class, rate, max(1.0, rate * self.burst))
+        if delay > 0:
+            log.debug(f"Rate limit of {endpoint_class} requests, waiting {delay:.2f}s")
+        return delay
+
+    def _reserve(self, endpoint_class: EndpointClass, rate: float, capacity: float):
+        with self._lock:
+            return _reserve_token(
+                self._buckets, endpoint_class, rate, capacity, time.monotonic()
+            )
+
+
+class FileRateLimiter(RateLimiter):
+    """
+    RateLimiter whose buckets are kept in state_file, so all local processes using the same file share one budget
+    (e.g. several workers with the same API key). Access to the file is serialized with an exclusive flock.
+    """
+
+    def __init__(
+        self,
+        state_file: Union[str, Path],
+        rates: Optional[Dict[EndpointClass, float]] = None,
+        burst: float = 1.0,
+    ):
+        try:
+            import fcntl  # noqa: F401
+        except ImportError as e:
+            raise ValueError(
+                "Sharing rate limits between processes is only supported on POSIX systems."
+            ) from e
+        super().__init__(rates=rates, burst=burst)
+        self.state_file = Path(state_file).expanduser()
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+
+    def _reserve(self, endpoint_class: EndpointClass, rate: float, capacity: float):
+        import fcntl
+
+        with self._lock:
+            fd = os.open(self.state_file, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                with os.fdopen(os.dup(fd), "r+") as f:
+                    buckets = _load_buckets(f.read())
+                    # the wall clock, monotonic clocks are not comparable between processes
+                    delay = _reserve_token(
+                        buckets, endpoint_class, rate, capacity, time.time()
+                    )
+                    f.seek(0)
+                    f.truncate()
+                    f.write(json.dumps(buckets))
+                return delay
+            finally:
+                os.close(fd)
+
+
+def _load_buckets(content: str) -> Dict[str, List[float]]:
+    try:
+        buckets = json.loads(content)
+    except ValueError:
+        return {}
+    return buckets if isinstance(buckets, dict) else {}
+
+
+def _reserve_token(
+    buckets: Dict[str, List[float]],
+    key: str,
+    rate: float,
+    capacity: float,
+    now: float,
+) -> float:
+    # tokens may become negative, that's the debt of the requests waiting for their token
+    tokens, updated = buckets.get(key, (capacity, now))
+    tokens = min(capacity, tokens + max(0.0, now - updated) * rate) - 1
+    buckets[key] = [tokens, now]
+    return max(0.0, -tokens / rate)
+
+
+def create_rate_limiter(
+    rates: Dict[EndpointClass, Optional[float]], state_file: Optional[str] = None
+) -> RateLimiter:
+    if state_file:
+        return FileRateLimiter(state_file, rates=rates)
+    return RateLimiter(rates=rates)
+
+
+def parse_rate_limits(rate_limits: List[str]) -> Dict[EndpointClass, float]:
+    """
+    Parses rate limits in the format endpoint_class=requests_per_second, e.g. ["post=0.5", "status=10"].
+    """
+    rates = {}
+    for item in rate_limits:
+        endpoint_class, _, rate = item.partition("=")
+        try:
+            rates[EndpointClass(endpoint_class.strip())] = float(rate)
+        except ValueError as e:
+            raise ValueError(
+                f"Invalid rate limit: {item}. Expected format: "
+                f"{'|'.join(EndpointClass)}=REQUESTS_PER_SECOND"
+            ) from e
+    return rates
+
+
+_default_rate_limiter_lock = threading.Lock()
+_default_rate_limiter: Optional[RateLimiter] = None
+
+
+def get_default_rate_limiter() -> RateLimiter:
+    """
+    Returns the rate limiter shared by all RedactRequests (v3 and v4) of the process that don't get their own one. It
+    is created from the settings unless it was set with set_default_rate_limiter().
+    """
+    global _default_rate_limiter
+    with _default_rate_limiter_lock:
+        if _default_rate_limiter is None:
+            from redact.settings import Settings
+
+            settings = Settings()
+            _default_rate_limiter = create_rate_limiter(
+                rates={
+                    EndpointClass.post: settings.rate_limit_post,
+                    EndpointClass.status: settings.rate_limit_status,
+                    EndpointClass.download: settings.rate_limit_download,
+                    EndpointClass.delete: settings.rate_limit_delete,
+                },
+                state_file=settings.rate_limit_file,
+            )
+        return _default_rate_limiter
+
+
+def set_default_rate_limiter(rate_limiter: RateLimiter) -> None:
+    global _default_rate_limiter
+    with _default_rate_limiter_lock:
+        _default_rate_limiter = rate_limiter
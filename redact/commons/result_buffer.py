@@ -0,0 +1,154 @@
+import io
+import mmap
+import os
+import tempfile
+from pathlib import Path
+from typing import IO, Optional
+
+DEFAULT_MAX_MEMORY_SIZE = 256 * 1024**2
+
+
+class ResultBuffer:
+    """
+    Job result read into one buffer without further copies: memory preallocated from the Content-Length of the
+    response, or a temp file once the result is larger than max_memory_size ("spilled"). view() gives zero-copy access
+    as memoryview, open() a file object reading the result.
+
+    Close the buffer (or use it as context manager) to free the memory or remove the temp file. Views of a spilled
+    result must be released before.
+    """
+
+    def __init__(
+        self,
+        media_type: str,
+        file_name: str,
+        expected_size: Optional[int] = None,
+        max_memory_size: int = DEFAULT_MAX_MEMORY_SIZE,
+        temp_dir: Optional[str] = None,
+    ):
+        self.media_type = media_type
+        self.file_name = file_name
+        self.max_memory_size = max_memory_size
+        self.temp_dir = temp_dir
+        self.size = 0
+        self._memory: Optional[bytearray] = None
+        self._temp_file: Optional[IO[bytes]] = None
+        self._path: Optional[Path] = None
+        self._mmap: Optional[mmap.mmap] = None
+
+        if expected_size is not None and expected_size > max_memory_size:
+            self._spill()
+        else:
+            self._memory = bytearray(expected_size or 0)
+
+    @property
+    def spilled(self) -> bool:
+        return self._path is not None
+
+    @property
+    def path(self) -> Optional[Path]:
+        """
+        The temp file of a spilled result.
+        """
+        return self._path
+
+    def write(self, chunk: bytes) -> None:
+        end = self.size + len(chunk)
+        if self._memory is not None and end > self.max_memory_size:
+            self._spill()
+        if self._temp_file is not None:
+            self._temp_file.write(chunk)
+        elif end <= len(self._memory):
+            memoryview(self._memory)[self.size : end] = chunk
+        else:
+            # the size was not known up front (or wrong)
+            del self._memory[self.size :]
+            self._memory += chunk
+        self.size = end
+
+    def finish(self) -> None:
+        if self._temp_file is not None:
+            self._temp_file.close()
+            self._temp_file = None
+        elif self._memory is not None and len(self._memory) > self.size:
+            # the response was shorter than announced
+            del self._memory[self.size :]
+
+    def view(self) -> memoryview:
+        if self._memory is not None:
+            return memoryview(self._memory)
+        if self.size == 0:
+            return memoryview(b"")
+        if self._mmap is None:
+            with open(self._path, "rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(self._mmap)
+
+    def open(self) -> IO[bytes]:
+        if self._memory is not None:
+            return io.BufferedReader(_MemoryReader(memoryview(self._memory)))
+        return open(self._path, "rb")
+
+    def close(self) -> None:
+        self._memory = None
+        if self._temp_file is not None:
+            self._temp_file.close()
+            self._temp_file = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._path is not None:
+            try:
+                os.unlink(self._path)
+            except FileNotFoundError:
+                pass
+
+    def __enter__(self) -> "ResultBuffer":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _spill(self) -> None:
+        self._temp_file = tempfile.NamedTemporaryFile(
+            "wb", dir=self.temp_dir, suffix=Path(self.file_name).suffix, delete=False
+        )
+        self._path = Path(self._temp_file.name)
+        if self._memory is not None:
+            self._temp_file.write(memoryview(self._memory)[: self.size])
+            self._memory = None
+
+
+class _MemoryReader(io.RawIOBase):
+    """
+    Read-only file object on a memoryview, unlike io.BytesIO it does not copy the bytes.
+    """
+
+    def __init__(self, view: memoryview):
+        self._view = view
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        n = max(0, min(len(buffer), len(self._view) - self._position))
+        buffer[:n] = self._view[self._position : self._position + n]
+        self._position += n
+        return n
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        if offset < 0:
+            raise ValueError(f"negative seek position {offset}")
+        self._position = offset
+        return offset
+
+    def tell(self) -> int:
+        return self._position
@@ -0,0 +1,237 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import IO, Any, Dict, Iterable, Optional, Tuple, Union
+
+from pydantic import BaseModel
+
+log = logging.getLogger()
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+_FICLONE = 0x40049409  # ioctl request of Linux to share the extents of a file (reflink)
+
+# job arguments which don't change the result of a job
+IGNORED_JOB_ARGS = ("status_webhook_url",)
+
+
+class ResultCache:
+    """
+    Local, content-addressed cache of redacted outputs. Results are stored under a key made of the hash of the input
+    file and everything else that determines the output (service, output type, job arguments, ...), so inputs that
+    are byte-identical to an already processed one are neither uploaded nor processed again.
+
+    Hits are materialized as reflink (copy-on-write clone) where the file system supports it, else as hardlink (if
+    allow_hardlinks, note that modifying such an output in place also modifies the cached result) or as copy. The
+    least recently used results are evicted once the cache grows beyond max_size bytes.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Union[str, Path],
+        max_size: int = 10 * 1024**3,
+        allow_hardlinks: bool = False,
+    ):
+        self.cache_dir = Path(cache_dir).expanduser()
+        self.max_size = max_size
+        self.allow_hardlinks = allow_hardlinks
+        self._lock = threading.Lock()
+        # key -> (path, size), least recently used first
+        self._entries: "OrderedDict[str, Tuple[Path, int]]" = OrderedDict()
+        self._size = 0
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._load()
+
+    def _load(self) -> None:
+        entries = []
+        for shard in os.scandir(self.cache_dir):
+            if not shard.is_dir() or shard.name.startswith("."):
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.startswith("."):
+                    # temp file of an interrupted store
+                    _unlink(Path(entry.path))
+                    continue
+                stat = entry.stat()
+                key = entry.name.split(".", 1)[0]
+                entries.append((stat.st_mtime, key, Path(entry.path), stat.st_size))
+        for _, key, path, size in sorted(entries):
+            self._entries[key] = (path, size)
+            self._size += size
+        log.debug(
+            f"Loaded {len(self._entries)} results ({self._size} bytes) from result cache {self.cache_dir}"
+        )
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def hash_file(file: Union[str, Path, IO[bytes]]) -> str:
+        sha256 = hashlib.sha256()
+        if isinstance(file, (str, Path)):
+            with open(file, "rb") as f:
+                return ResultCache.hash_file(f)
+        position = file.tell()
+        for chunk in iter(lambda: file.read(_HASH_CHUNK_SIZE), b""):
+            sha256.update(chunk)
+        file.seek(position)
+        return sha256.hexdigest()
+
+    @staticmethod
+    def key(
+        file: Union[str, Path],
+        service: str,
+        output_type: str,
+        job_args: Optional[BaseModel] = None,
+        extra_files: Iterable[Optional[Union[str, Path]]] = (),
+        **extra: Any,
+    ) -> str:
+        """
+        Returns the cache key of processing file with the given parameters. extra_files (e.g. a custom licence plate
+        stamp) are included by their content, other extra values (e.g. the API version) as they are.
+        """
+        job_args_dict: Optional[Dict] = None
+        if job_args is not None:
+            job_args_dict = job_args.dict(exclude=set(IGNORED_JOB_ARGS))
+        canonical = json.dumps(
+            {
+                "file": ResultCache.hash_file(file),
+                "service": str(service),
+                "output_type": str(output_type),
+                "job_args": job_args_dict,
+                "extra_files": [
+                    ResultCache.hash_file(f) if f else None for f in extra_files
+                ],
+                "extra": extra,
+            },
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Path]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+        path = entry[0]
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # removed by another process sharing the cache dir
+            self._remove(key)
+            return None
+        return path
+
+    def materialize(self, key: str, output_path: Union[str, Path]) -> Optional[Path]:
+        """
+        Places the cached result of key at output_path (with the suffix of the cached result). Returns the path of
+        the output or None if the key is not cached.
+        """
+        cached_path = self.get(key)
+        if cached_path is None:
+            return None
+        output_path = Path(output_path)
+        output_path = output_path.parent / f"{output_path.stem}{cached_path.suffix}"
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            _place_file(cached_path, output_path, allow_hardlink=self.allow_hardlinks)
+        except FileNotFoundError:
+            self._remove(key)
+            return None
+        return output_path
+
+    def store(self, key: str, result_path: Union[str, Path]) -> None:
+        result_path = Path(result_path)
+        size = result_path.stat().st_size
+        if size > self.max_size:
+            log.debug(f"Not caching {result_path}, it is larger than the cache")
+            return
+        cached_path = self.cache_dir / key[:2] / f"{key}{result_path.suffix}"
+        cached_path.parent.mkdir(exist_ok=True)
+        _place_file(result_path, cached_path, allow_hardlink=self.allow_hardlinks)
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= previous[1]
+                if previous[0] != cached_path:
+                    _unlink(previous[0])
+            self._entries[key] = (cached_path, size)
+            self._size += size
+            evicted = []
+            while self._size > self.max_size and self._entries:
+                _, (path, evicted_size) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+                evicted.append(path)
+        for path in evicted:
+            log.debug(f"Evicting {path} from result cache")
+            _unlink(path)
+
+    def _remove(self, key: str) -> None:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._size -= entry[1]
+
+
+def result_status_id(key: str) -> uuid.UUID:
+    """
+    Stable pseudo output_id for results taken from the cache, which were not processed by a job.
+    """
+    return uuid.UUID(key[:32])
+
+
+def _place_file(source: Path, target: Path, allow_hardlink: bool) -> None:
+    # go through a temp file in the target dir, so target is replaced atomically and never left half-written
+    temp_path = target.parent / f".{target.name}.{uuid.uuid4().hex}.tmp"
+    try:
+        if not _reflink(source, temp_path):
+            if not (allow_hardlink and _hardlink(source, temp_path)):
+                shutil.copyfile(source, temp_path)
+        os.replace(temp_path, target)
+    finally:
+        _unlink(temp_path)
+
+
+def _reflink(source: Path, target: Path) -> bool:
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    try:
+        with open(source, "rb") as src, open(target, "wb") as dst:
+            fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+        return True
+    except OSError:
+        _unlink(target)
+        if not source.exists():
+            raise FileNotFoundError(source)
+        return False
+
+
+def _hardlink(source: Path, target: Path) -> bool:
+    try:
+        os.link(source, target)
+        return True
+    except FileNotFoundError:
+        raise
+    except OSError:
+        return False
+
+
+def _unlink(path: Path) -> None:
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,133 @@
+import email.utils
+import logging
+import random
+import time
+import uuid
+from typing import Collection, Optional
+
+import httpx
+
+log = logging.getLogger("redact-requests")
+
+# gateway overload and transient backend errors, the request can be sent again as it is
+RETRYABLE_STATUS_CODES = (429, 502, 503, 504)
+# responses saying the request was not processed: after a 502 or 504 the backend may have started a job already
+NON_IDEMPOTENT_RETRYABLE_STATUS_CODES = (429, 503)
+
+
+class StatusRetryPolicy:
+    """
+    Decides which responses of Redact are retried and how long to wait before. The delays follow the "decorrelated
+    jitter" backoff (each delay is random between base_delay and three times the previous one, capped at
+    max_delay), which spreads the retries of many clients hitting the same overload. A Retry-After header of the
+    response is a lower bound of the delay.
+
+    Requests that are not idempotent (job posts) are only retried on non_idempotent_status_codes, as sending them
+    again after a gateway error could start a second job.
+    """
+
+    def __init__(
+        self,
+        status_codes: Collection[int] = RETRYABLE_STATUS_CODES,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        non_idempotent_status_codes: Collection[
+            int
+        ] = NON_IDEMPOTENT_RETRYABLE_STATUS_CODES,
+    ):
+        self.status_codes = frozenset(status_codes)
+        self.non_idempotent_status_codes = frozenset(non_idempotent_status_codes)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def is_retryable(self, response: httpx.Response, idempotent: bool = True) -> bool:
+        if idempotent:
+            return response.status_code in self.status_codes
+        return response.status_code in self.non_idempotent_status_codes
+
+    def next_delay(self, previous_delay: float, response: httpx.Response) -> float:
+        upper = max(self.base_delay, previous_delay * 3)
+        delay = min(self.max_delay, random.uniform(self.base_delay, upper))
+        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+
+class RetryBackoff:
+    """
+    The delays between the attempts of a single request, until total_time_limit is used up. Network errors are
+    retried after 2, 4, 8, ... seconds, error responses after the delays of the status_retry_policy, each counted
+    from the first failure of its kind. A delay of None means the request is given up.
+    """
+
+    def __init__(
+        self,
+        total_time_limit: float,
+        status_retry_policy: StatusRetryPolicy,
+        debug_uuid: Optional[uuid.UUID] = None,
+    ):
+        self.total_time_limit = total_time_limit
+        self.status_retry_policy = status_retry_policy
+        self.debug_uuid = debug_uuid
+        self._network_start: Optional[float] = None
+        self._network_delay = 1.0  # doubled before the first retry
+        self._status_start: Optional[float] = None
+        self._status_delay = 0.0
+
+    def after_network_error(self, exc_info: BaseException) -> Optional[float]:
+        if self._network_start is None:
+            self._network_start = time.time()
+
+        retry_runtime = time.time() - self._network_start
+        if retry_runtime > self.total_time_limit:
+            log.debug("Aborting retry due to exceeding retry limit")
+            return None
+        max_retry_delay_remaining = max(
+            1, self.total_time_limit - retry_runtime
+        )  # max to ensure positive
+        self._network_delay = min(2 * self._network_delay, max_retry_delay_remaining)
+
+        log.debug(
+            f"Network exception '{exc_info}' caught on request {self.debug_uuid}, "
+            f"retrying after {self._network_delay:.2f}s."
+        )
+        return self._network_delay
+
+    def after_response(self, response: httpx.Response) -> Optional[float]:
+        if self._status_start is None:
+            self._status_start = time.time()
+
+        self._status_delay = self.status_retry_policy.next_delay(
+            self._status_delay, response
+        )
+        retry_runtime = time.time() - self._status_start
+        if retry_runtime + self._status_delay > self.total_time_limit:
+            log.debug("Aborting retry due to exceeding retry limit")
+            return None
+
+        log.debug(
+            f"Response {response.status_code} to request {self.debug_uuid}, "
+            f"retrying after {self._status_delay:.2f}s."
+        )
+        return self._status_delay
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Returns the seconds to wait according to a Retry-After header, which holds either seconds or an HTTP date.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at is None:
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
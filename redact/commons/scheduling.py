@@ -0,0 +1,85 @@
+import fnmatch
+import logging
+import os
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional
+
+from strenum import StrEnum
+
+from redact.commons.utils import FileInfo, iter_file_infos_in_dir, iter_files_in_dir
+
+log = logging.getLogger()
+
+
+class SchedulingPolicy(StrEnum):
+    # in the order the files are found, while the tree is still walked
+    discovery = "discovery"
+    # longest jobs first, so no huge file starts last and dominates the end of the run (LPT)
+    largest_first = "largest_first"
+    # many results early
+    smallest_first = "smallest_first"
+    newest_first = "newest_first"
+    oldest_first = "oldest_first"
+
+
+def schedule_files(
+    files: Iterable[FileInfo],
+    policy: SchedulingPolicy = SchedulingPolicy.discovery,
+    priority_patterns: Optional[List[str]] = None,
+) -> Iterator[FileInfo]:
+    """
+    Orders files for processing. Files matching one of priority_patterns (glob patterns like 'urgent/*' or '*.mp4',
+    matched against the path) come first, in the order of the patterns, then the other files. Within each group the
+    files are ordered by policy.
+
+    Only the discovery order without patterns keeps the files lazy, the other orders need all files up front.
+    """
+    if policy == SchedulingPolicy.discovery and not priority_patterns:
+        return iter(files)
+
+    patterns = priority_patterns or []
+
+    def rank(file: FileInfo) -> int:
+        for i, pattern in enumerate(patterns):
+            if fnmatch.fnmatchcase(file.path, pattern):
+                return i
+        return len(patterns)
+
+    order = _ORDERS[policy]
+    return iter(sorted(files, key=lambda file: (rank(file), order(file))))
+
+
+_ORDERS = {
+    SchedulingPolicy.discovery: lambda file: 0,
+    SchedulingPolicy.largest_first: lambda file: -file.size,
+    SchedulingPolicy.smallest_first: lambda file: file.size,
+    SchedulingPolicy.newest_first: lambda file: -file.mtime,
+    SchedulingPolicy.oldest_first: lambda file: file.mtime,
+}
+
+
+def iter_scheduled_files_in_dir(
+    dir: Path,
+    n_workers: int = 1,
+    file_filter: Optional[Callable[[str], bool]] = None,
+    policy: SchedulingPolicy = SchedulingPolicy.discovery,
+    priority_patterns: Optional[List[str]] = None,
+) -> Iterator[str]:
+    """
+    The files of iter_files_in_dir() in the order of schedule_files(), priority_patterns are matched against the
+    paths relative to dir. Size and mtime come from the stat of the walk.
+    """
+    if policy == SchedulingPolicy.discovery and not priority_patterns:
+        return iter_files_in_dir(dir=dir, n_workers=n_workers, file_filter=file_filter)
+
+    log.info(f"Finding all files before scheduling them ({policy}) ...")
+    relative_files = (
+        file._replace(path=os.path.relpath(file.path, dir))
+        for file in iter_file_infos_in_dir(
+            dir=dir, n_workers=n_workers, file_filter=file_filter
+        )
+    )
+    return (
+        os.path.join(dir, file.path)
+        for file in schedule_files(relative_files, policy, priority_patterns)
+    )
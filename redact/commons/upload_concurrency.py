@@ -0,0 +1,253 @@
+import asyncio
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
+
+from strenum import StrEnum
+
+log = logging.getLogger("redact-requests")
+
+# responses to uploads which mean that the backend (or the API Management in front of it) is overloaded
+THROTTLING_STATUS_CODES = (429, 503)
+
+
+class UploadConcurrencyMode(StrEnum):
+    fixed = "fixed"
+    adaptive = "adaptive"
+
+
+class UploadOutcome(StrEnum):
+    succeeded = "succeeded"
+    throttled = "throttled"
+    failed = "failed"
+
+
+class UploadSlot:
+    """
+    Handed out by UploadConcurrencyController.slot(). The upload reports its outcome through it, uploads which
+    don't report anything count as failed. Throttling sticks, also if a retry of the upload succeeds afterwards.
+    """
+
+    def __init__(self):
+        self.outcome = UploadOutcome.failed
+        self.n_bytes = 0
+
+    def succeeded(self, n_bytes: int) -> None:
+        if self.outcome != UploadOutcome.throttled:
+            self.outcome = UploadOutcome.succeeded
+        self.n_bytes = n_bytes
+
+    def throttled(self) -> None:
+        self.outcome = UploadOutcome.throttled
+
+
+class UploadConcurrencyController:
+    """
+    Limits the number of concurrent uploads (job posts) of a process. The fixed controller allows a constant number
+    of uploads, which is a safe choice for the API Management gateway of Redact Online.
+
+    Threads take a slot with slot(), coroutines with async_slot(), which waits without blocking the event loop. Both
+    share the same limit.
+    """
+
+    def __init__(self, limit: int = 2):
+        if limit < 1:
+            raise ValueError("The upload concurrency limit must be at least 1.")
+        self._limit = limit
+        self._in_flight = 0
+        self._condition = threading.Condition()
+        # coroutines waiting in async_slot(), with the loop they are running on
+        self._async_waiters: List[
+            Tuple[asyncio.AbstractEventLoop, "asyncio.Future[None]"]
+        ] = []
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @contextmanager
+    def slot(self) -> Iterator[UploadSlot]:
+        self._acquire()
+        upload_slot = UploadSlot()
+        start = time.monotonic()
+        try:
+            yield upload_slot
+        finally:
+            self._release(upload_slot, start)
+
+    @asynccontextmanager
+    async def async_slot(self) -> AsyncIterator[UploadSlot]:
+        await self._async_acquire()
+        upload_slot = UploadSlot()
+        start = time.monotonic()
+        try:
+            yield upload_slot
+        finally:
+            self._release(upload_slot, start)
+
+    def _acquire(self) -> None:
+        with self._condition:
+            while not self._try_acquire():
+                self._condition.wait()
+
+    async def _async_acquire(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._condition:
+                if self._try_acquire():
+                    return
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+            try:
+                await waiter
+            finally:
+                with self._condition:
+                    if (loop, waiter) in self._async_waiters:
+                        self._async_waiters.remove((loop, waiter))
+
+    def _try_acquire(self) -> bool:
+        if self._in_flight >= self._limit:
+            return False
+        self._in_flight += 1
+        self._on_upload_started()
+        return True
+
+    def _release(self, upload_slot: UploadSlot, start: float) -> None:
+        with self._condition:
+            self._in_flight -= 1
+            self._on_upload_done(upload_slot, time.monotonic() - start)
+            self._condition.notify_all()
+            async_waiters, self._async_waiters = self._async_waiters, []
+        # the waiters check again whether there is a free slot, like the threads do
+        for loop, waiter in async_waiters:
+            try:
+                loop.call_soon_threadsafe(_wake_up, waiter)
+            except RuntimeError:
+                # the loop is closed already
+                pass
+
+    def _on_upload_started(self) -> None:
+        pass
+
+    def _on_upload_done(self, upload_slot: UploadSlot, duration: float) -> None:
+        pass
+
+
+class AdaptiveUploadConcurrency(UploadConcurrencyController):
+    """
+    AIMD (additive increase, multiplicative decrease) controller for the number of concurrent uploads. Uploads are
+    grouped into rounds of 'limit' successful uploads. After each round the limit is raised by one if the overall
+    upload throughput (bytes per second of wall time) improved by at least min_improvement compared to the previous
+    round. Throttling (429/503 responses, timeouts) multiplies the limit by backoff_factor right away.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 2,
+        min_limit: int = 1,
+        max_limit: int = 16,
+        backoff_factor: float = 0.5,
+        min_improvement: float = 0.05,
+    ):
+        super().__init__(limit=initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff_factor = backoff_factor
+        self.min_improvement = min_improvement
+
+        self._round_start: Optional[float] = None
+        self._round_bytes = 0
+        self._round_uploads = 0
+        self._last_throughput: Optional[float] = None
+
+    def _on_upload_started(self) -> None:
+        if self._round_start is None:
+            self._round_start = time.monotonic()
+
+    def _on_upload_done(self, upload_slot: UploadSlot, duration: float) -> None:
+        if upload_slot.outcome == UploadOutcome.throttled:
+            limit = max(self.min_limit, int(self._limit * self.backoff_factor))
+            log.debug(f"Uploads are throttled, reducing concurrency to {limit}")
+            self._limit = limit
+            self._start_round()
+            self._last_throughput = None
+            return
+        if upload_slot.outcome != UploadOutcome.succeeded:
+            return
+
+        self._round_bytes += upload_slot.n_bytes
+        self._round_uploads += 1
+        if self._round_uploads < self._limit:
+            return
+
+        throughput = self._round_bytes / max(time.monotonic() - self._round_start, 1e-6)
+        improved = self._last_throughput is None or (
+            throughput > self._last_throughput * (1 + self.min_improvement)
+        )
+        if improved and self._limit < self.max_limit:
+            self._limit += 1
+            log.debug(
+                f"Upload throughput {throughput / 1024**2:.1f} MB/s, raising concurrency to {self._limit}"
+            )
+        self._last_throughput = throughput
+        self._start_round()
+
+    def _start_round(self) -> None:
+        self._round_start = time.monotonic() if self._in_flight else None
+        self._round_bytes = 0
+        self._round_uploads = 0
+
+
+def _wake_up(waiter: "asyncio.Future[None]") -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+def create_upload_concurrency_controller(
+    mode: UploadConcurrencyMode, limit: int = 2, max_limit: int = 16
+) -> UploadConcurrencyController:
+    """
+    limit is the fixed limit or the initial one of the adaptive controller, respectively.
+    """
+    if mode == UploadConcurrencyMode.fixed:
+        return UploadConcurrencyController(limit=limit)
+    if mode == UploadConcurrencyMode.adaptive:
+        return AdaptiveUploadConcurrency(initial_limit=limit, max_limit=max_limit)
+    raise ValueError(f"Unsupported upload concurrency mode {mode}.")
+
+
+_default_controller_lock = threading.Lock()
+_default_controller: Optional[UploadConcurrencyController] = None
+
+
+def get_default_upload_concurrency_controller() -> UploadConcurrencyController:
+    """
+    Returns the controller shared by all RedactRequests (v3 and v4) of the process that don't get their own one. It is
+    created from the settings unless it was set with set_default_upload_concurrency_controller().
+    """
+    global _default_controller
+    with _default_controller_lock:
+        if _default_controller is None:
+            from redact.settings import Settings
+
+            settings = Settings()
+            _default_controller = create_upload_concurrency_controller(
+                mode=settings.upload_concurrency_mode,
+                limit=settings.max_concurrent_uploads,
+                max_limit=settings.adaptive_max_concurrent_uploads,
+            )
+        return _default_controller
+
+
+def set_default_upload_concurrency_controller(
+    controller: UploadConcurrencyController,
+) -> None:
+    global _default_controller
+    with _default_controller_lock:
+        _default_controller = controller
@@ -1,10 +1,10 @@
-import glob
 import logging
 import math
 import os
+from concurrent.futures import Future, ThreadPoolExecutor
 from io import BufferedReader, BytesIO, FileIO
 from pathlib import Path
-from typing import List, Union
+from typing import Callable, Iterator, List, NamedTuple, Optional, Tuple, Union
 
 from redact.settings import Settings
 
@@ -25,21 +25,171 @@ def file_extension(path: str) -> str:
     return Path(path).suffix[1:].lower()
 
 
-def files_in_dir(dir: Path, recursive=True, sort=False) -> List[str]:
-    """
-    Iterates recursively through all files in all subfolders.
+class FileInfo(NamedTuple):
+    path: str
+    size: int
+    mtime: float
+
+
+def iter_files_in_dir(
+    dir: Path,
+    recursive=True,
+    n_workers: int = 1,
+    file_filter: Optional[Callable[[str], bool]] = None,
+) -> Iterator[str]:
     """
+    Lazily yields all files in dir (and its subfolders) while walking the tree, so the first paths are available
+    right away. Hidden files and folders are skipped, like glob does. If given, only files for which file_filter
+    returns True are yielded.
 
-    path = Path(dir)
+    The file type is taken from the directory entries, which saves a stat call per file on most file systems. With
+    n_workers > 1 the subfolders are listed in parallel, which helps on high-latency (network) file systems. The
+    order is deterministic then: files of a folder in sorted order, followed by its subfolders in sorted order.
+    """
+    return _iter_dir(dir, recursive, n_workers, file_filter, with_stat=False)
 
-    if recursive:
-        search_path = str(path.joinpath("**"))
-        file_list = glob.glob(search_path, recursive=True)
-    else:
-        search_path = str(path.joinpath("*"))
-        file_list = glob.glob(search_path, recursive=False)
 
-    file_list = [f for f in file_list if Path(f).is_file()]
+def iter_file_infos_in_dir(
+    dir: Path,
+    recursive=True,
+    n_workers: int = 1,
+    file_filter: Optional[Callable[[str], bool]] = None,
+) -> Iterator[FileInfo]:
+    """
+    Like iter_files_in_dir(), but with size and modification time of the files, from one stat call per file during
+    the walk.
+    """
+    return _iter_dir(dir, recursive, n_workers, file_filter, with_stat=True)
+
+
+def _iter_dir(
+    dir: Path,
+    recursive: bool,
+    n_workers: int,
+    file_filter: Optional[Callable[[str], bool]],
+    with_stat: bool,
+) -> Iterator[Union[str, FileInfo]]:
+    if n_workers > 1:
+        return _iter_files_in_dir_parallel(
+            dir=dir,
+            recursive=recursive,
+            n_workers=n_workers,
+            file_filter=file_filter,
+            with_stat=with_stat,
+        )
+    return _iter_files_in_dir(
+        dir=dir, recursive=recursive, file_filter=file_filter, with_stat=with_stat
+    )
+
+
+def _file_item(entry: os.DirEntry, with_stat: bool) -> Union[str, FileInfo]:
+    if not with_stat:
+        return entry.path
+    # cached by the entry, and on Windows even part of the directory listing
+    stat = entry.stat()
+    return FileInfo(entry.path, stat.st_size, stat.st_mtime)
+
+
+def _iter_files_in_dir(
+    dir: Path,
+    recursive: bool,
+    file_filter: Optional[Callable[[str], bool]],
+    with_stat: bool = False,
+) -> Iterator[Union[str, FileInfo]]:
+    try:
+        # one open directory iterator per level of the tree that is currently walked, memory stays constant
+        stack = [os.scandir(dir)]
+    except OSError as e:
+        logging.warning(f"Can't list {dir}: {e}")
+        return
+    try:
+        while stack:
+            entry = next(stack[-1], None)
+            if entry is None:
+                stack.pop().close()
+                continue
+            if entry.name.startswith("."):
+                continue
+            try:
+                if entry.is_file():
+                    if file_filter is None or file_filter(entry.path):
+                        yield _file_item(entry, with_stat)
+                elif recursive and entry.is_dir():
+                    stack.append(os.scandir(entry.path))
+            except OSError as e:
+                logging.warning(f"Skipping {entry.path}: {e}")
+    finally:
+        for iterator in stack:
+            iterator.close()
+
+
+def _iter_files_in_dir_parallel(
+    dir: Path,
+    recursive: bool,
+    n_workers: int,
+    file_filter: Optional[Callable[[str], bool]],
+    with_stat: bool = False,
+) -> Iterator[Union[str, FileInfo]]:
+    # Depth-first over a stack of folders. The folders on top of the stack, which are yielded next, are listed
+    # ahead by the thread pool. Only a bounded number of listings is kept in memory.
+    max_pending = 4 * n_workers
+    with ThreadPoolExecutor(
+        max_workers=n_workers, thread_name_prefix="redact-discovery"
+    ) as executor:
+        stack: List[Union[str, Future]] = [str(dir)]
+        n_pending = 0
+        while stack:
+            for i in range(len(stack) - 1, -1, -1):
+                if n_pending >= max_pending:
+                    break
+                if isinstance(stack[i], str):
+                    stack[i] = executor.submit(
+                        _list_dir, stack[i], file_filter, with_stat
+                    )
+                    n_pending += 1
+
+            future = stack.pop()
+            n_pending -= 1
+            files, sub_dirs = future.result()
+            yield from files
+            if recursive:
+                stack.extend(reversed(sub_dirs))
+
+
+def _list_dir(
+    dir: str, file_filter: Optional[Callable[[str], bool]], with_stat: bool = False
+) -> Tuple[List[Union[str, FileInfo]], List[str]]:
+    files = []
+    sub_dirs = []
+    try:
+        with os.scandir(dir) as iterator:
+            for entry in iterator:
+                if entry.name.startswith("."):
+                    continue
+                try:
+                    if entry.is_file():
+                        if file_filter is None or file_filter(entry.path):
+                            files.append(_file_item(entry, with_stat))
+                    elif entry.is_dir():
+                        sub_dirs.append(entry.path)
+                except OSError as e:
+                    logging.warning(f"Skipping {entry.path}: {e}")
+    except OSError as e:
+        logging.warning(f"Can't list {dir}: {e}")
+    files.sort()
+    sub_dirs.sort()
+    return files, sub_dirs
+
+
+def files_in_dir(
+    dir: Path, recursive=True, sort=False, n_workers: int = 1
+) -> List[str]:
+    """
+    Iterates recursively through all files in all subfolders.
+    """
+    file_list = list(
+        iter_files_in_dir(dir=dir, recursive=recursive, n_workers=n_workers)
+    )
 
     if sort:
         file_list.sort()
@@ -75,7 +225,10 @@ def archives_in_dir(dir: Path, recursive=True, sort=False):
     """
     Iterates recursively over all archives in all subfolders.
     """
-    file_list = files_in_dir(dir=dir, recursive=recursive, sort=sort)
+    if sort:
+        file_list = files_in_dir(dir=dir, recursive=recursive, sort=True)
+    else:
+        file_list = iter_files_in_dir(dir=dir, recursive=recursive)
     for file in file_list:
         if is_archive(file):
             yield file
@@ -85,7 +238,10 @@ def images_in_dir(dir: Path, recursive=True, sort=False):
     """
     Iterates recursively over all images in all subfolders.
     """
-    file_list = files_in_dir(dir=dir, recursive=recursive, sort=sort)
+    if sort:
+        file_list = files_in_dir(dir=dir, recursive=recursive, sort=True)
+    else:
+        file_list = iter_files_in_dir(dir=dir, recursive=recursive)
     for file in file_list:
         if is_image(file):
             yield file
@@ -95,7 +251,10 @@ def videos_in_dir(dir: Path, recursive=True, sort=False):
     """
     Iterates recursively over all videos in all subfolders.
     """
-    file_list = files_in_dir(dir=dir, recursive=recursive, sort=sort)
+    if sort:
+        file_list = files_in_dir(dir=dir, recursive=recursive, sort=True)
+    else:
+        file_list = iter_files_in_dir(dir=dir, recursive=recursive)
     for file in file_list:
         if is_video(file):
             yield file
@@ -140,3 +299,16 @@ def get_filesize_in_gb(file: Union[FileIO, BytesIO, BufferedReader]):
         raise ValueError("Only FileIO, BytesIO or BufferedReader are supported.")
 
     return math.ceil(file_size / (1024 * 1024 * 1024))
+
+
+def fadvise(fd: Optional[int], offset: int, length: int, advice: str) -> None:
+    """
+    os.posix_fadvise with the name of the advice, does nothing where it is not supported.
+    """
+    if fd is None or not hasattr(os, "posix_fadvise"):
+        return
+    try:
+        os.posix_fadvise(fd, offset, length, getattr(os, advice))
+    except OSError:
+        # e.g. pipes
+        pass
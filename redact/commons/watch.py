@@ -0,0 +1,315 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional, Set, Tuple, Union
+
+from pydantic import BaseModel
+
+from redact.commons.utils import iter_file_infos_in_dir
+
+log = logging.getLogger()
+
+# see inotify(7)
+_IN_MODIFY = 0x00000002
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_ISDIR = 0x40000000
+
+# changes of the files and of the folder tree
+_FILE_EVENTS = _IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO
+_TREE_EVENTS = _IN_CREATE | _IN_DELETE | _IN_DELETE_SELF | _IN_MOVE_SELF
+_WATCH_MASK = _FILE_EVENTS | _TREE_EVENTS | _IN_ONLYDIR
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class WatchOptions(BaseModel):
+    """
+    Settings of watching an input folder for new files. Files are picked up once they haven't changed for
+    quiet_period seconds. Without inotify (or with use_inotify=False) the folder is walked every poll_interval
+    seconds.
+    """
+
+    quiet_period: float = 5.0
+    poll_interval: float = 2.0
+    use_inotify: bool = True
+
+
+class FolderWatcher:
+    """
+    Yields the files of a folder tree, the existing ones and those added later, once they haven't changed for
+    quiet_period seconds (so files that are still being copied are not picked up halfway). Every file is yielded
+    once, unless it is removed and added again (e.g. a drop folder whose inputs are deleted once processed). Hidden
+    files and folders are skipped, and only files for which file_filter returns True are yielded.
+
+    files() runs until stop() is called. Use create_folder_watcher() to get the inotify watcher where available.
+    """
+
+    def __init__(
+        self,
+        dir: Union[str, Path],
+        file_filter: Optional[Callable[[str], bool]] = None,
+        quiet_period: float = 5.0,
+    ):
+        self.dir = str(dir)
+        self.file_filter = file_filter
+        self.quiet_period = quiet_period
+        # files waiting for their quiet period, by the (monotonic) time of their last change
+        self._pending: Dict[str, float] = {}
+        self._done: Set[str] = set()
+        self._stopped = threading.Event()
+
+    def __enter__(self) -> "FolderWatcher":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def close(self) -> None:
+        self.stop()
+
+    def files(self) -> Iterator[str]:
+        self._scan(self.dir)
+        while not self._stopped.is_set():
+            now = time.monotonic()
+            due = [p for p, t in self._pending.items() if now - t >= self.quiet_period]
+            for path in sorted(due):
+                del self._pending[path]
+                if not os.path.isfile(path):
+                    continue
+                self._done.add(path)
+                yield path
+            # wake up in time for the next file, and at least every second to notice stop()
+            next_due = min(
+                (t + self.quiet_period for t in self._pending.values()),
+                default=now + 1.0,
+            )
+            timeout = min(max(next_due - now, 0.0), 1.0)
+            self._wait(timeout)
+
+    def _wait(self, timeout: float) -> None:
+        """
+        Waits up to timeout seconds for changes and registers them with _changed().
+        """
+        raise NotImplementedError
+
+    def _changed(self, path: str, when: Optional[float] = None) -> None:
+        if path in self._done:
+            return
+        if os.path.basename(path).startswith("."):
+            return
+        if self.file_filter is not None and not self.file_filter(path):
+            return
+        self._pending[path] = time.monotonic() if when is None else when
+
+    def _forget(self, path: str) -> None:
+        """
+        Called for removed files, so a file of the same name added later is yielded again.
+        """
+        self._pending.pop(path, None)
+        self._done.discard(path)
+
+    def _forget_tree(self, dir: str) -> None:
+        prefix = os.path.join(dir, "")
+        for path in [p for p in self._pending if p.startswith(prefix)]:
+            self._forget(path)
+        for path in [p for p in self._done if p.startswith(prefix)]:
+            self._forget(path)
+
+    def _scan(self, dir: str) -> None:
+        """
+        Registers the files of dir, as changed at their modification time.
+        """
+        for file in iter_file_infos_in_dir(Path(dir), file_filter=self.file_filter):
+            age = max(0.0, time.time() - file.mtime)
+            self._changed(file.path, when=time.monotonic() - age)
+
+
+class PollingFolderWatcher(FolderWatcher):
+    """
+    Walks the tree every poll_interval seconds and compares sizes and modification times.
+    """
+
+    def __init__(
+        self,
+        dir: Union[str, Path],
+        file_filter: Optional[Callable[[str], bool]] = None,
+        quiet_period: float = 5.0,
+        poll_interval: float = 2.0,
+    ):
+        super().__init__(dir, file_filter=file_filter, quiet_period=quiet_period)
+        self.poll_interval = poll_interval
+        self._snapshot: Dict[str, Tuple[int, float]] = {}
+        self._next_poll = 0.0
+
+    def _scan(self, dir: str) -> None:
+        seen = set()
+        for file in iter_file_infos_in_dir(Path(dir), file_filter=self.file_filter):
+            seen.add(file.path)
+            stat = (file.size, file.mtime)
+            if self._snapshot.get(file.path) == stat:
+                continue
+            # replaced since it was yielded (e.g. deleted and added again between two scans)
+            self._done.discard(file.path)
+            first_seen = file.path not in self._snapshot
+            self._snapshot[file.path] = stat
+            if first_seen:
+                age = max(0.0, time.time() - file.mtime)
+                self._changed(file.path, when=time.monotonic() - age)
+            else:
+                self._changed(file.path)
+        for path in [p for p in self._snapshot if p not in seen]:
+            del self._snapshot[path]
+            self._forget(path)
+        self._next_poll = time.monotonic() + self.poll_interval
+
+    def _wait(self, timeout: float) -> None:
+        if self._stopped.wait(
+            min(timeout, max(0.0, self._next_poll - time.monotonic()))
+        ):
+            return
+        if time.monotonic() >= self._next_poll:
+            self._scan(self.dir)
+
+
+class InotifyFolderWatcher(FolderWatcher):
+    """
+    Gets notified about changes by the Linux kernel (inotify), so only new files cost anything.
+    """
+
+    def __init__(
+        self,
+        dir: Union[str, Path],
+        file_filter: Optional[Callable[[str], bool]] = None,
+        quiet_period: float = 5.0,
+    ):
+        super().__init__(dir, file_filter=file_filter, quiet_period=quiet_period)
+        self._libc = _load_libc()
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs: Dict[int, str] = {}
+
+    def close(self) -> None:
+        super().close()
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+    def _scan(self, dir: str) -> None:
+        # watch first, so nothing added in the meantime gets lost
+        self._add_watches(dir)
+        super()._scan(dir)
+
+    def _add_watches(self, dir: str) -> None:
+        stack = [dir]
+        while stack:
+            current = stack.pop()
+            wd = self._libc.inotify_add_watch(
+                self._fd, os.fsencode(current), _WATCH_MASK
+            )
+            if wd < 0:
+                log.warning(f"Can't watch {current}: {os.strerror(ctypes.get_errno())}")
+                continue
+            self._dirs[wd] = current
+            try:
+                with os.scandir(current) as entries:
+                    for entry in entries:
+                        if not entry.name.startswith(".") and entry.is_dir():
+                            stack.append(entry.path)
+            except OSError as e:
+                log.warning(f"Can't list {current}: {e}")
+
+    def _wait(self, timeout: float) -> None:
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return
+        try:
+            buffer = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset < len(buffer):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(buffer, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(buffer[offset : offset + length].rstrip(b"\0"))
+            offset += length
+            self._handle(wd, mask, name)
+
+    def _handle(self, wd: int, mask: int, name: str) -> None:
+        if mask & _IN_Q_OVERFLOW:
+            log.warning(f"Missed changes in {self.dir}, scanning it again")
+            self._scan(self.dir)
+            return
+        if mask & _IN_IGNORED:
+            self._dirs.pop(wd, None)
+            return
+        dir = self._dirs.get(wd)
+        if dir is None or not name:
+            return
+        path = os.path.join(dir, name)
+        if mask & _IN_ISDIR:
+            if mask & (_IN_CREATE | _IN_MOVED_TO) and not name.startswith("."):
+                self._scan(path)
+            elif mask & (_IN_DELETE | _IN_MOVED_FROM):
+                self._forget_tree(path)
+        elif mask & (_IN_DELETE | _IN_MOVED_FROM):
+            self._forget(path)
+        else:
+            self._changed(path)
+
+
+def _load_libc() -> ctypes.CDLL:
+    libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    libc.inotify_init1.argtypes = [ctypes.c_int]
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    return libc
+
+
+def inotify_available() -> bool:
+    try:
+        _load_libc().inotify_init1
+    except (OSError, AttributeError):
+        return False
+    return True
+
+
+def create_folder_watcher(
+    dir: Union[str, Path],
+    file_filter: Optional[Callable[[str], bool]] = None,
+    options: Optional[WatchOptions] = None,
+) -> FolderWatcher:
+    """
+    Creates an inotify watcher if possible (Linux), else a polling one.
+    """
+    options = options or WatchOptions()
+    if options.use_inotify and inotify_available():
+        try:
+            return InotifyFolderWatcher(
+                dir, file_filter=file_filter, quiet_period=options.quiet_period
+            )
+        except OSError as e:
+            log.warning(f"Can't use inotify ({e}), polling {dir} instead")
+    return PollingFolderWatcher(
+        dir,
+        file_filter=file_filter,
+        quiet_period=options.quiet_period,
+        poll_interval=options.poll_interval,
+    )
@@ -1,11 +1,31 @@
+from typing import Optional
+
 from pydantic import AnyUrl, BaseSettings, Field, validator
 
+from redact.commons.upload_concurrency import UploadConcurrencyMode
+
 
 class Settings(BaseSettings):
     log_level: str = "INFO"
     redact_online_url: AnyUrl = Field("https://api.brighter.ai/")
     redact_url_default: AnyUrl = Field("http://127.0.0.1:8787/")
     base_timeout: int = 60
+    # concurrent uploads (job posts) of the process, the adaptive mode starts with max_concurrent_uploads
+    upload_concurrency_mode: UploadConcurrencyMode = UploadConcurrencyMode.fixed
+    max_concurrent_uploads: int = 2
+    adaptive_max_concurrent_uploads: int = 16
+    # client-side rate limits in requests per second (unlimited if not set), processes using the same
+    # rate_limit_file share one budget
+    rate_limit_post: Optional[float] = None
+    rate_limit_status: Optional[float] = None
+    rate_limit_download: Optional[float] = None
+    rate_limit_delete: Optional[float] = None
+    rate_limit_file: Optional[str] = None
+    # transport of the httpx clients, see HttpClientOptions
+    http2: bool = False
+    max_connections: Optional[int] = 100
+    max_keepalive_connections: Optional[int] = 20
+    keepalive_expiry: Optional[float] = 5.0
 
     @validator("log_level")
     def log_level_must_be_upper_case(cls, value: str) -> str:
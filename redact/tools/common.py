@@ -0,0 +1,154 @@
+"""
+Options and helpers shared by the command line tools of all API versions.
+"""
+
+from typing import List, Optional
+
+import typer
+
+from redact.commons.http_client import (
+    HttpClientOptions,
+    set_default_http_client_options,
+)
+from redact.commons.polling import (
+    PollingStrategy,
+    PollingStrategyType,
+    create_polling_strategy,
+)
+from redact.commons.rate_limit import (
+    create_rate_limiter,
+    parse_rate_limits,
+    set_default_rate_limiter,
+)
+from redact.commons.result_cache import ResultCache
+from redact.commons.upload_concurrency import (
+    UploadConcurrencyMode,
+    create_upload_concurrency_controller,
+    set_default_upload_concurrency_controller,
+)
+from redact.settings import Settings
+
+settings = Settings()
+
+
+POLLING_STRATEGY_OPTION = typer.Option(
+    None,
+    help=(
+        "How to schedule job status checks: 'fixed' interval, exponential 'backoff', or 'adaptive' "
+        "based on the estimated time to completion and progress of the job."
+    ),
+    show_default=False,
+)
+RESULT_CACHE_DIR_OPTION = typer.Option(
+    None,
+    help=(
+        "Directory of a local cache of results. Inputs identical (by content and arguments) to an already "
+        "processed one are taken from the cache instead of being uploaded again."
+    ),
+    show_default=False,
+)
+RESULT_CACHE_MAX_SIZE_OPTION = typer.Option(
+    10.0,
+    help="Size in GB up to which the result cache grows before old results are evicted",
+)
+RESULT_CACHE_HARDLINKS_OPTION = typer.Option(
+    False,
+    help="Hardlink cached results into the output directory if they can't be cloned (no copy, but shared)",
+)
+UPLOAD_CONCURRENCY_MODE_OPTION = typer.Option(
+    settings.upload_concurrency_mode,
+    help=(
+        "'fixed' number of concurrent uploads, or 'adaptive' which raises it while the upload throughput "
+        "improves and backs off when the server throttles"
+    ),
+)
+MAX_CONCURRENT_UPLOADS_OPTION = typer.Option(
+    settings.max_concurrent_uploads,
+    help="Number of concurrent uploads (the initial one in the adaptive mode)",
+)
+RATE_LIMIT_OPTION = typer.Option(
+    [],
+    help=(
+        "Client-side rate limit as ENDPOINT=REQUESTS_PER_SECOND, where ENDPOINT is post, status, download or "
+        "delete. Can be given several times."
+    ),
+)
+RATE_LIMIT_FILE_OPTION = typer.Option(
+    None,
+    help="State file of the rate limits, processes using the same file share one budget (e.g. one API key)",
+    show_default=False,
+)
+HTTP2_OPTION = typer.Option(
+    settings.http2,
+    help="Multiplex the requests over HTTP/2 connections (needs the h2 package: pip install redact[http2])",
+)
+MAX_CONNECTIONS_OPTION = typer.Option(
+    settings.max_connections,
+    help="Maximum number of connections to Redact, 0 for no limit",
+)
+MAX_KEEPALIVE_CONNECTIONS_OPTION = typer.Option(
+    settings.max_keepalive_connections,
+    help="Maximum number of idle connections kept open, 0 for no limit",
+)
+KEEPALIVE_EXPIRY_OPTION = typer.Option(
+    settings.keepalive_expiry,
+    help="Seconds after which idle connections are closed",
+)
+
+
+def create_optional_polling_strategy(
+    polling_strategy: Optional[PollingStrategyType],
+) -> Optional[PollingStrategy]:
+    if polling_strategy is None:
+        return None
+    return create_polling_strategy(polling_strategy)
+
+
+def create_result_cache(
+    result_cache_dir: Optional[str], max_size: float, hardlinks: bool
+) -> Optional[ResultCache]:
+    if result_cache_dir is None:
+        return None
+    return ResultCache(
+        result_cache_dir, max_size=int(max_size * 1024**3), allow_hardlinks=hardlinks
+    )
+
+
+def configure_http_client(
+    http2: bool,
+    max_connections: Optional[int],
+    max_keepalive_connections: Optional[int],
+    keepalive_expiry: float,
+) -> None:
+    set_default_http_client_options(
+        HttpClientOptions(
+            http2=http2,
+            # 0 means no limit
+            max_connections=max_connections or None,
+            max_keepalive_connections=max_keepalive_connections or None,
+            keepalive_expiry=keepalive_expiry,
+        )
+    )
+
+
+def configure_upload_concurrency(
+    mode: UploadConcurrencyMode, max_concurrent_uploads: int
+) -> None:
+    set_default_upload_concurrency_controller(
+        create_upload_concurrency_controller(
+            mode=mode,
+            limit=max_concurrent_uploads,
+            max_limit=settings.adaptive_max_concurrent_uploads,
+        )
+    )
+
+
+def configure_rate_limiter(
+    rate_limits: List[str], rate_limit_file: Optional[str]
+) -> None:
+    if not rate_limits and rate_limit_file is None:
+        # the rate limits of the settings apply
+        return
+    set_default_rate_limiter(
+        create_rate_limiter(parse_rate_limits(rate_limits), state_file=rate_limit_file)
+    )
@@ -2,8 +2,30 @@ from typing import List, Optional
 
 import typer
 
+from redact.commons.polling import PollingStrategyType
+from redact.commons.scheduling import SchedulingPolicy
+from redact.commons.upload_concurrency import UploadConcurrencyMode
 from redact.commons.utils import parse_key_value_pairs, setup_logging
 from redact.settings import Settings
+from redact.tools.common import (
+    HTTP2_OPTION,
+    KEEPALIVE_EXPIRY_OPTION,
+    MAX_CONCURRENT_UPLOADS_OPTION,
+    MAX_CONNECTIONS_OPTION,
+    MAX_KEEPALIVE_CONNECTIONS_OPTION,
+    POLLING_STRATEGY_OPTION,
+    RATE_LIMIT_FILE_OPTION,
+    RATE_LIMIT_OPTION,
+    RESULT_CACHE_DIR_OPTION,
+    RESULT_CACHE_HARDLINKS_OPTION,
+    RESULT_CACHE_MAX_SIZE_OPTION,
+    UPLOAD_CONCURRENCY_MODE_OPTION,
+    configure_http_client,
+    configure_rate_limiter,
+    configure_upload_concurrency,
+    create_optional_polling_strategy,
+    create_result_cache,
+)
 from redact.v3 import InputType, JobArguments, OutputType, Region, ServiceType
 from redact.v3.tools.redact_file import redact_file as rdct_file
 from redact.v3.tools.redact_folder import redact_folder as rdct_folder
@@ -103,8 +125,25 @@ def redact_file(
         [],
         help="Key-value pairs in the format key=value which will be added to allr equest header",
     ),
+    polling_strategy: Optional[PollingStrategyType] = POLLING_STRATEGY_OPTION,
+    result_cache_dir: Optional[str] = RESULT_CACHE_DIR_OPTION,
+    result_cache_max_size: float = RESULT_CACHE_MAX_SIZE_OPTION,
+    result_cache_hardlinks: bool = RESULT_CACHE_HARDLINKS_OPTION,
+    upload_concurrency_mode: UploadConcurrencyMode = UPLOAD_CONCURRENCY_MODE_OPTION,
+    max_concurrent_uploads: int = MAX_CONCURRENT_UPLOADS_OPTION,
+    rate_limit: List[str] = RATE_LIMIT_OPTION,
+    rate_limit_file: Optional[str] = RATE_LIMIT_FILE_OPTION,
+    http2: bool = HTTP2_OPTION,
+    max_connections: Optional[int] = MAX_CONNECTIONS_OPTION,
+    max_keepalive_connections: Optional[int] = MAX_KEEPALIVE_CONNECTIONS_OPTION,
+    keepalive_expiry: float = KEEPALIVE_EXPIRY_OPTION,
 ):
     setup_logging(verbose_logging)
+    configure_rate_limiter(rate_limit, rate_limit_file)
+    configure_http_client(
+        http2, max_connections, max_keepalive_connections, keepalive_expiry
+    )
+    configure_upload_concurrency(upload_concurrency_mode, max_concurrent_uploads)
 
     parsed_header = parse_key_value_pairs(custom_headers)
 
@@ -134,6 +173,10 @@ def redact_file(
         save_labels=save_labels,
         auto_delete_job=auto_delete_job,
         custom_headers=parsed_header,
+        polling_strategy=create_optional_polling_strategy(polling_strategy),
+        result_cache=create_result_cache(
+            result_cache_dir, result_cache_max_size, result_cache_hardlinks
+        ),
     )
 
 
@@ -231,8 +274,44 @@ def redact_folder(
         [],
         help="Key-value pairs in the format key=value which will be added to allr equest header",
     ),
+    polling_strategy: Optional[PollingStrategyType] = POLLING_STRATEGY_OPTION,
+    n_discovery_workers: int = typer.Option(
+        1,
+        help="Number of threads listing the folders of the input directory in parallel (e.g. for network storage)",
+    ),
+    scheduling_policy: SchedulingPolicy = typer.Option(
+        SchedulingPolicy.discovery,
+        help=(
+            "Order in which the files are processed: as they are found ('discovery'), 'largest_first' to finish "
+            "the whole folder soonest, 'smallest_first' for many early results, 'newest_first' or 'oldest_first' "
+            "by modification time"
+        ),
+    ),
+    priority_pattern: List[str] = typer.Option(
+        [],
+        help=(
+            "Process files matching this glob pattern (relative to the input directory, e.g. 'urgent/*') first. "
+            "Can be given several times, earlier patterns come first."
+        ),
+    ),
+    result_cache_dir: Optional[str] = RESULT_CACHE_DIR_OPTION,
+    result_cache_max_size: float = RESULT_CACHE_MAX_SIZE_OPTION,
+    result_cache_hardlinks: bool = RESULT_CACHE_HARDLINKS_OPTION,
+    upload_concurrency_mode: UploadConcurrencyMode = UPLOAD_CONCURRENCY_MODE_OPTION,
+    max_concurrent_uploads: int = MAX_CONCURRENT_UPLOADS_OPTION,
+    rate_limit: List[str] = RATE_LIMIT_OPTION,
+    rate_limit_file: Optional[str] = RATE_LIMIT_FILE_OPTION,
+    http2: bool = HTTP2_OPTION,
+    max_connections: Optional[int] = MAX_CONNECTIONS_OPTION,
+    max_keepalive_connections: Optional[int] = MAX_KEEPALIVE_CONNECTIONS_OPTION,
+    keepalive_expiry: float = KEEPALIVE_EXPIRY_OPTION,
 ):
     setup_logging(verbose_logging)
+    configure_rate_limiter(rate_limit, rate_limit_file)
+    configure_http_client(
+        http2, max_connections, max_keepalive_connections, keepalive_expiry
+    )
+    configure_upload_concurrency(upload_concurrency_mode, max_concurrent_uploads)
 
     parsed_header = parse_key_value_pairs(custom_headers)
 
@@ -264,4 +343,11 @@ def redact_folder(
         auto_delete_job=auto_delete_job,
         auto_delete_input_file=auto_delete_input_file,
         custom_headers=parsed_header,
+        polling_strategy=polling_strategy,
+        n_discovery_workers=n_discovery_workers,
+        scheduling_policy=scheduling_policy,
+        priority_patterns=priority_pattern,
+        result_cache=create_result_cache(
+            result_cache_dir, result_cache_max_size, result_cache_hardlinks
+        ),
     )
@@ -2,11 +2,37 @@ from typing import List, Optional
 
 import typer
 
+from redact.commons.load_balancing import LoadBalancingPolicyType
+from redact.commons.polling import PollingStrategyType
+from redact.commons.scheduling import SchedulingPolicy
+from redact.commons.upload_concurrency import UploadConcurrencyMode
 from redact.commons.utils import parse_key_value_pairs, setup_logging
+from redact.commons.watch import WatchOptions
 from redact.settings import Settings
+from redact.tools.common import (
+    HTTP2_OPTION,
+    KEEPALIVE_EXPIRY_OPTION,
+    MAX_CONCURRENT_UPLOADS_OPTION,
+    MAX_CONNECTIONS_OPTION,
+    MAX_KEEPALIVE_CONNECTIONS_OPTION,
+    POLLING_STRATEGY_OPTION,
+    RATE_LIMIT_FILE_OPTION,
+    RATE_LIMIT_OPTION,
+    RESULT_CACHE_DIR_OPTION,
+    RESULT_CACHE_HARDLINKS_OPTION,
+    RESULT_CACHE_MAX_SIZE_OPTION,
+    UPLOAD_CONCURRENCY_MODE_OPTION,
+    configure_http_client,
+    configure_rate_limiter,
+    configure_upload_concurrency,
+    create_optional_polling_strategy,
+    create_result_cache,
+)
 from redact.v4 import InputType, JobArguments, OutputType, Region, ServiceType
 from redact.v4.tools.redact_file import redact_file as rdct_file
 from redact.v4.tools.redact_folder import redact_folder as rdct_folder
+from redact.v4.tools.redact_folder_pipeline import PipelineOptions
+from redact.v4.webhook_receiver import WebhookReceiverOptions
 
 settings = Settings()
 
@@ -145,8 +171,25 @@ def redact_file(
             "If not set, the timeout will be automatically calculated based on the file size."
         ),
     ),
+    polling_strategy: Optional[PollingStrategyType] = POLLING_STRATEGY_OPTION,
+    result_cache_dir: Optional[str] = RESULT_CACHE_DIR_OPTION,
+    result_cache_max_size: float = RESULT_CACHE_MAX_SIZE_OPTION,
+    result_cache_hardlinks: bool = RESULT_CACHE_HARDLINKS_OPTION,
+    upload_concurrency_mode: UploadConcurrencyMode = UPLOAD_CONCURRENCY_MODE_OPTION,
+    max_concurrent_uploads: int = MAX_CONCURRENT_UPLOADS_OPTION,
+    rate_limit: List[str] = RATE_LIMIT_OPTION,
+    rate_limit_file: Optional[str] = RATE_LIMIT_FILE_OPTION,
+    http2: bool = HTTP2_OPTION,
+    max_connections: Optional[int] = MAX_CONNECTIONS_OPTION,
+    max_keepalive_connections: Optional[int] = MAX_KEEPALIVE_CONNECTIONS_OPTION,
+    keepalive_expiry: float = KEEPALIVE_EXPIRY_OPTION,
 ):
     setup_logging(verbose_logging)
+    configure_rate_limiter(rate_limit, rate_limit_file)
+    configure_http_client(
+        http2, max_connections, max_keepalive_connections, keepalive_expiry
+    )
+    configure_upload_concurrency(upload_concurrency_mode, max_concurrent_uploads)
 
     parsed_header = parse_key_value_pairs(custom_headers)
 
@@ -179,6 +222,10 @@ def redact_file(
         auto_delete_job=auto_delete_job,
         custom_headers=parsed_header,
         start_job_timeout=start_job_timeout,
+        polling_strategy=create_optional_polling_strategy(polling_strategy),
+        result_cache=create_result_cache(
+            result_cache_dir, result_cache_max_size, result_cache_hardlinks
+        ),
     )
 
 
@@ -263,9 +310,19 @@ def redact_folder(
         help="A URL to call when the status of the Job changes",
         show_default=False,
     ),
-    redact_url: str = typer.Option(
-        settings.redact_online_url,
-        help="Specify http address or ip of the redact instance",
+    redact_url: List[str] = typer.Option(
+        [settings.redact_online_url],
+        help=(
+            "Specify http address or ip of the redact instance. Can be given several times to distribute the jobs "
+            "across several instances"
+        ),
+    ),
+    load_balancing_policy: LoadBalancingPolicyType = typer.Option(
+        LoadBalancingPolicyType.least_outstanding,
+        help=(
+            "How jobs are distributed across several redact instances: 'round_robin', to the instance with the "
+            "fewest unfinished jobs ('least_outstanding') or the one expected to be done first ('eta_aware')"
+        ),
     ),
     api_key: Optional[str] = typer.Option(
         None,
@@ -311,8 +368,128 @@ def redact_folder(
             "If not set, the timeout will be automatically calculated based on the file size."
         ),
     ),
+    pipelined: bool = typer.Option(
+        False,
+        help=(
+            "Process files in a pipeline with separate upload, status polling, download and delete stages, "
+            "so uploads of later files overlap with the processing of earlier ones."
+        ),
+    ),
+    n_upload_workers: Optional[int] = typer.Option(
+        None,
+        help="Number of parallel uploads in pipelined mode [default: N_PARALLEL_JOBS]",
+        show_default=False,
+    ),
+    n_poll_workers: Optional[int] = typer.Option(
+        None,
+        help="Number of threads polling job statuses in pipelined mode [default: 1]",
+        show_default=False,
+    ),
+    n_download_workers: Optional[int] = typer.Option(
+        None,
+        help="Number of parallel downloads in pipelined mode [default: N_PARALLEL_JOBS]",
+        show_default=False,
+    ),
+    n_delete_workers: Optional[int] = typer.Option(
+        None,
+        help="Number of threads deleting finished jobs in pipelined mode [default: 1]",
+        show_default=False,
+    ),
+    max_jobs_in_flight: Optional[int] = typer.Option(
+        None,
+        help="Maximum number of uploaded but not yet downloaded jobs in pipelined mode [default: 2 * N_PARALLEL_JOBS]",
+        show_default=False,
+    ),
+    shared_status_poller: bool = typer.Option(
+        False,
+        help="Poll the status of all running jobs from one shared poller instead of one loop per job.",
+    ),
+    polling_strategy: Optional[PollingStrategyType] = POLLING_STRATEGY_OPTION,
+    webhook_receiver: bool = typer.Option(
+        False,
+        help=(
+            "Start an embedded HTTP server receiving the status webhooks of all jobs, so finished jobs are "
+            "downloaded right away without polling their status. Overrides --status-webhook-url."
+        ),
+    ),
+    webhook_host: str = typer.Option(
+        "127.0.0.1",
+        help="Interface the embedded webhook receiver listens on, 0.0.0.0 if Redact runs on another machine",
+    ),
+    webhook_port: int = typer.Option(
+        0, help="Port of the embedded webhook receiver (0 picks a free port)"
+    ),
+    webhook_public_url: Optional[str] = typer.Option(
+        None,
+        help=(
+            "URL under which Redact reaches the embedded webhook receiver, a random path is appended "
+            "[default: http://HOST:PORT/]"
+        ),
+        show_default=False,
+    ),
+    webhook_fallback_poll_interval: float = typer.Option(
+        60.0,
+        help="Seconds between status checks of jobs when using the webhook receiver, in case callbacks get lost",
+    ),
+    journal: bool = typer.Option(
+        False,
+        help=(
+            "Record uploaded jobs in a journal in the output directory, so a restarted run reattaches to the jobs "
+            "of an interrupted one instead of uploading the files again"
+        ),
+    ),
+    n_discovery_workers: int = typer.Option(
+        1,
+        help="Number of threads listing the folders of the input directory in parallel (e.g. for network storage)",
+    ),
+    scheduling_policy: SchedulingPolicy = typer.Option(
+        SchedulingPolicy.discovery,
+        help=(
+            "Order in which the files are processed: as they are found ('discovery'), 'largest_first' to finish "
+            "the whole folder soonest, 'smallest_first' for many early results, 'newest_first' or 'oldest_first' "
+            "by modification time"
+        ),
+    ),
+    priority_pattern: List[str] = typer.Option(
+        [],
+        help=(
+            "Process files matching this glob pattern (relative to the input directory, e.g. 'urgent/*') first. "
+            "Can be given several times, earlier patterns come first."
+        ),
+    ),
+    watch: bool = typer.Option(
+        False,
+        help=(
+            "Keep watching the input directory after the existing files were processed, and process new files "
+            "once they are complete, until stopped with CTRL+C. Ignores --scheduling-policy and --priority-pattern."
+        ),
+    ),
+    watch_quiet_period: float = typer.Option(
+        5.0,
+        help="Seconds a new file must stay unchanged before it is processed in watch mode (e.g. while copying)",
+    ),
+    watch_poll_interval: float = typer.Option(
+        2.0,
+        help="Seconds between scans of the input directory in watch mode where inotify isn't available",
+    ),
+    result_cache_dir: Optional[str] = RESULT_CACHE_DIR_OPTION,
+    result_cache_max_size: float = RESULT_CACHE_MAX_SIZE_OPTION,
+    result_cache_hardlinks: bool = RESULT_CACHE_HARDLINKS_OPTION,
+    upload_concurrency_mode: UploadConcurrencyMode = UPLOAD_CONCURRENCY_MODE_OPTION,
+    max_concurrent_uploads: int = MAX_CONCURRENT_UPLOADS_OPTION,
+    rate_limit: List[str] = RATE_LIMIT_OPTION,
+    rate_limit_file: Optional[str] = RATE_LIMIT_FILE_OPTION,
+    http2: bool = HTTP2_OPTION,
+    max_connections: Optional[int] = MAX_CONNECTIONS_OPTION,
+    max_keepalive_connections: Optional[int] = MAX_KEEPALIVE_CONNECTIONS_OPTION,
+    keepalive_expiry: float = KEEPALIVE_EXPIRY_OPTION,
 ):
     setup_logging(verbose_logging)
+    configure_rate_limiter(rate_limit, rate_limit_file)
+    configure_http_client(
+        http2, max_connections, max_keepalive_connections, keepalive_expiry
+    )
+    configure_upload_concurrency(upload_concurrency_mode, max_concurrent_uploads)
 
     parsed_header = parse_key_value_pairs(custom_headers)
 
@@ -331,6 +508,29 @@ def redact_folder(
         areas_of_interest=areas_of_interest,
     )
 
+    pipeline_options = PipelineOptions(
+        n_upload_workers=n_upload_workers,
+        n_poll_workers=n_poll_workers,
+        n_download_workers=n_download_workers,
+        n_delete_workers=n_delete_workers,
+        max_jobs_in_flight=max_jobs_in_flight,
+    )
+
+    watch_options = None
+    if watch:
+        watch_options = WatchOptions(
+            quiet_period=watch_quiet_period, poll_interval=watch_poll_interval
+        )
+
+    webhook_receiver_options = None
+    if webhook_receiver:
+        webhook_receiver_options = WebhookReceiverOptions(
+            host=webhook_host,
+            port=webhook_port,
+            public_url=webhook_public_url,
+            fallback_poll_interval=webhook_fallback_poll_interval,
+        )
+
     rdct_folder(
         input_dir=input_dir,
         output_dir=output_dir,
@@ -348,4 +548,18 @@ def redact_folder(
         auto_delete_input_file=auto_delete_input_file,
         custom_headers=parsed_header,
         start_job_timeout=start_job_timeout,
+        pipelined=pipelined,
+        pipeline_options=pipeline_options,
+        shared_status_poller=shared_status_poller,
+        polling_strategy=polling_strategy,
+        webhook_receiver_options=webhook_receiver_options,
+        journal=journal,
+        n_discovery_workers=n_discovery_workers,
+        scheduling_policy=scheduling_policy,
+        priority_patterns=priority_pattern,
+        watch_options=watch_options,
+        result_cache=create_result_cache(
+            result_cache_dir, result_cache_max_size, result_cache_hardlinks
+        ),
+        load_balancing_policy=load_balancing_policy,
     )
@@ -1,5 +1,6 @@
 from typing import IO, BinaryIO, Dict, Optional, Union
 
+from redact.commons.multipart import ProgressCallback
 from redact.settings import Settings
 from redact.v3.data_models import JobArguments, JobLabels, OutputType, ServiceType
 from redact.v3.redact_job import RedactJob
@@ -54,6 +55,7 @@ class RedactInstance:
         job_args: Optional[JobArguments] = None,
         licence_plate_custom_stamp: Optional[BinaryIO] = None,
         custom_labels: Optional[Union[str, IO, JobLabels]] = None,
+        progress_callback: Optional[ProgressCallback] = None,
     ) -> RedactJob:
         post_response = self.redact_requests.post_job(
             file=file,
@@ -62,6 +64,7 @@ class RedactInstance:
             job_args=job_args,
             licence_plate_custom_stamp=licence_plate_custom_stamp,
             custom_labels=custom_labels,
+            progress_callback=progress_callback,
         )
         return RedactJob(
             redact_requests=self.redact_requests,
@@ -1,18 +1,39 @@
 import logging
-import tempfile
-import threading
+import os
 import time
-import urllib.parse
 import uuid
 from io import FileIO
 from pathlib import Path
-from typing import IO, Any, Dict, Optional, Union
+from typing import IO, Any, Dict, List, Optional, Union
 from uuid import UUID
 
 import httpx
 
 from redact.api_versions import REDACT_API_VERSIONS
-from redact.errors import FileDownloadError, RedactConnectError, RedactResponseError
+from redact.commons.download import (
+    DEFAULT_MIN_SEGMENT_SIZE,
+    DownloadOptions,
+    PartialDownload,
+    read_into_buffer,
+    stream_to_file,
+    write_segmented,
+)
+from redact.commons.endpoints import RedactEndpointsMixin
+from redact.commons.http_client import get_http_client
+from redact.commons.multipart import ProgressCallback, StreamingMultipartBody
+from redact.commons.rate_limit import (
+    EndpointClass,
+    RateLimiter,
+    get_default_rate_limiter,
+)
+from redact.commons.result_buffer import DEFAULT_MAX_MEMORY_SIZE, ResultBuffer
+from redact.commons.retry import RetryBackoff, StatusRetryPolicy
+from redact.commons.upload_concurrency import (
+    THROTTLING_STATUS_CODES,
+    UploadConcurrencyController,
+    get_default_upload_concurrency_controller,
+)
+from redact.errors import RedactConnectError, RedactResponseError
 from redact.settings import Settings
 from redact.utils import normalize_url, retrieve_file_name
 from redact.v3.data_models import (
@@ -26,24 +47,19 @@ from redact.v3.data_models import (
 
 settings = Settings()
 
-_client_creation_lock = threading.Lock()
-_client_singleton: Optional[httpx.Client] = None  # see get_singleton_client
-
-# limit post requests, because their concurrency seems to put a lot of strain on the API Management
-_post_lock = threading.BoundedSemaphore(2)
-
 log = logging.getLogger("redact-requests")
 
 
-def get_singleton_client():
-    global _client_singleton
-    with _client_creation_lock:
-        if _client_singleton is None:
-            _client_singleton = httpx.Client()
-        return _client_singleton
+def get_singleton_client(
+    redact_url: str = settings.redact_url_default,
+) -> httpx.Client:
+    """
+    Returns the client shared by all RedactRequests (v3 and v4) talking to the Redact instance at redact_url.
+    """
+    return get_http_client(redact_url)
 
 
-class RedactRequests:
+class RedactRequests(RedactEndpointsMixin):
     """
     Helper class wrapping requests to the Redact API.
     """
@@ -57,6 +73,10 @@ class RedactRequests:
         api_key: Optional[str] = None,
         httpx_client: Optional[httpx.Client] = None,
         custom_headers: Optional[Dict] = None,
+        upload_concurrency: Optional[UploadConcurrencyController] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        status_retry_policy: Optional[StatusRetryPolicy] = None,
+        download_options: Optional[DownloadOptions] = None,
     ):
         self.redact_url = normalize_url(redact_url)
         self.api_key = api_key
@@ -73,7 +93,21 @@ class RedactRequests:
             self._headers["Subscription-Id"] = self.subscription_id
 
         # httpx.Client client is thread safe, see https://github.com/encode/httpx/discussions/1633
-        self._client = httpx_client or get_singleton_client()
+        self._client = httpx_client or get_singleton_client(self.redact_url)
+        # shared by all instances by default, so the limit applies to the whole process
+        self._upload_concurrency = (
+            upload_concurrency or get_default_upload_concurrency_controller()
+        )
+        self._rate_limiter = rate_limiter or get_default_rate_limiter()
+        self._status_retry_policy = status_retry_policy or StatusRetryPolicy()
+        self.download_options = download_options or DownloadOptions()
+
+    @property
+    def redact_urls(self) -> List[str]:
+        """
+        The Redact instances the jobs go to, like RedactRequestsPool.redact_urls.
+        """
+        return [self.redact_url]
 
     def post_job(
         self,
@@ -83,9 +117,11 @@ class RedactRequests:
         job_args: Optional[JobArguments] = None,
         licence_plate_custom_stamp: Optional[IO] = None,
         custom_labels: Optional[Union[str, IO, JobLabels]] = None,
+        progress_callback: Optional[ProgressCallback] = None,
     ) -> JobPostResponse:
         """
-        Post the job via a post request.
+        Post the job via a post request. The files are streamed in chunks, progress_callback is called with the
+        number of bytes sent so far and the total size of the request body.
         """
 
         try:
@@ -95,9 +131,7 @@ class RedactRequests:
                 "Expecting 'file' argument to have a 'name' attribute, i.e., FileIO."
             ) from e
 
-        url = urllib.parse.urljoin(
-            self.redact_url, f"{service}/{self.API_VERSION}/{out_type}"
-        )
+        url = self._get_job_url(service, out_type)
 
         if not job_args:
             job_args = JobArguments()
@@ -116,17 +150,31 @@ class RedactRequests:
         if custom_labels:
             files["custom_labels"] = custom_labels_filelike
 
+        body = StreamingMultipartBody(files, progress_callback=progress_callback)
+
         upload_debug_uuid = uuid.uuid4()
-        with _post_lock:
+        with self._upload_concurrency.slot() as upload_slot:
+
+            def post(**kwargs) -> httpx.Response:
+                try:
+                    response = self._client.post(**kwargs)
+                except httpx.TimeoutException:
+                    upload_slot.throttled()
+                    raise
+                if response.status_code in THROTTLING_STATUS_CODES:
+                    upload_slot.throttled()
+                return response
+
             log.debug(f"Posting to {url} debug id (not output_id): {upload_debug_uuid}")
             # TODO: Remove the timeout when Redact responds quicker after uploading large files
             response = self._retry_on_network_problem_with_backoff(
-                self._client.post,
+                post,
                 debug_uuid=upload_debug_uuid,
+                endpoint_class=EndpointClass.post,
                 url=url,
-                files=files,
+                content=body,
                 params=job_args.dict(exclude_none=True),
-                headers=self._headers,
+                headers={**self._headers, **body.headers},
                 timeout=60.0,
             )
             log.debug(
@@ -137,6 +185,7 @@ class RedactRequests:
                     response=response, msg=f"Error posting job: {response.content}"
                 )
 
+            upload_slot.succeeded(len(body))
             return JobPostResponse(**response.json())
 
     def get_output(
@@ -161,6 +210,7 @@ class RedactRequests:
             url,
             params=query_params,
             headers=self._headers,
+            endpoint_class=EndpointClass.download,
         )
 
         if response.status_code != 200:
@@ -176,51 +226,37 @@ class RedactRequests:
             file_name=retrieve_file_name(headers=response.headers),
         )
 
-    def _stream_output_to_file(
+    def get_output_buffer(
         self,
-        debug_uuid,
-        output_id,
-        file: Path,
-        url,
-        params,
-        headers,
-    ) -> Optional[Path]:
-        with self._client.stream(
-            "GET", url, params=params, headers=headers
-        ) as response:
-            if response.status_code != 200:
-                raise RedactResponseError(
-                    response=response,
-                    msg=f"Error downloading job result for output_id {output_id}, debug_uuid {debug_uuid}: "
-                    f"{response.read().decode()}",
-                )
-            temp_file = tempfile.NamedTemporaryFile(
-                "wb", dir=str(file.parent), delete=False
-            )
-            finished = False
-            target_file = Path(temp_file.name)
-            try:
-                with temp_file:
-                    for chunk in response.iter_bytes():
-                        temp_file.write(chunk)
-                finished = True
-            finally:
-                if finished:
-                    file_name = Path(retrieve_file_name(headers=response.headers))
-                    log.debug(f"getting headers file type suffix {file_name}")
-                    anonymized_path = (
-                        Path(file).parent / f"{file.stem}{file_name.suffix}"
-                    )
-
-                    target_file.rename(anonymized_path)
-                    log.debug(
-                        f"temp file {target_file} has been renamed into {anonymized_path}"
-                    )
-                    return anonymized_path
-                else:
-                    target_file.unlink(missing_ok=True)
-
-                    raise FileDownloadError(f"failed to download the file {file}")
+        service: ServiceType,
+        out_type: OutputType,
+        output_id: UUID,
+        ignore_warnings: bool = False,
+        max_memory_size: int = DEFAULT_MAX_MEMORY_SIZE,
+    ) -> ResultBuffer:
+        """
+        Retrieves job result into a ResultBuffer, i.e. into memory preallocated from the Content-Length of the
+        response (without the copies of get_output), or into a temp file if it is larger than max_memory_size.
+        """
+
+        url = self._get_output_download_url(service, out_type, output_id)
+
+        query_params = self._get_output_download_query_params(ignore_warnings)
+
+        debug_uuid = uuid.uuid4()
+        return self._retry_on_network_problem_with_backoff(
+            read_into_buffer,
+            debug_uuid,
+            self._client,
+            url,
+            query_params,
+            self._headers,
+            output_id,
+            debug_uuid,
+            max_memory_size,
+            chunk_size=self.download_options.chunk_size,
+            endpoint_class=EndpointClass.download,
+        )
 
     def write_output_to_file(
         self,
@@ -229,10 +265,16 @@ class RedactRequests:
         output_id: UUID,
         file: Path,
         ignore_warnings: bool = False,
+        n_segments: int = 1,
+        min_segment_size: int = DEFAULT_MIN_SEGMENT_SIZE,
     ) -> Optional[Path]:
         """
         Retrieves job result and streams it to file, greatly reducing memory load
         and resolving memory fragmentation problems.
+
+        With n_segments > 1, the result is downloaded as up to n_segments byte ranges
+        of at least min_segment_size bytes in parallel (if the server supports range
+        requests), which is faster for large results on high-latency connections.
         """
 
         url = self._get_output_download_url(service, out_type, output_id)
@@ -240,40 +282,59 @@ class RedactRequests:
         query_params = self._get_output_download_query_params(ignore_warnings)
 
         debug_uuid = uuid.uuid4()
-        return self._retry_on_network_problem_with_backoff(
-            self._stream_output_to_file,
-            debug_uuid,
-            debug_uuid,
-            output_id,
-            file,
-            url,
-            params=query_params,
-            headers=self._headers,
-        )
+        if n_segments > 1 and hasattr(os, "pwrite"):
+
+            def retry(func, *args, **kwargs):
+                return self._retry_on_network_problem_with_backoff(
+                    func,
+                    debug_uuid,
+                    *args,
+                    endpoint_class=EndpointClass.download,
+                    **kwargs,
+                )
 
-    def _get_output_download_query_params(self, ignore_warnings: bool):
-        return {
-            "ignore_warnings": ignore_warnings,
-        }
+            return write_segmented(
+                self._client,
+                url,
+                query_params,
+                self._headers,
+                file,
+                retry,
+                n_segments=n_segments,
+                min_segment_size=min_segment_size,
+                options=self.download_options,
+                output_id=output_id,
+                debug_uuid=debug_uuid,
+            )
 
-    def _get_output_download_url(
-        self, service: ServiceType, out_type: OutputType, output_id: UUID
-    ):
-        return urllib.parse.urljoin(
-            self.redact_url, f"{service}/{self.API_VERSION}/{out_type}/{output_id}"
-        )
+        # kept across the retries of the download, which continue where the previous attempt stopped
+        with PartialDownload(file.parent, self.download_options) as partial_download:
+            return self._retry_on_network_problem_with_backoff(
+                stream_to_file,
+                debug_uuid,
+                self._client,
+                url,
+                query_params,
+                self._headers,
+                file,
+                partial_download,
+                output_id,
+                debug_uuid,
+                endpoint_class=EndpointClass.download,
+            )
 
     def get_status(
         self, service: ServiceType, out_type: OutputType, output_id: UUID
     ) -> Dict:
-        url = urllib.parse.urljoin(
-            self.redact_url,
-            f"{service}/{self.API_VERSION}/{out_type}/{output_id}/status",
-        )
+        url = self._get_output_url(service, out_type, output_id, "status")
 
         debug_uuid = uuid.uuid4()
         response = self._retry_on_network_problem_with_backoff(
-            self._client.get, debug_uuid, url, headers=self._headers
+            self._client.get,
+            debug_uuid,
+            url,
+            headers=self._headers,
+            endpoint_class=EndpointClass.status,
         )
 
         if response.status_code != 200:
@@ -288,14 +349,16 @@ class RedactRequests:
         output_id: UUID,
         timeout: float = 60.0,
     ) -> JobLabels:
-        url = urllib.parse.urljoin(
-            self.redact_url,
-            f"{service}/{self.API_VERSION}/{out_type}/{output_id}/labels",
-        )
+        url = self._get_output_url(service, out_type, output_id, "labels")
 
         debug_uuid = uuid.uuid4()
         response = self._retry_on_network_problem_with_backoff(
-            self._client.get, debug_uuid, url, headers=self._headers, timeout=timeout
+            self._client.get,
+            debug_uuid,
+            url,
+            headers=self._headers,
+            timeout=timeout,
+            endpoint_class=EndpointClass.status,
         )
 
         if response.status_code != 200:
@@ -306,13 +369,15 @@ class RedactRequests:
     def delete_output(
         self, service: ServiceType, out_type: OutputType, output_id: UUID
     ) -> Dict:
-        url = urllib.parse.urljoin(
-            self.redact_url, f"{service}/{self.API_VERSION}/{out_type}/{output_id}"
-        )
+        url = self._get_output_url(service, out_type, output_id)
 
         debug_uuid = uuid.uuid4()
         response = self._retry_on_network_problem_with_backoff(
-            self._client.delete, debug_uuid, url, headers=self._headers
+            self._client.delete,
+            debug_uuid,
+            url,
+            headers=self._headers,
+            endpoint_class=EndpointClass.delete,
         )
 
         if response.status_code != 200:
@@ -323,14 +388,15 @@ class RedactRequests:
     def get_error(
         self, service: ServiceType, out_type: OutputType, output_id: UUID
     ) -> Dict:
-        url = urllib.parse.urljoin(
-            self.redact_url,
-            f"{service}/{self.API_VERSION}/{out_type}/{output_id}/error",
-        )
+        url = self._get_output_url(service, out_type, output_id, "error")
 
         debug_uuid = uuid.uuid4()
         response = self._retry_on_network_problem_with_backoff(
-            self._client.get, debug_uuid, url, headers=self._headers
+            self._client.get,
+            debug_uuid,
+            url,
+            headers=self._headers,
+            endpoint_class=EndpointClass.status,
         )
 
         if response.status_code != 200:
@@ -338,52 +404,57 @@ class RedactRequests:
 
         return response.json()
 
-    def _calculate_retry_backoff(
+    def _retry_on_network_problem_with_backoff(
         self,
+        func,
         debug_uuid: uuid.UUID,
-        retry_start: float,
-        retry_delay: float,
-        exc_info: BaseException,
-    ):
-        if retry_start == -1:
-            retry_start = time.time()
-            retry_delay = 1  # start by waiting 2 seconds - going to double it below
-
-        retry_runtime = time.time() - retry_start
-        if retry_runtime > self.retry_total_time_limit:
-            log.debug("Aborting retry due to exceeding retry limit")
-            return retry_start, -1
-        max_retry_delay_remaining = max(
-            1, self.retry_total_time_limit - retry_runtime
-        )  # max to ensure positive
-        retry_delay = min(2 * retry_delay, max_retry_delay_remaining)
-
-        log.debug(
-            f"Network exception '{exc_info}' caught on request {debug_uuid}, "
-            f"retrying after {retry_delay:.2f}s."
-        )
-        return retry_start, retry_delay
-
-    def _retry_on_network_problem_with_backoff(
-        self, func, debug_uuid: uuid.UUID, *positional_arguments, **keyword_arguments
+        *positional_arguments,
+        endpoint_class: Optional[EndpointClass] = None,
+        **keyword_arguments,
     ) -> Any:
-        retry_start = -1
-        retry_delay = -1
-
+        backoff = RetryBackoff(
+            self.retry_total_time_limit, self._status_retry_policy, debug_uuid
+        )
+        idempotent = endpoint_class != EndpointClass.post
         while True:
+            # every attempt takes a token, so retries don't exceed the rate limit either
+            if endpoint_class is not None:
+                self._rate_limiter.acquire(endpoint_class)
             try:
-                return func(*positional_arguments, **keyword_arguments)
+                result = func(*positional_arguments, **keyword_arguments)
+            except RedactResponseError as e:
+                # raised by functions which consume the response themselves, e.g. stream_to_file
+                if not self._status_retry_policy.is_retryable(
+                    e.response, idempotent=idempotent
+                ):
+                    raise
+                status_delay = backoff.after_response(e.response)
+                if status_delay is None:
+                    raise
+                time.sleep(status_delay)
+                continue
             except (
                 httpx.NetworkError,
                 httpx.TimeoutException,
                 httpx.ProtocolError,
             ) as e:
-                retry_start, retry_delay = self._calculate_retry_backoff(
-                    debug_uuid, retry_start, retry_delay, e
-                )
-                if retry_delay < 0:
+                retry_delay = backoff.after_network_error(e)
+                if retry_delay is None:
                     raise RedactConnectError(
                         f"Error communicating with {self.redact_url}: {e}"
                     ) from e
-
-            time.sleep(retry_delay)
+                time.sleep(retry_delay)
+                continue
+
+            if not isinstance(
+                result, httpx.Response
+            ) or not self._status_retry_policy.is_retryable(
+                result, idempotent=idempotent
+            ):
+                return result
+            status_delay = backoff.after_response(result)
+            if status_delay is None:
+                # the caller handles the response like any other error response
+                return result
+            result.close()
+            time.sleep(status_delay)
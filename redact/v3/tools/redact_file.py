@@ -2,8 +2,11 @@ import logging
 from pathlib import Path
 from typing import Dict, Optional, Union
 
+from redact.commons.polling import PollingStrategy
+from redact.commons.result_cache import ResultCache, result_status_id
 from redact.commons.utils import normalize_path
 from redact.settings import Settings
+from redact.utils import normalize_url
 from redact.v3 import (
     JobArguments,
     JobLabels,
@@ -40,9 +43,14 @@ def redact_file(
     waiting_time_between_job_status_checks: Optional[float] = None,
     redact_requests_param: Optional[RedactRequests] = None,
     custom_headers: Optional[Dict[str, str]] = None,
+    polling_strategy: Optional[PollingStrategy] = None,
+    result_cache: Optional[ResultCache] = None,
 ) -> Optional[JobStatus]:
     """
     If no out_path is given, <input_filename_redacted> will be used.
+
+    If a result_cache is given, a cached result of the same input and arguments is reused instead of starting a job.
+    Results are not cached when labels are saved, since the labels are not part of the cache.
     """
 
     # input and output path
@@ -64,6 +72,35 @@ def redact_file(
         job_args = JobArguments()
     log.debug(f"Job arguments: {job_args}")
 
+    # result of an identical input from the cache?
+    result_cache_key = None
+    if result_cache is not None and not save_labels:
+        result_cache_key = ResultCache.key(
+            file_path,
+            service=service,
+            output_type=output_type,
+            job_args=job_args,
+            extra_files=[licence_plate_custom_stamp_path, custom_labels_file_path],
+            api_version="v3",
+            ignore_warnings=ignore_warnings,
+            redact_urls=sorted(
+                redact_requests_param.redact_urls
+                if redact_requests_param
+                else [normalize_url(redact_url)]
+            ),
+        )
+        cached_output_path = result_cache.materialize(result_cache_key, output_path)
+        if cached_output_path is not None:
+            log.debug(f"Took result for {file_path} from cache: {cached_output_path}")
+            if auto_delete_input_file:
+                log.debug(f"Deleting {file_path}")
+                Path(file_path).unlink()
+            return JobStatus(
+                output_id=result_status_id(result_cache_key),
+                state=JobState.finished,
+                progress=1.0,
+            )
+
     # custom labels
     custom_labels = None
     if custom_labels_file_path:
@@ -104,9 +141,12 @@ def redact_file(
             )
 
         if waiting_time_between_job_status_checks is not None:
-            job.wait_until_finished(waiting_time_between_job_status_checks)
+            job.wait_until_finished(
+                waiting_time_between_job_status_checks,
+                polling_strategy=polling_strategy,
+            )
         else:
-            job.wait_until_finished()
+            job.wait_until_finished(polling_strategy=polling_strategy)
 
         job_status = job.get_status()
         if job_status.warnings:
@@ -124,7 +164,11 @@ def redact_file(
             return job_status
 
         # stream result to file
-        job.download_result_to_file(file=output_path, ignore_warnings=ignore_warnings)
+        result_path = job.download_result_to_file(
+            file=output_path, ignore_warnings=ignore_warnings
+        )
+        if result_cache_key is not None:
+            result_cache.store(result_cache_key, result_path)
 
         # write labels
         if save_labels:
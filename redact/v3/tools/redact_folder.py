@@ -1,21 +1,18 @@
 import functools
 import logging
 import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple, Union
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 import tqdm
 from tqdm.contrib.logging import logging_redirect_tqdm
 
+from redact.commons.polling import PollingStrategyType, create_polling_strategy
+from redact.commons.result_cache import ResultCache
+from redact.commons.scheduling import SchedulingPolicy, iter_scheduled_files_in_dir
 from redact.commons.summary import JobsSummary, summary
-from redact.commons.utils import (
-    files_in_dir,
-    is_archive,
-    is_image,
-    is_video,
-    normalize_path,
-)
+from redact.commons.utils import is_archive, is_image, is_video, normalize_path
 from redact.errors import RedactConnectError, RedactResponseError
 from redact.settings import Settings
 from redact.v3 import InputType, JobArguments, JobStatus, OutputType, ServiceType
@@ -46,6 +43,11 @@ def redact_folder(
     auto_delete_job: bool = True,
     auto_delete_input_file: bool = False,
     custom_headers: Optional[Dict[str, str]] = None,
+    polling_strategy: Optional[PollingStrategyType] = None,
+    n_discovery_workers: int = 1,
+    result_cache: Optional[ResultCache] = None,
+    scheduling_policy: SchedulingPolicy = SchedulingPolicy.discovery,
+    priority_patterns: Optional[List[str]] = None,
 ) -> JobsSummary:
     # Normalize paths, e.g.: '~/..' -> '/home'
     in_dir_path = normalize_path(input_dir)
@@ -61,11 +63,14 @@ def redact_folder(
     if not Path(out_dir_path).exists():
         os.makedirs(out_dir_path)
 
-    # List of relative input paths (only img/vid)
+    # Relative input paths (only img/vid), discovered while the first files are already processed
     relative_file_paths = _get_relative_file_paths(
-        in_dir=in_dir_path, input_type=input_type
+        in_dir=in_dir_path,
+        input_type=input_type,
+        n_discovery_workers=n_discovery_workers,
+        scheduling_policy=scheduling_policy,
+        priority_patterns=priority_patterns,
     )
-    log.info(f"Found {len(relative_file_paths)} {input_type.value} to process")
 
     # Fix input arguments to make method mappable
     worker_function = functools.partial(
@@ -85,6 +90,8 @@ def redact_folder(
         auto_delete_job=auto_delete_job,
         auto_delete_input_file=auto_delete_input_file,
         custom_headers=custom_headers,
+        polling_strategy=polling_strategy,
+        result_cache=result_cache,
     )
 
     log.info(f"Starting {n_parallel_jobs} parallel jobs to anonymize files ...")
@@ -97,17 +104,19 @@ def redact_folder(
 
 
 def _parallel_map(
-    func, items: List, n_parallel_jobs=1
+    func, items: Iterable, n_parallel_jobs=1
 ) -> Tuple[List[Optional[JobStatus]], Any]:
+    """
+    Maps func over items with n_parallel_jobs threads. items are consumed lazily, only a few more than
+    n_parallel_jobs of them are submitted at a time.
+    """
     job_statuses = []
     exceptions = []
+    futures = {}
 
-    with logging_redirect_tqdm(), ThreadPoolExecutor(
-        max_workers=n_parallel_jobs
-    ) as executor:
-        futures = {executor.submit(func, item): item for item in items}
-        for future in tqdm.tqdm(as_completed(futures), total=len(futures)):
-            item = futures[future]
+    def collect(done_futures) -> None:
+        for future in done_futures:
+            item = futures.pop(future)
             try:
                 job_statuses.append(future.result())
             except Exception as e:
@@ -115,30 +124,55 @@ def _parallel_map(
                     f"An exception occurred while processing the following file '{item}': {e}"
                 )
                 exceptions.append(e)
+            progress.update()
+
+    with logging_redirect_tqdm(), ThreadPoolExecutor(
+        max_workers=n_parallel_jobs
+    ) as executor, tqdm.tqdm(total=0) as progress:
+        for item in items:
+            if len(futures) >= 2 * n_parallel_jobs:
+                collect(wait(futures, return_when=FIRST_COMPLETED).done)
+            futures[executor.submit(func, item)] = item
+            progress.total += 1
+            progress.refresh()
+        log.info(f"Found {progress.total} files to process")
+        while futures:
+            collect(wait(futures, return_when=FIRST_COMPLETED).done)
 
     return job_statuses, exceptions
 
 
-def _get_relative_file_paths(in_dir: Path, input_type: InputType) -> List[Path]:
+def _get_relative_file_paths(
+    in_dir: Path,
+    input_type: InputType,
+    n_discovery_workers: int = 1,
+    scheduling_policy: SchedulingPolicy = SchedulingPolicy.discovery,
+    priority_patterns: Optional[List[str]] = None,
+) -> Iterator[Path]:
     """
-    Return a list of all files in in_dir. But only relative to in_dir itself.
+    Return an iterator over all files in in_dir, but only relative to in_dir itself. The tree is walked lazily, unless
+    the files are ordered by a scheduling_policy or priority_patterns (see schedule_files).
 
-    Example: in_dir/sub/file[1-3].foo -> [sub/file1.foo, sub/file2.foo, sub/file3.foo]
+    Example: in_dir/sub/file[1-3].foo -> sub/file1.foo, sub/file2.foo, sub/file3.foo
     """
 
-    file_paths: List[str] = files_in_dir(dir=in_dir)
-
     if input_type == InputType.images:
-        file_paths = [fp for fp in file_paths if is_image(fp)]
+        is_input_type = is_image
     elif input_type == InputType.videos:
-        file_paths = [fp for fp in file_paths if is_video(fp)]
+        is_input_type = is_video
     elif input_type == InputType.archives:
-        file_paths = [fp for fp in file_paths if is_archive(fp)]
+        is_input_type = is_archive
     else:
         raise ValueError(f"Unsupported input type {input_type}.")
 
-    relative_file_paths = [Path(fp).relative_to(in_dir) for fp in file_paths]
-    return relative_file_paths
+    file_paths = iter_scheduled_files_in_dir(
+        dir=in_dir,
+        n_workers=n_discovery_workers,
+        file_filter=is_input_type,
+        policy=scheduling_policy,
+        priority_patterns=priority_patterns,
+    )
+    return (Path(file_path).relative_to(in_dir) for file_path in file_paths)
 
 
 def _try_redact_file_with_relative_path(
@@ -168,6 +202,7 @@ def _redact_file_with_relative_path(
     base_dir_in: str,
     base_dir_out: str,
     input_type: InputType,
+    polling_strategy: Optional[PollingStrategyType] = None,
     **kwargs,
 ) -> Optional[JobStatus]:
     """This is an internal helper function."""
@@ -179,6 +214,10 @@ def _redact_file_with_relative_path(
             "Detecting images input, lowering waiting time between status checks."
         )
         waiting_time = 1.5
+    if polling_strategy is not None:
+        kwargs["polling_strategy"] = create_polling_strategy(
+            polling_strategy, interval=waiting_time
+        )
     return redact_file(
         file_path=in_path,
         output_path=out_path,
@@ -1,3 +1,6 @@
+from .async_redact_instance import AsyncRedactInstance
+from .async_redact_job import AsyncRedactJob
+from .async_redact_requests import AsyncRedactRequests
 from .data_models import (
     InputType,
     JobArguments,
@@ -9,16 +12,26 @@ from .data_models import (
     Region,
     ServiceType,
 )
+from .job_batch import BatchJob, JobBatch
+from .job_status_poller import JobStatusPoller
 from .redact_instance import RedactInstance
 from .redact_job import RedactJob
 from .redact_requests import RedactRequests
+from .redact_requests_pool import RedactRequestsPool
+from .webhook_receiver import StatusWebhookReceiver
 
 __all__ = [
+    AsyncRedactInstance,
+    AsyncRedactJob,
+    AsyncRedactRequests,
+    BatchJob,
     JobArguments,
+    JobBatch,
     JobPostResponse,
     JobResult,
     JobState,
     JobStatus,
+    JobStatusPoller,
     InputType,
     OutputType,
     Region,
@@ -26,4 +39,6 @@ __all__ = [
     RedactInstance,
     RedactJob,
     RedactRequests,
+    RedactRequestsPool,
+    StatusWebhookReceiver,
 ]
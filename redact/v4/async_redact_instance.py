@@ -0,0 +1,75 @@
+from typing import BinaryIO, Dict, Optional
+
+from redact.commons.multipart import ProgressCallback
+from redact.settings import Settings
+from redact.v4.async_redact_job import AsyncRedactJob
+from redact.v4.async_redact_requests import AsyncRedactRequests
+from redact.v4.data_models import JobArguments, OutputType, ServiceType
+
+settings = Settings()
+
+
+class AsyncRedactInstance:
+    """
+    Helper for starting new Redact jobs from asyncio code.
+    """
+
+    def __init__(
+        self,
+        redact_requests: AsyncRedactRequests,
+        service: ServiceType,
+        out_type: OutputType,
+    ):
+        """
+        The default way for creating AsyncRedactInstance objects is through AsyncRedactInstance.create().
+        Here you can provide your own AsyncRedactRequests instance.
+        """
+        self.redact_requests = redact_requests
+        self.service = service
+        self.out_type = out_type
+
+    @classmethod
+    def create(
+        cls,
+        service: ServiceType,
+        out_type: OutputType,
+        redact_url: str = settings.redact_url_default,
+        subscription_id: Optional[str] = None,
+        api_key: Optional[str] = None,
+        custom_headers: Optional[Dict] = None,
+        start_job_timeout: Optional[float] = None,
+    ) -> "AsyncRedactInstance":
+        """
+        The default way of creating AsyncRedactInstance objects.
+        """
+        redact_requests = AsyncRedactRequests(
+            redact_url=redact_url,
+            subscription_id=subscription_id,
+            api_key=api_key,
+            custom_headers=custom_headers,
+            start_job_timeout=start_job_timeout,
+        )
+        return cls(redact_requests=redact_requests, service=service, out_type=out_type)
+
+    async def start_job(
+        self,
+        file: BinaryIO,
+        job_args: Optional[JobArguments] = None,
+        licence_plate_custom_stamp: Optional[BinaryIO] = None,
+        progress_callback: Optional[ProgressCallback] = None,
+    ) -> AsyncRedactJob:
+        post_response = await self.redact_requests.post_job(
+            file=file,
+            service=self.service,
+            out_type=self.out_type,
+            job_args=job_args,
+            licence_plate_custom_stamp=licence_plate_custom_stamp,
+            progress_callback=progress_callback,
+        )
+
+        return AsyncRedactJob(
+            redact_requests=self.redact_requests,
+            service=self.service,
+            out_type=self.out_type,
+            output_id=post_response.output_id,
+        )
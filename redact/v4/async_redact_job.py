@@ -0,0 +1,81 @@
+import asyncio
+from pathlib import Path
+from typing import Optional
+from uuid import UUID
+
+from redact.commons.polling import PollingStrategy
+from redact.v4.async_redact_requests import AsyncRedactRequests
+from redact.v4.data_models import JobResult, JobStatus, OutputType, ServiceType
+
+
+class AsyncRedactJob:
+    """
+    Asyncio counterpart of RedactJob. Use factory AsyncRedactInstance.start_job() to start new jobs.
+    """
+
+    def __init__(
+        self,
+        redact_requests: AsyncRedactRequests,
+        service: ServiceType,
+        out_type: OutputType,
+        output_id: UUID,
+    ):
+        """
+        Intended for internal use. Start a job through AsyncRedactInstance.start_job() instead.
+        """
+        self.redact = redact_requests
+        self.service = service
+        self.out_type = out_type
+        self.output_id: UUID = output_id
+
+    async def get_status(self) -> JobStatus:
+        response_dict = await self.redact.get_status(
+            service=self.service, out_type=self.out_type, output_id=self.output_id
+        )
+        return JobStatus(**response_dict)
+
+    async def download_result(self, ignore_warnings: bool = False) -> JobResult:
+        return await self.redact.get_output(
+            service=self.service,
+            out_type=self.out_type,
+            output_id=self.output_id,
+            ignore_warnings=ignore_warnings,
+        )
+
+    async def download_result_to_file(
+        self, file: Path, ignore_warnings: bool = False
+    ) -> Path:
+        return await self.redact.write_output_to_file(
+            service=self.service,
+            out_type=self.out_type,
+            output_id=self.output_id,
+            file=file,
+            ignore_warnings=ignore_warnings,
+        )
+
+    async def delete(self):
+        return await self.redact.delete_output(
+            service=self.service, out_type=self.out_type, output_id=self.output_id
+        )
+
+    async def get_error(self):
+        job_status = await self.get_status()
+        return {"error": job_status.error}
+
+    async def wait_until_finished(
+        self, sleep: float = 0.5, polling_strategy: Optional[PollingStrategy] = None
+    ) -> "AsyncRedactJob":
+        if polling_strategy is None:
+            while (await self.get_status()).is_running():
+                await asyncio.sleep(sleep)
+            return self
+
+        interval = polling_strategy.first_interval()
+        job_status = await self.get_status()
+        while job_status.is_running():
+            await asyncio.sleep(interval)
+            previous_job_status, job_status = job_status, await self.get_status()
+            interval = polling_strategy.next_interval(
+                interval, job_status, previous_job_status
+            )
+        return self
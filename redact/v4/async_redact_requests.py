@@ -0,0 +1,443 @@
+import asyncio
+import logging
+import uuid
+from io import FileIO
+from pathlib import Path
+from typing import IO, Any, Callable, Dict, Optional, Type
+from uuid import UUID
+
+import httpx
+
+from redact.api_versions import REDACT_API_VERSIONS
+from redact.commons.download import DownloadOptions, PartialDownload, RangeMismatch
+from redact.commons.endpoints import RedactEndpointsMixin
+from redact.commons.http_client import create_async_http_client
+from redact.commons.multipart import ProgressCallback, StreamingMultipartBody
+from redact.commons.rate_limit import (
+    EndpointClass,
+    RateLimiter,
+    get_default_rate_limiter,
+)
+from redact.commons.retry import RetryBackoff, StatusRetryPolicy
+from redact.commons.upload_concurrency import (
+    THROTTLING_STATUS_CODES,
+    UploadConcurrencyController,
+    get_default_upload_concurrency_controller,
+)
+from redact.commons.utils import get_filesize_in_gb
+from redact.errors import (
+    FileDownloadError,
+    RedactConnectError,
+    RedactReadTimeout,
+    RedactResponseError,
+)
+from redact.settings import Settings
+from redact.utils import normalize_url, retrieve_file_name
+from redact.v4.data_models import (
+    JobArguments,
+    JobPostResponse,
+    JobResult,
+    OutputType,
+    ServiceType,
+)
+
+settings = Settings()
+
+log = logging.getLogger("redact-requests")
+
+
+class AsyncRedactRequests(RedactEndpointsMixin):
+    """
+    Asyncio counterpart of RedactRequests, wrapping requests to the Redact API on an httpx.AsyncClient.
+
+    A single instance is meant to be shared by all jobs running on one event loop. Use it as an async context
+    manager (or call aclose()) to release the underlying connections when it created its own client.
+
+    Uploads share the upload concurrency controller of the process with the RedactRequests, unless
+    upload_concurrency or (for a fixed limit of its own) max_concurrent_posts is given. Likewise, all requests count
+    against the rate limits of the process, unless a rate_limiter is given.
+    """
+
+    API_VERSION = REDACT_API_VERSIONS.v4
+
+    def __init__(
+        self,
+        redact_url: str = settings.redact_url_default,
+        subscription_id: Optional[str] = None,
+        api_key: Optional[str] = None,
+        httpx_client: Optional[httpx.AsyncClient] = None,
+        custom_headers: Optional[Dict] = None,
+        start_job_timeout: Optional[float] = None,
+        retry_total_time_limit: Optional[int] = 600,  # 10 minutes in seconds
+        max_concurrent_posts: Optional[int] = None,
+        upload_concurrency: Optional[UploadConcurrencyController] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        status_retry_policy: Optional[StatusRetryPolicy] = None,
+        download_options: Optional[DownloadOptions] = None,
+    ):
+        self.redact_url = normalize_url(redact_url)
+        self.api_key = api_key
+        self.subscription_id = subscription_id
+        self.retry_total_time_limit: float = retry_total_time_limit
+        self.start_job_timeout = start_job_timeout
+
+        self._headers = {"Accept": "*/*"}
+        if custom_headers is not None:
+            self._headers.update(custom_headers)
+
+        if self.api_key:
+            self._headers["api-key"] = self.api_key
+        if self.subscription_id:
+            self._headers["Subscription-Id"] = self.subscription_id
+
+        self._owns_client = httpx_client is None
+        self._client = httpx_client or create_async_http_client(
+            timeout=settings.base_timeout
+        )
+
+        if upload_concurrency is None and max_concurrent_posts is not None:
+            upload_concurrency = UploadConcurrencyController(limit=max_concurrent_posts)
+        self._upload_concurrency = (
+            upload_concurrency or get_default_upload_concurrency_controller()
+        )
+        self._rate_limiter = rate_limiter or get_default_rate_limiter()
+        self._status_retry_policy = status_retry_policy or StatusRetryPolicy()
+        self.download_options = download_options or DownloadOptions()
+
+    async def __aenter__(self) -> "AsyncRedactRequests":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        if self._owns_client:
+            await self._client.aclose()
+
+    async def post_job(
+        self,
+        file: FileIO,
+        service: ServiceType,
+        out_type: OutputType,
+        job_args: Optional[JobArguments] = None,
+        licence_plate_custom_stamp: Optional[IO] = None,
+        progress_callback: Optional[ProgressCallback] = None,
+    ) -> JobPostResponse:
+        """
+        Post the job via a post request. The files are streamed in chunks, progress_callback is called with the
+        number of bytes sent so far and the total size of the request body, from the thread reading the files.
+        """
+
+        try:
+            _ = file.name
+        except AttributeError as e:
+            raise ValueError(
+                "Expecting 'file' argument to have a 'name' attribute, i.e., FileIO."
+            ) from e
+
+        url = self._get_job_url(service, out_type)
+
+        if not job_args:
+            job_args = JobArguments()
+
+        timeout = (
+            settings.base_timeout + (get_filesize_in_gb(file) * 10)
+            if self.start_job_timeout is None
+            else self.start_job_timeout
+        )
+
+        files = {"file": file}
+        if licence_plate_custom_stamp:
+            files["licence_plate_custom_stamp"] = licence_plate_custom_stamp
+
+        body = StreamingMultipartBody(files, progress_callback=progress_callback)
+
+        upload_debug_uuid = uuid.uuid4()
+        async with self._upload_concurrency.async_slot() as upload_slot:
+
+            async def post(**kwargs) -> httpx.Response:
+                try:
+                    # a new stream of the body for every attempt
+                    response = await self._client.post(
+                        content=body.aiter_bytes(), **kwargs
+                    )
+                except httpx.TimeoutException:
+                    upload_slot.throttled()
+                    raise
+                if response.status_code in THROTTLING_STATUS_CODES:
+                    upload_slot.throttled()
+                return response
+
+            error_callbacks = {httpx.ReadTimeout: self._raise_on_readtimeout}
+            log.debug(f"Posting to {url} debug id (not output_id): {upload_debug_uuid}")
+            response = await self._retry_on_network_problem_with_backoff(
+                post,
+                debug_uuid=upload_debug_uuid,
+                endpoint_class=EndpointClass.post,
+                url=url,
+                params=job_args.dict(exclude_none=True),
+                headers={**self._headers, **body.headers},
+                timeout=timeout,
+                error_callbacks=error_callbacks,
+            )
+            log.debug(
+                f"Post response to debug id (not output_id) {upload_debug_uuid}: {response}"
+            )
+            if response.status_code != 200:
+                raise RedactResponseError(
+                    response=response, msg=f"Error posting job: {response.content}"
+                )
+
+            upload_slot.succeeded(len(body))
+            return JobPostResponse(**response.json())
+
+    async def get_output(
+        self,
+        service: ServiceType,
+        out_type: OutputType,
+        output_id: UUID,
+        ignore_warnings: bool = False,
+    ) -> JobResult:
+        """
+        Retrieves job result as object in memory.
+        """
+
+        url = self._get_output_download_url(service, out_type, output_id)
+
+        query_params = self._get_output_download_query_params(ignore_warnings)
+
+        debug_uuid = uuid.uuid4()
+        response = await self._retry_on_network_problem_with_backoff(
+            self._client.get,
+            debug_uuid,
+            url,
+            params=query_params,
+            headers=self._headers,
+            endpoint_class=EndpointClass.download,
+        )
+
+        if response.status_code != 200:
+            raise RedactResponseError(
+                response=response,
+                msg=f"Error downloading job result for output_id {output_id}: "
+                f"{response.content.decode()}",
+            )
+
+        return JobResult(
+            content=response.content,
+            media_type=response.headers["Content-Type"],
+            file_name=retrieve_file_name(headers=response.headers),
+        )
+
+    async def _stream_output_to_file(
+        self,
+        debug_uuid,
+        output_id,
+        file: Path,
+        url,
+        params,
+        headers,
+        partial_download: PartialDownload,
+    ) -> Path:
+        # file operations run in the default executor, so a slow disk doesn't block the event loop
+        loop = asyncio.get_running_loop()
+        while True:
+            request_headers = partial_download.request_headers(headers)
+            async with self._client.stream(
+                "GET", url, params=params, headers=request_headers
+            ) as response:
+                if response.status_code == 416 and partial_download.n_bytes:
+                    log.debug(f"Range of resumed download not satisfiable: {file}")
+                    await loop.run_in_executor(None, partial_download.discard)
+                    continue
+                if response.status_code not in (200, 206):
+                    raise RedactResponseError(
+                        response=response,
+                        msg=f"Error downloading job result for output_id {output_id}, debug_uuid {debug_uuid}: "
+                        f"{(await response.aread()).decode()}",
+                    )
+                try:
+                    temp_file = await loop.run_in_executor(
+                        None, partial_download.open, response
+                    )
+                except RangeMismatch as e:
+                    if not partial_download.n_bytes:
+                        raise FileDownloadError(
+                            f"failed to download the file {file}"
+                        ) from e
+                    log.debug(f"Unexpected range {e} of resumed download: {file}")
+                    await loop.run_in_executor(None, partial_download.discard)
+                    continue
+
+                try:
+                    try:
+                        async for chunk in response.aiter_bytes(
+                            chunk_size=partial_download.options.chunk_size
+                        ):
+                            await loop.run_in_executor(
+                                None, partial_download.write, temp_file, chunk
+                            )
+                    finally:
+                        await loop.run_in_executor(None, temp_file.close)
+                except (
+                    httpx.NetworkError,
+                    httpx.TimeoutException,
+                    httpx.ProtocolError,
+                ):
+                    # retried by _retry_on_network_problem_with_backoff, resuming at the last byte if possible
+                    await loop.run_in_executor(None, partial_download.keep_for_retry)
+                    raise
+                except Exception as e:
+                    await loop.run_in_executor(None, partial_download.discard)
+                    raise FileDownloadError(
+                        f"failed to download the file {file}"
+                    ) from e
+
+                file_name = Path(retrieve_file_name(headers=partial_download.headers))
+                anonymized_path = Path(file).parent / f"{file.stem}{file_name.suffix}"
+                target_file = partial_download.path
+                await loop.run_in_executor(
+                    None, partial_download.move_to, anonymized_path
+                )
+                log.debug(
+                    f"temp file {target_file} has been renamed into {anonymized_path}"
+                )
+                return anonymized_path
+
+    async def write_output_to_file(
+        self,
+        service: ServiceType,
+        out_type: OutputType,
+        output_id: UUID,
+        file: Path,
+        ignore_warnings: bool = False,
+    ) -> Path:
+        """
+        Retrieves job result and streams it to file, greatly reducing memory load
+        and resolving memory fragmentation problems.
+        """
+
+        url = self._get_output_download_url(service, out_type, output_id)
+
+        query_params = self._get_output_download_query_params(ignore_warnings)
+
+        debug_uuid = uuid.uuid4()
+        # kept across the retries of the download, which continue where the previous attempt stopped
+        with PartialDownload(file.parent, self.download_options) as partial_download:
+            return await self._retry_on_network_problem_with_backoff(
+                self._stream_output_to_file,
+                debug_uuid,
+                debug_uuid,
+                output_id,
+                file,
+                url,
+                params=query_params,
+                headers=self._headers,
+                partial_download=partial_download,
+                endpoint_class=EndpointClass.download,
+            )
+
+    async def get_status(
+        self, service: ServiceType, out_type: OutputType, output_id: UUID
+    ) -> Dict:
+        url = self._get_output_url(service, out_type, output_id, "status")
+
+        debug_uuid = uuid.uuid4()
+        response = await self._retry_on_network_problem_with_backoff(
+            self._client.get,
+            debug_uuid,
+            url,
+            headers=self._headers,
+            endpoint_class=EndpointClass.status,
+        )
+
+        if response.status_code != 200:
+            raise RedactResponseError(response=response, msg="Error getting job status")
+
+        return response.json()
+
+    async def delete_output(
+        self, service: ServiceType, out_type: OutputType, output_id: UUID
+    ) -> Dict:
+        url = self._get_output_url(service, out_type, output_id)
+
+        debug_uuid = uuid.uuid4()
+        response = await self._retry_on_network_problem_with_backoff(
+            self._client.delete,
+            debug_uuid,
+            url,
+            headers=self._headers,
+            endpoint_class=EndpointClass.delete,
+        )
+
+        if response.status_code != 200:
+            raise RedactResponseError(response=response, msg="Error deleting job")
+
+        return response.json()
+
+    def _raise_on_readtimeout(self, e):
+        raise RedactReadTimeout() from e
+
+    async def _retry_on_network_problem_with_backoff(
+        self,
+        func,
+        debug_uuid: uuid.UUID,
+        *positional_arguments,
+        error_callbacks: Optional[Dict[Type[Exception], Callable]] = None,
+        endpoint_class: Optional[EndpointClass] = None,
+        **keyword_arguments,
+    ) -> Any:
+        if error_callbacks is None:
+            error_callbacks = {}
+
+        backoff = RetryBackoff(
+            self.retry_total_time_limit, self._status_retry_policy, debug_uuid
+        )
+        idempotent = endpoint_class != EndpointClass.post
+        while True:
+            # every attempt takes a token, so retries don't exceed the rate limit either
+            if endpoint_class is not None:
+                await self._rate_limiter.async_acquire(endpoint_class)
+            try:
+                result = await func(*positional_arguments, **keyword_arguments)
+            except RedactResponseError as e:
+                # raised by functions which consume the response themselves, e.g. _stream_output_to_file
+                if not self._status_retry_policy.is_retryable(
+                    e.response, idempotent=idempotent
+                ):
+                    raise
+                status_delay = backoff.after_response(e.response)
+                if status_delay is None:
+                    raise
+                await asyncio.sleep(status_delay)
+                continue
+            except (
+                httpx.NetworkError,
+                httpx.TimeoutException,
+                httpx.ProtocolError,
+            ) as e:
+                for error_type, callback in error_callbacks.items():
+                    if isinstance(e, error_type):
+                        callback(e)
+                        return
+
+                retry_delay = backoff.after_network_error(e)
+                if retry_delay is None:
+                    raise RedactConnectError(
+                        f"Error communicating with {self.redact_url}: {e}"
+                    ) from e
+                await asyncio.sleep(retry_delay)
+                continue
+
+            if not isinstance(
+                result, httpx.Response
+            ) or not self._status_retry_policy.is_retryable(
+                result, idempotent=idempotent
+            ):
+                return result
+            status_delay = backoff.after_response(result)
+            if status_delay is None:
+                # the caller handles the response like any other error response
+                return result
+            await result.aclose()
+            await asyncio.sleep(status_delay)
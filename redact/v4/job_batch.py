@@ -0,0 +1,289 @@
+import concurrent.futures
+import logging
+import os
+import threading
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import IO, Callable, Iterable, Iterator, List, Optional, Union
+
+from redact.commons.polling import PollingStrategy
+from redact.v4.data_models import JobArguments, JobState, JobStatus
+from redact.v4.job_status_poller import JobStatusPoller
+from redact.v4.redact_job import RedactJob
+
+log = logging.getLogger("redact-requests")
+
+BatchFile = Union[str, Path, IO[bytes]]
+
+
+class BatchJob:
+    """
+    One file of a JobBatch. job is set once the file is uploaded, future resolves to the final JobStatus (or the
+    error of the upload or of polling the status).
+    """
+
+    def __init__(self, file: BatchFile):
+        self.file = file
+        self.job: Optional[RedactJob] = None
+        self.future: "Future[JobStatus]" = Future()
+        self.result_path: Optional[Path] = None
+
+    @property
+    def name(self) -> str:
+        if isinstance(self.file, (str, Path)):
+            return str(self.file)
+        return getattr(self.file, "name", repr(self.file))
+
+    @property
+    def status(self) -> Optional[JobStatus]:
+        if not self.future.done() or self.error is not None:
+            return None
+        return self.future.result()
+
+    @property
+    def error(self) -> Optional[BaseException]:
+        if not self.future.done():
+            return None
+        if self.future.cancelled():
+            return concurrent.futures.CancelledError()
+        return self.future.exception()
+
+    @property
+    def succeeded(self) -> bool:
+        status = self.status
+        return status is not None and status.state == JobState.finished
+
+
+class JobBatch:
+    """
+    Jobs of many files, started by RedactInstance.start_jobs(). The files are uploaded by n_parallel_uploads threads,
+    the jobs are then watched by one JobStatusPoller, and all requests share the connections of the RedactRequests.
+    At most max_jobs_in_flight jobs (2 * n_parallel_uploads if None) are uploaded and not finished at a time, further
+    uploads wait for them.
+
+    Use the batch as context manager to delete all jobs and stop its threads in the end, even on errors.
+    """
+
+    def __init__(
+        self,
+        start_job: Callable[..., RedactJob],
+        files: Iterable[BatchFile],
+        job_args: Optional[JobArguments] = None,
+        licence_plate_custom_stamp_path: Optional[Union[str, Path]] = None,
+        n_parallel_uploads: int = 4,
+        n_parallel_downloads: int = 4,
+        job_status_poller: Optional[JobStatusPoller] = None,
+        polling_strategy: Optional[PollingStrategy] = None,
+        max_jobs_in_flight: Optional[int] = None,
+    ):
+        """
+        Intended for internal use. Start a batch through RedactInstance.start_jobs() instead.
+        """
+        self._start_job = start_job
+        self.job_args = job_args
+        self.licence_plate_custom_stamp_path = licence_plate_custom_stamp_path
+        self.n_parallel_downloads = n_parallel_downloads
+        self.polling_strategy = polling_strategy
+        self.jobs: List[BatchJob] = [BatchJob(file) for file in files]
+
+        self._owns_poller = job_status_poller is None
+        self._poller = job_status_poller or JobStatusPoller()
+        self._closed = threading.Event()
+        self._jobs_in_flight = threading.BoundedSemaphore(
+            max_jobs_in_flight or 2 * n_parallel_uploads
+        )
+        self._executor = ThreadPoolExecutor(
+            max_workers=n_parallel_uploads, thread_name_prefix="redact-batch-upload"
+        )
+        for batch_job in self.jobs:
+            self._executor.submit(self._start, batch_job)
+
+    def __enter__(self) -> "JobBatch":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        try:
+            self.delete_all()
+        finally:
+            self.close()
+
+    def __len__(self) -> int:
+        return len(self.jobs)
+
+    def __iter__(self) -> Iterator[BatchJob]:
+        return iter(self.jobs)
+
+    def wait_all(self, timeout: Optional[float] = None) -> List[BatchJob]:
+        """
+        Blocks until all jobs finished or failed (or timeout seconds passed), returns the jobs in the order of the
+        files.
+        """
+        concurrent.futures.wait([j.future for j in self.jobs], timeout=timeout)
+        return self.jobs
+
+    def as_completed(self, timeout: Optional[float] = None) -> Iterator[BatchJob]:
+        """
+        Yields the jobs as they finish or fail. Raises concurrent.futures.TimeoutError if timeout seconds passed.
+        """
+        batch_jobs = {j.future: j for j in self.jobs}
+        for future in concurrent.futures.as_completed(batch_jobs, timeout=timeout):
+            yield batch_jobs[future]
+
+    def download_all(
+        self, dir: Union[str, Path], ignore_warnings: bool = False
+    ) -> List[Optional[Path]]:
+        """
+        Downloads the results of the successful jobs into dir as soon as they are finished. Input paths keep their
+        path relative to the common folder of all inputs, file objects are named by their name. Returns the result
+        paths in the order of the files, None for failed jobs and downloads.
+
+        Raises ValueError before downloading anything if several jobs would write to the same result path.
+        """
+        dir = Path(dir)
+        result_paths = {
+            batch_job: dir / name
+            for batch_job, name in zip(self.jobs, _result_names(self.jobs))
+        }
+        dir.mkdir(parents=True, exist_ok=True)
+        downloads = {}
+        with ThreadPoolExecutor(
+            max_workers=self.n_parallel_downloads,
+            thread_name_prefix="redact-batch-download",
+        ) as executor:
+            for batch_job in self.as_completed():
+                if not batch_job.succeeded:
+                    log.warning(
+                        f"Not downloading the result of '{batch_job.name}': "
+                        f"{batch_job.error or batch_job.status.error}"
+                    )
+                    continue
+                result_path = result_paths[batch_job]
+                result_path.parent.mkdir(parents=True, exist_ok=True)
+                downloads[batch_job] = executor.submit(
+                    batch_job.job.download_result_to_file,
+                    file=result_path,
+                    ignore_warnings=ignore_warnings,
+                )
+
+        for batch_job, download in downloads.items():
+            try:
+                batch_job.result_path = download.result()
+            except Exception as e:
+                log.warning(f"Downloading the result of '{batch_job.name}' failed: {e}")
+        return [batch_job.result_path for batch_job in self.jobs]
+
+    def delete_all(self) -> None:
+        """
+        Deletes the jobs on the backend, also those which are still running. Files that were not uploaded yet won't
+        be anymore.
+        """
+        self._closed.set()
+        self._executor.shutdown(wait=True)
+        started = [j for j in self.jobs if j.job is not None]
+        with ThreadPoolExecutor(
+            max_workers=self.n_parallel_downloads,
+            thread_name_prefix="redact-batch-delete",
+        ) as executor:
+            for batch_job, deletion in [
+                (j, executor.submit(j.job.delete)) for j in started
+            ]:
+                try:
+                    deletion.result()
+                except Exception as e:
+                    log.warning(f"Deleting job {batch_job.job.output_id} failed: {e}")
+
+    def close(self) -> None:
+        """
+        Stops uploading and polling. Jobs that didn't finish yet are cancelled.
+        """
+        self._closed.set()
+        self._executor.shutdown(wait=True)
+        if self._owns_poller:
+            self._poller.shutdown()
+        for batch_job in self.jobs:
+            batch_job.future.cancel()
+
+    def _start(self, batch_job: BatchJob) -> None:
+        while not self._jobs_in_flight.acquire(timeout=0.5):
+            if self._closed.is_set():
+                break
+        else:
+            # released once the job finished or failed, or was cancelled by close()
+            batch_job.future.add_done_callback(lambda _: self._jobs_in_flight.release())
+        if self._closed.is_set():
+            batch_job.future.cancel()
+            return
+        try:
+            batch_job.job = self._upload(batch_job.file)
+        except Exception as e:
+            log.warning(f"Starting a job for '{batch_job.name}' failed: {e}")
+            _resolve(batch_job.future, error=e)
+            return
+        log.debug(f"Started job {batch_job.job.output_id} for '{batch_job.name}'")
+
+        def resolve(status_future: "Future[JobStatus]") -> None:
+            if status_future.cancelled():
+                batch_job.future.cancel()
+            elif status_future.exception() is not None:
+                _resolve(batch_job.future, error=status_future.exception())
+            else:
+                _resolve(batch_job.future, status=status_future.result())
+
+        self._poller.watch(
+            batch_job.job, polling_strategy=self.polling_strategy
+        ).add_done_callback(resolve)
+
+    def _upload(self, file: BatchFile) -> RedactJob:
+        stamp = None
+        if self.licence_plate_custom_stamp_path:
+            # every upload reads its own file object
+            stamp = open(self.licence_plate_custom_stamp_path, "rb")
+        try:
+            if isinstance(file, (str, Path)):
+                with open(file, "rb") as f:
+                    return self._start_job(
+                        file=f, job_args=self.job_args, licence_plate_custom_stamp=stamp
+                    )
+            return self._start_job(
+                file=file, job_args=self.job_args, licence_plate_custom_stamp=stamp
+            )
+        finally:
+            if stamp is not None:
+                stamp.close()
+
+
+def _result_names(batch_jobs: List[BatchJob]) -> List[Path]:
+    paths = [
+        Path(j.file).absolute() for j in batch_jobs if isinstance(j.file, (str, Path))
+    ]
+    root = Path(os.path.commonpath([p.parent for p in paths])) if paths else None
+
+    names = []
+    for batch_job in batch_jobs:
+        if isinstance(batch_job.file, (str, Path)):
+            names.append(Path(batch_job.file).absolute().relative_to(root))
+        else:
+            names.append(Path(Path(batch_job.name).name))
+
+    collisions = [str(name) for name, count in Counter(names).items() if count > 1]
+    if collisions:
+        raise ValueError(
+            f"Several files of the batch have the same result name: {', '.join(collisions)}"
+        )
+    return names
+
+
+def _resolve(
+    future: "Future[JobStatus]",
+    status: Optional[JobStatus] = None,
+    error: Optional[BaseException] = None,
+) -> None:
+    try:
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(status)
+    except concurrent.futures.InvalidStateError:
+        # cancelled by close() in the meantime
+        pass
@@ -0,0 +1,281 @@
+import heapq
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+from redact.commons.polling import BackoffPollingStrategy, PollingStrategy
+from redact.v4.data_models import JobStatus
+from redact.v4.redact_job import RedactJob
+
+log = logging.getLogger("redact-requests")
+
+
+class _WatchedJob:
+    def __init__(
+        self, job: RedactJob, polling_strategy: PollingStrategy, future: Future
+    ):
+        self.job = job
+        self.polling_strategy = polling_strategy
+        self.interval = polling_strategy.first_interval()
+        self.job_status: Optional[JobStatus] = None
+        self.future = future
+        # a status check is running, further scheduled checks are dropped until it is done
+        self.in_flight = False
+        # set by notifications during a running check, the job is checked again right after it
+        self.repoll_requested = False
+
+
+class JobStatusPoller:
+    """
+    Polls the status of many in-flight jobs from a single scheduler thread instead of one sleep loop per job.
+
+    Jobs are registered with watch(), which returns a Future that resolves to the final JobStatus once the job is no
+    longer running. Use Future.add_done_callback() to get notified without blocking. Every job is scheduled by its
+    own PollingStrategy. By default the interval starts at the given interval and grows by backoff_factor up to
+    max_interval, so long-running jobs are polled less and less often. The actual status requests are issued by a
+    small thread pool, so a slow response does not delay the other jobs.
+
+    Notifications about jobs that are not watched yet (e.g. a webhook of a fast job that arrives before start_job()
+    returned) are kept for early_notification_ttl seconds and applied when the job is watched.
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.5,
+        max_interval: float = 30.0,
+        backoff_factor: float = 1.5,
+        n_workers: int = 4,
+        polling_strategy: Optional[PollingStrategy] = None,
+        early_notification_ttl: float = 60.0,
+    ):
+        self.interval = interval
+        self.max_interval = max_interval
+        self.backoff_factor = backoff_factor
+        self.n_workers = n_workers
+        self.polling_strategy = polling_strategy
+        self.early_notification_ttl = early_notification_ttl
+
+        self._heap: List[Tuple[float, int, UUID]] = []
+        self._watched: Dict[UUID, _WatchedJob] = {}
+        # notifications about jobs that weren't watched yet, by the time they arrived
+        self._early_notifications: "OrderedDict[UUID, Tuple[float, Optional[JobStatus]]]" = (
+            OrderedDict()
+        )
+        self._counter = 0
+        self._condition = threading.Condition()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._scheduler: Optional[threading.Thread] = None
+        self._stopped = False
+
+    def __enter__(self) -> "JobStatusPoller":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.shutdown()
+
+    def start(self) -> None:
+        with self._condition:
+            if self._scheduler is not None:
+                return
+            self._stopped = False
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.n_workers, thread_name_prefix="redact-status-poller"
+            )
+            self._scheduler = threading.Thread(
+                target=self._run, name="redact-status-scheduler", daemon=True
+            )
+            self._scheduler.start()
+
+    def shutdown(self) -> None:
+        """
+        Stops polling. Futures of jobs that are still watched are cancelled.
+        """
+        with self._condition:
+            self._stopped = True
+            watched = list(self._watched.values())
+            self._watched.clear()
+            self._heap.clear()
+            self._early_notifications.clear()
+            self._condition.notify_all()
+            scheduler, self._scheduler = self._scheduler, None
+            executor, self._executor = self._executor, None
+
+        if scheduler is not None:
+            scheduler.join()
+        if executor is not None:
+            executor.shutdown(wait=True)
+        for watched_job in watched:
+            watched_job.future.cancel()
+
+    @property
+    def n_watched_jobs(self) -> int:
+        with self._condition:
+            return len(self._watched)
+
+    def watch(
+        self,
+        job: RedactJob,
+        interval: Optional[float] = None,
+        polling_strategy: Optional[PollingStrategy] = None,
+    ) -> "Future[JobStatus]":
+        """
+        Registers a job. The returned Future resolves to the final JobStatus (or the exception raised while polling).
+        The job is scheduled by the given polling_strategy, else by the poller's polling_strategy, else by backing
+        off from interval (or the poller's interval).
+        """
+        self.start()
+        if polling_strategy is None:
+            polling_strategy = self._default_polling_strategy(interval)
+        future: "Future[JobStatus]" = Future()
+        watched_job = _WatchedJob(
+            job=job, polling_strategy=polling_strategy, future=future
+        )
+        with self._condition:
+            early_notification = self._pop_early_notification(job.output_id)
+            if early_notification is not None and early_notification[1] is not None:
+                # the job finished before it was watched
+                future.set_result(early_notification[1])
+                return future
+            self._watched[job.output_id] = watched_job
+            delay = 0 if early_notification is not None else watched_job.interval
+            self._schedule(job.output_id, delay=delay)
+        return future
+
+    def _default_polling_strategy(self, interval: Optional[float]) -> PollingStrategy:
+        if self.polling_strategy is not None:
+            return self.polling_strategy
+        return BackoffPollingStrategy(
+            interval=self.interval if interval is None else interval,
+            factor=self.backoff_factor,
+            max_interval=self.max_interval,
+        )
+
+    def poll_now(self, output_id: UUID) -> None:
+        """
+        Requests an immediate status check for a watched job, e.g. when a notification about it arrived.
+        """
+        with self._condition:
+            if output_id in self._watched:
+                self._poll_soon(self._watched[output_id])
+
+    def notify(self, output_id: UUID, job_status: Optional[JobStatus] = None) -> None:
+        """
+        Notifies the poller about a status change of a job, e.g. from a status webhook. A final job_status resolves
+        the job right away, otherwise its status is checked immediately.
+        """
+        if job_status is not None and job_status.is_running():
+            job_status = None
+
+        with self._condition:
+            if output_id not in self._watched:
+                self._add_early_notification(output_id, job_status)
+                return
+            if job_status is None or self._watched[output_id].in_flight:
+                # no final status or currently being polled: check (again) as soon as possible
+                self._poll_soon(self._watched[output_id])
+                return
+            watched_job = self._watched.pop(output_id)
+        self._resolve(watched_job, job_status=job_status)
+
+    def _poll_soon(self, watched_job: _WatchedJob) -> None:
+        if watched_job.in_flight:
+            # the running check may have missed the change
+            watched_job.repoll_requested = True
+        else:
+            self._schedule(watched_job.job.output_id, delay=0)
+
+    def _add_early_notification(
+        self, output_id: UUID, job_status: Optional[JobStatus]
+    ) -> None:
+        now = time.monotonic()
+        self._drop_expired_notifications(now)
+        previous = self._early_notifications.pop(output_id, None)
+        if job_status is None and previous is not None:
+            # a final status stays final
+            job_status = previous[1]
+        self._early_notifications[output_id] = (now, job_status)
+
+    def _pop_early_notification(
+        self, output_id: UUID
+    ) -> Optional[Tuple[float, Optional[JobStatus]]]:
+        self._drop_expired_notifications(time.monotonic())
+        return self._early_notifications.pop(output_id, None)
+
+    def _drop_expired_notifications(self, now: float) -> None:
+        while self._early_notifications:
+            arrived, _ = next(iter(self._early_notifications.values()))
+            if now - arrived < self.early_notification_ttl:
+                return
+            self._early_notifications.popitem(last=False)
+
+    def _schedule(self, output_id: UUID, delay: float) -> None:
+        heapq.heappush(self._heap, (time.monotonic() + delay, self._counter, output_id))
+        self._counter += 1
+        self._condition.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._stopped:
+                    if self._heap and self._heap[0][0] <= time.monotonic():
+                        break
+                    timeout = (
+                        self._heap[0][0] - time.monotonic() if self._heap else None
+                    )
+                    self._condition.wait(timeout)
+                if self._stopped:
+                    return
+                _, _, output_id = heapq.heappop(self._heap)
+                watched_job = self._watched.get(output_id)
+                if watched_job is None or watched_job.in_flight:
+                    continue
+                watched_job.in_flight = True
+                self._executor.submit(self._poll, watched_job)
+
+    def _poll(self, watched_job: _WatchedJob) -> None:
+        output_id = watched_job.job.output_id
+        try:
+            job_status = watched_job.job.get_status()
+        except Exception as e:
+            log.debug(f"Polling status of job {output_id} failed: {e}")
+            self._resolve(watched_job, exception=e)
+            return
+
+        if not job_status.is_running():
+            self._resolve(watched_job, job_status=job_status)
+            return
+
+        with self._condition:
+            if self._stopped or self._watched.get(output_id) is not watched_job:
+                watched_job.future.cancel()
+                return
+            watched_job.in_flight = False
+            watched_job.interval = watched_job.polling_strategy.next_interval(
+                watched_job.interval, job_status, watched_job.job_status
+            )
+            watched_job.job_status = job_status
+            delay = 0 if watched_job.repoll_requested else watched_job.interval
+            watched_job.repoll_requested = False
+            self._schedule(output_id, delay=delay)
+
+    def _resolve(
+        self,
+        watched_job: _WatchedJob,
+        job_status: Optional[JobStatus] = None,
+        exception: Optional[Exception] = None,
+    ) -> None:
+        with self._condition:
+            if self._watched.get(watched_job.job.output_id) is watched_job:
+                self._watched.pop(watched_job.job.output_id)
+
+        if watched_job.future.done():
+            return
+        if exception is not None:
+            watched_job.future.set_exception(exception)
+        else:
+            watched_job.future.set_result(job_status)
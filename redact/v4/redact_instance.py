@@ -1,7 +1,12 @@
-from typing import BinaryIO, Dict, Optional
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, Optional, Union
 
+from redact.commons.multipart import ProgressCallback
+from redact.commons.polling import PollingStrategy
 from redact.settings import Settings
 from redact.v4.data_models import JobArguments, OutputType, ServiceType
+from redact.v4.job_batch import BatchFile, JobBatch
+from redact.v4.job_status_poller import JobStatusPoller
 from redact.v4.redact_job import RedactJob
 from redact.v4.redact_requests import RedactRequests
 
@@ -55,6 +60,7 @@ class RedactInstance:
         file: BinaryIO,
         job_args: Optional[JobArguments] = None,
         licence_plate_custom_stamp: Optional[BinaryIO] = None,
+        progress_callback: Optional[ProgressCallback] = None,
     ) -> RedactJob:
         post_response = self.redact_requests.post_job(
             file=file,
@@ -62,6 +68,7 @@ class RedactInstance:
             out_type=self.out_type,
             job_args=job_args,
             licence_plate_custom_stamp=licence_plate_custom_stamp,
+            progress_callback=progress_callback,
         )
 
         return RedactJob(
@@ -70,3 +77,34 @@ class RedactInstance:
             out_type=self.out_type,
             output_id=post_response.output_id,
         )
+
+    def start_jobs(
+        self,
+        files: Iterable[BatchFile],
+        job_args: Optional[JobArguments] = None,
+        licence_plate_custom_stamp_path: Optional[Union[str, Path]] = None,
+        n_parallel_uploads: int = 4,
+        n_parallel_downloads: int = 4,
+        job_status_poller: Optional[JobStatusPoller] = None,
+        polling_strategy: Optional[PollingStrategy] = None,
+        max_jobs_in_flight: Optional[int] = None,
+    ) -> JobBatch:
+        """
+        Starts a job for each of files (paths or file objects) in the background and returns right away. The jobs
+        are watched by job_status_poller, or a poller of the batch if None. At most max_jobs_in_flight jobs run on the
+        server at a time (2 * n_parallel_uploads if None).
+
+        with instance.start_jobs(paths) as batch:
+            batch.download_all(out_dir)
+        """
+        return JobBatch(
+            self.start_job,
+            files,
+            job_args=job_args,
+            licence_plate_custom_stamp_path=licence_plate_custom_stamp_path,
+            n_parallel_uploads=n_parallel_uploads,
+            n_parallel_downloads=n_parallel_downloads,
+            job_status_poller=job_status_poller,
+            polling_strategy=polling_strategy,
+            max_jobs_in_flight=max_jobs_in_flight,
+        )
@@ -1,7 +1,10 @@
 import time
 from pathlib import Path
+from typing import Optional
 from uuid import UUID
 
+from redact.commons.polling import PollingStrategy
+from redact.commons.result_buffer import DEFAULT_MAX_MEMORY_SIZE, ResultBuffer
 from redact.settings import Settings
 from redact.v4.data_models import JobResult, JobStatus, OutputType, ServiceType
 from redact.v4.redact_requests import RedactRequests
@@ -44,15 +47,32 @@ class RedactJob:
             ignore_warnings=ignore_warnings,
         )
 
+    def download_result_to_buffer(
+        self,
+        ignore_warnings: bool = False,
+        max_memory_size: int = DEFAULT_MAX_MEMORY_SIZE,
+    ) -> ResultBuffer:
+        return self.redact.get_output_buffer(
+            service=self.service,
+            out_type=self.out_type,
+            output_id=self.output_id,
+            ignore_warnings=ignore_warnings,
+            max_memory_size=max_memory_size,
+        )
+
     def download_result_to_file(
-        self, file: Path, ignore_warnings: bool = False
+        self, file: Path, ignore_warnings: bool = False, n_segments: int = 1
     ) -> Path:
+        """
+        Streams the result to file, with n_segments > 1 as byte ranges in parallel (for large results).
+        """
         return self.redact.write_output_to_file(
             service=self.service,
             out_type=self.out_type,
             output_id=self.output_id,
             file=file,
             ignore_warnings=ignore_warnings,
+            n_segments=n_segments,
         )
 
     def delete(self):
@@ -64,7 +84,23 @@ class RedactJob:
         job_status = self.get_status()
         return {"error": job_status.error}
 
-    def wait_until_finished(self, sleep: float = 0.5) -> "RedactJob":
-        while self.get_status().is_running():
-            time.sleep(sleep)
+    def wait_until_finished(
+        self, sleep: float = 0.5, polling_strategy: Optional[PollingStrategy] = None
+    ) -> "RedactJob":
+        """
+        Blocks until the job is no longer running. Polls every 'sleep' seconds unless a polling_strategy is given.
+        """
+        if polling_strategy is None:
+            while self.get_status().is_running():
+                time.sleep(sleep)
+            return self
+
+        interval = polling_strategy.first_interval()
+        job_status = self.get_status()
+        while job_status.is_running():
+            time.sleep(interval)
+            previous_job_status, job_status = job_status, self.get_status()
+            interval = polling_strategy.next_interval(
+                interval, job_status, previous_job_status
+            )
         return self
@@ -0,0 +1,411 @@
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import IO, Any, Callable, Dict, List, Optional, Sequence, Union
+from uuid import UUID
+
+from redact.commons.load_balancing import (
+    LoadBalancingPolicy,
+    LoadBalancingPolicyType,
+    RedactNode,
+    create_load_balancing_policy,
+)
+from redact.commons.multipart import ProgressCallback
+from redact.commons.result_buffer import DEFAULT_MAX_MEMORY_SIZE, ResultBuffer
+from redact.errors import RedactConnectError, RedactResponseError
+from redact.v4.data_models import (
+    JobArguments,
+    JobPostResponse,
+    JobResult,
+    JobStatus,
+    OutputType,
+    ServiceType,
+)
+from redact.v4.redact_requests import RedactRequests
+
+log = logging.getLogger("redact-requests")
+
+
+class RedactRequestsPool:
+    """
+    Drop-in replacement of RedactRequests distributing jobs across several Redact instances ("nodes"). New jobs go to
+    the node chosen by the load balancing policy, all further requests of a job (status, download, delete) go to the
+    node that started it. Jobs the pool doesn't know (e.g. from the journal of an earlier run) are looked up on all
+    nodes.
+
+    Nodes failing repeatedly are ejected for a while (see RedactNode) and get a health check before new jobs are sent
+    to them again. Every health_check_interval seconds, all nodes are checked in the background as well. An upload
+    that fails on one node is retried on another one if the file can be rewound. The other requests of a job can only
+    go to its node, they are retried for up to job_retry_time_limit seconds while the node is unreachable.
+
+    Use the pool as context manager (or call close()) to stop the background health checks.
+    """
+
+    def __init__(
+        self,
+        redact_requests: Sequence[RedactRequests],
+        policy: Union[
+            LoadBalancingPolicy, LoadBalancingPolicyType
+        ] = LoadBalancingPolicyType.least_outstanding,
+        max_failures: int = 3,
+        ejection_time: float = 10.0,
+        health_check_timeout: float = 5.0,
+        health_check_interval: Optional[float] = 30.0,
+        job_retry_time_limit: float = 600.0,
+    ):
+        if not redact_requests:
+            raise ValueError("A pool needs at least one Redact instance.")
+        self.nodes = [
+            RedactNode(r, max_failures=max_failures, ejection_time=ejection_time)
+            for r in redact_requests
+        ]
+        if not isinstance(policy, LoadBalancingPolicy):
+            policy = create_load_balancing_policy(policy)
+        self.policy = policy
+        self.health_check_timeout = health_check_timeout
+        self.health_check_interval = health_check_interval
+        self.job_retry_time_limit = job_retry_time_limit
+        self._nodes_by_output_id: Dict[UUID, RedactNode] = {}
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._health_checker: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_urls(
+        cls,
+        redact_urls: Sequence[str],
+        policy: Union[
+            LoadBalancingPolicy, LoadBalancingPolicyType
+        ] = LoadBalancingPolicyType.least_outstanding,
+        max_failures: int = 3,
+        ejection_time: float = 10.0,
+        health_check_timeout: float = 5.0,
+        health_check_interval: Optional[float] = 30.0,
+        job_retry_time_limit: float = 600.0,
+        node_retry_time_limit: float = 10.0,
+        **kwargs: Any,
+    ) -> "RedactRequestsPool":
+        """
+        Creates a pool of the Redact instances at redact_urls, kwargs are passed on to every RedactRequests.
+
+        A request gives up on a node after node_retry_time_limit seconds of network errors, so failing nodes are
+        ejected (and uploads go to other nodes) within seconds.
+        """
+        return cls(
+            [
+                RedactRequests(
+                    redact_url=url,
+                    retry_total_time_limit=node_retry_time_limit,
+                    **kwargs,
+                )
+                for url in redact_urls
+            ],
+            policy=policy,
+            max_failures=max_failures,
+            ejection_time=ejection_time,
+            health_check_timeout=health_check_timeout,
+            health_check_interval=health_check_interval,
+            job_retry_time_limit=job_retry_time_limit,
+        )
+
+    def __enter__(self) -> "RedactRequestsPool":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._closed.set()
+        with self._lock:
+            health_checker, self._health_checker = self._health_checker, None
+        if health_checker is not None:
+            health_checker.join()
+
+    @property
+    def redact_urls(self) -> List[str]:
+        return [node.url for node in self.nodes]
+
+    def post_job(
+        self,
+        file: IO,
+        service: ServiceType,
+        out_type: OutputType,
+        job_args: Optional[JobArguments] = None,
+        licence_plate_custom_stamp: Optional[IO] = None,
+        progress_callback: Optional[ProgressCallback] = None,
+    ) -> JobPostResponse:
+        rewindable = [f for f in (file, licence_plate_custom_stamp) if f is not None]
+        try:
+            positions = [f.tell() for f in rewindable if f.seekable()]
+        except (AttributeError, OSError):
+            positions = []
+        can_fail_over = len(positions) == len(rewindable)
+
+        tried: List[RedactNode] = []
+        while True:
+            node = self._choose_node(exclude=tried)
+            tried.append(node)
+            node.upload_started()
+            output_id = None
+            try:
+                post_response = self._call(
+                    node,
+                    node.redact_requests.post_job,
+                    file=file,
+                    service=service,
+                    out_type=out_type,
+                    job_args=job_args,
+                    licence_plate_custom_stamp=licence_plate_custom_stamp,
+                    progress_callback=progress_callback,
+                )
+                output_id = post_response.output_id
+            except (RedactConnectError, RedactResponseError) as e:
+                if not (can_fail_over and _is_node_failure(e)):
+                    raise
+                if not self._has_other_nodes(exclude=tried):
+                    raise
+                log.warning(f"Posting to {node.url} failed, trying another node: {e}")
+                for f, position in zip(rewindable, positions):
+                    f.seek(position)
+                continue
+            finally:
+                node.upload_finished(output_id)
+
+            with self._lock:
+                self._nodes_by_output_id[output_id] = node
+            log.debug(f"Job {output_id} runs on {node.url}")
+            return post_response
+
+    def get_output(
+        self,
+        service: ServiceType,
+        out_type: OutputType,
+        output_id: UUID,
+        ignore_warnings: bool = False,
+    ) -> JobResult:
+        node = self._node_of(service, out_type, output_id)
+        result = self._call_job(
+            node,
+            node.redact_requests.get_output,
+            service=service,
+            out_type=out_type,
+            output_id=output_id,
+            ignore_warnings=ignore_warnings,
+        )
+        self._job_done(node, output_id)
+        return result
+
+    def get_output_buffer(
+        self,
+        service: ServiceType,
+        out_type: OutputType,
+        output_id: UUID,
+        ignore_warnings: bool = False,
+        max_memory_size: int = DEFAULT_MAX_MEMORY_SIZE,
+    ) -> ResultBuffer:
+        node = self._node_of(service, out_type, output_id)
+        result = self._call_job(
+            node,
+            node.redact_requests.get_output_buffer,
+            service=service,
+            out_type=out_type,
+            output_id=output_id,
+            ignore_warnings=ignore_warnings,
+            max_memory_size=max_memory_size,
+        )
+        self._job_done(node, output_id)
+        return result
+
+    def write_output_to_file(
+        self,
+        service: ServiceType,
+        out_type: OutputType,
+        output_id: UUID,
+        file: Path,
+        ignore_warnings: bool = False,
+        **kwargs: Any,
+    ) -> Path:
+        node = self._node_of(service, out_type, output_id)
+        result = self._call_job(
+            node,
+            node.redact_requests.write_output_to_file,
+            service=service,
+            out_type=out_type,
+            output_id=output_id,
+            file=file,
+            ignore_warnings=ignore_warnings,
+            **kwargs,
+        )
+        self._job_done(node, output_id)
+        return result
+
+    def get_status(
+        self, service: ServiceType, out_type: OutputType, output_id: UUID
+    ) -> Dict:
+        node = self._node_of(service, out_type, output_id)
+        response_dict = self._call_job(
+            node,
+            node.redact_requests.get_status,
+            service=service,
+            out_type=out_type,
+            output_id=output_id,
+        )
+        job_status = JobStatus(**response_dict)
+        node.job_status(
+            output_id,
+            running=job_status.is_running(),
+            eta=job_status.estimated_time_to_completion,
+        )
+        return response_dict
+
+    def delete_output(
+        self, service: ServiceType, out_type: OutputType, output_id: UUID
+    ) -> Dict:
+        node = self._node_of(service, out_type, output_id)
+        try:
+            return self._call_job(
+                node,
+                node.redact_requests.delete_output,
+                service=service,
+                out_type=out_type,
+                output_id=output_id,
+            )
+        finally:
+            node.job_deleted(output_id)
+            with self._lock:
+                self._nodes_by_output_id.pop(output_id, None)
+
+    def check_health(self) -> None:
+        """
+        Runs the health check of all nodes now, ejecting the unreachable ones and re-admitting the others.
+        """
+        for node in self.nodes:
+            if self._is_healthy(node):
+                node.health_check_due = False
+                node.ejected_until = 0.0
+            else:
+                node.eject()
+
+    def _choose_node(self, exclude: Sequence[RedactNode] = ()) -> RedactNode:
+        self._start_health_checker()
+        candidates = [node for node in self.nodes if node not in exclude]
+        now = time.monotonic()
+        available = []
+        for node in candidates:
+            if node.is_ejected(now):
+                continue
+            if node.health_check_due:
+                if not self._is_healthy(node):
+                    log.warning(f"{node.url} is still unhealthy, keeping it ejected")
+                    node.eject()
+                    continue
+                log.info(f"{node.url} is healthy again")
+                node.health_check_due = False
+            available.append(node)
+        if available:
+            return self.policy.choose(available)
+
+        # better to try the node that comes back first than to fail right away
+        node = min(candidates, key=lambda n: n.ejected_until)
+        log.warning(f"All Redact nodes are ejected, trying {node.url}")
+        return node
+
+    def _start_health_checker(self) -> None:
+        if self.health_check_interval is None or self._closed.is_set():
+            return
+        with self._lock:
+            if self._health_checker is not None:
+                return
+            self._health_checker = threading.Thread(
+                target=self._check_health_periodically,
+                name="redact-pool-health-check",
+                daemon=True,
+            )
+            self._health_checker.start()
+
+    def _check_health_periodically(self) -> None:
+        while not self._closed.wait(self.health_check_interval):
+            for node in self.nodes:
+                if self._closed.is_set():
+                    return
+                healthy = self._is_healthy(node)
+                if not healthy and not node.is_ejected():
+                    log.warning(f"{node.url} is unreachable, ejecting it")
+                    node.eject()
+                elif healthy and node.health_check_due:
+                    log.info(f"{node.url} is healthy again")
+                    node.health_check_due = False
+                    node.ejected_until = 0.0
+
+    def _has_other_nodes(self, exclude: Sequence[RedactNode]) -> bool:
+        return any(node not in exclude and not node.is_ejected() for node in self.nodes)
+
+    def _is_healthy(self, node: RedactNode) -> bool:
+        return node.redact_requests.is_reachable(timeout=self.health_check_timeout)
+
+    def _node_of(
+        self, service: ServiceType, out_type: OutputType, output_id: UUID
+    ) -> RedactNode:
+        with self._lock:
+            node = self._nodes_by_output_id.get(output_id)
+        if node is not None:
+            return node
+
+        error: Optional[Exception] = None
+        for node in self.nodes:
+            try:
+                node.redact_requests.get_status(
+                    service=service, out_type=out_type, output_id=output_id
+                )
+            except (RedactConnectError, RedactResponseError) as e:
+                error = e
+                continue
+            log.debug(f"Found job {output_id} on {node.url}")
+            with self._lock:
+                self._nodes_by_output_id[output_id] = node
+            return node
+        raise error
+
+    def _job_done(self, node: RedactNode, output_id: UUID) -> None:
+        # jobs which are not deleted would otherwise be kept forever
+        node.job_done(output_id)
+        with self._lock:
+            self._nodes_by_output_id.pop(output_id, None)
+
+    def _call_job(self, node: RedactNode, func: Callable, **kwargs: Any) -> Any:
+        """
+        Requests of a job can't go to another node, they are retried while the node is unreachable.
+        """
+        deadline = time.monotonic() + self.job_retry_time_limit
+        delay = 1.0
+        while True:
+            try:
+                return self._call(node, func, **kwargs)
+            except RedactConnectError as e:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise
+                delay = min(delay, remaining)
+                log.warning(f"{node.url} is unreachable, retrying in {delay:.0f}s: {e}")
+                time.sleep(delay)
+                delay = min(2 * delay, 60.0)
+
+    def _call(self, node: RedactNode, func: Callable, **kwargs: Any) -> Any:
+        try:
+            result = func(**kwargs)
+        except (RedactConnectError, RedactResponseError) as e:
+            if _is_node_failure(e) and node.failed():
+                log.warning(f"Ejected {node.url} from the pool after: {e}")
+            raise
+        node.succeeded()
+        return result
+
+
+def _is_node_failure(e: Exception) -> bool:
+    """
+    Whether the error says something about the node rather than the job (like a 404 or 422 response).
+    """
+    if isinstance(e, RedactResponseError):
+        return e.status_code >= 500
+    return isinstance(e, RedactConnectError)
@@ -0,0 +1,201 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Union
+from uuid import UUID
+
+from pydantic import BaseModel
+from strenum import StrEnum
+
+from redact.errors import RedactResponseError
+from redact.v4 import JobArguments, OutputType, RedactInstance, RedactJob, ServiceType
+
+log = logging.getLogger()
+
+
+class JobJournalState(StrEnum):
+    uploaded = "uploaded"
+    finished = "finished"
+    failed = "failed"
+    downloaded = "downloaded"
+    deleted = "deleted"
+
+
+# jobs in these states may still be fetched from the backend
+RESUMABLE_STATES = [JobJournalState.uploaded, JobJournalState.finished]
+
+
+class JobJournalEntry(BaseModel):
+    file: str
+    output_id: UUID
+    state: JobJournalState
+    timestamp: float
+    # hash of the settings the job was started with, see job_settings_hash()
+    settings: Optional[str] = None
+
+
+def job_settings_hash(
+    service: ServiceType, out_type: OutputType, job_args: Optional[JobArguments]
+) -> str:
+    """
+    Identifies the settings of a job, so a job is only reattached by a run with the same settings. The status webhook
+    URL is left out, it changes with every run.
+    """
+    job_args_json = (job_args or JobArguments()).json(
+        exclude={"status_webhook_url"}, sort_keys=True
+    )
+    return hashlib.sha256(
+        f"{service.value}/{out_type.value}/{job_args_json}".encode()
+    ).hexdigest()
+
+
+class JobJournal:
+    """
+    Append-only JSONL journal recording which input file was uploaded as which job and how far the job got. It lets
+    a restarted redact_folder run reattach to jobs that were already uploaded (and possibly processed) by an earlier
+    run and only download their results, instead of uploading the files again.
+
+    Every line is one state transition, the last line of a file wins. Lines are flushed right away, so the journal
+    survives crashes of the client. When loaded with more than COMPACTION_RATIO lines per file (and at least
+    COMPACTION_MIN_LINES lines), the journal is rewritten with only the last line of every file.
+    """
+
+    FILE_NAME = ".redact_journal.jsonl"
+    COMPACTION_RATIO = 4
+    COMPACTION_MIN_LINES = 1000
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._entries: Dict[str, JobJournalEntry] = {}
+        self._load()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf8")
+        if self._file.tell() > 0 and not _ends_with_newline(self.path):
+            # terminate a line that was cut off by a crash, so the next entry is readable again
+            self._file.write("\n")
+
+    @classmethod
+    def in_dir(cls, dir: Union[str, Path]) -> "JobJournal":
+        return cls(Path(dir) / cls.FILE_NAME)
+
+    def __enter__(self) -> "JobJournal":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        n_lines = 0
+        with open(self.path, encoding="utf8") as f:
+            for line_number, line in enumerate(f, start=1):
+                n_lines = line_number
+                if not line.strip():
+                    continue
+                try:
+                    entry = JobJournalEntry.parse_raw(line)
+                except ValueError:
+                    # e.g. a line that was only partially written when the client crashed
+                    log.warning(
+                        f"Ignoring invalid line {line_number} of job journal {self.path}"
+                    )
+                    continue
+                self._entries[entry.file] = entry
+        log.info(f"Loaded {len(self._entries)} files from job journal {self.path}")
+        if n_lines >= max(
+            self.COMPACTION_MIN_LINES, self.COMPACTION_RATIO * len(self._entries)
+        ):
+            self._compact()
+
+    def _compact(self) -> None:
+        compacted_path = self.path.with_name(f"{self.path.name}.compacted")
+        with open(compacted_path, "w", encoding="utf8") as f:
+            for entry in self._entries.values():
+                f.write(entry.json() + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(compacted_path, self.path)
+        log.info(f"Compacted job journal {self.path} to {len(self._entries)} lines")
+
+    def get(self, file: Union[str, Path]) -> Optional[JobJournalEntry]:
+        with self._lock:
+            return self._entries.get(str(file))
+
+    def record(
+        self,
+        file: Union[str, Path],
+        output_id: UUID,
+        state: JobJournalState,
+        settings: Optional[str] = None,
+    ) -> None:
+        """
+        Records the state of the job of file. Without settings, those of the last entry of the job are kept.
+        """
+        entry = JobJournalEntry(
+            file=str(file),
+            output_id=output_id,
+            state=state,
+            timestamp=time.time(),
+            settings=settings,
+        )
+        with self._lock:
+            previous = self._entries.get(entry.file)
+            if settings is None and previous and previous.output_id == output_id:
+                entry.settings = previous.settings
+            self._entries[entry.file] = entry
+            self._file.write(entry.json() + "\n")
+            self._file.flush()
+
+    def reattach_job(
+        self,
+        file: Union[str, Path],
+        redact: RedactInstance,
+        job_args: Optional[JobArguments] = None,
+    ) -> Optional[RedactJob]:
+        """
+        Returns the job an earlier run started for file, if it was started with the same settings and still exists on
+        the backend.
+        """
+        entry = self.get(file)
+        if entry is None or entry.state not in RESUMABLE_STATES:
+            return None
+        if entry.settings != job_settings_hash(
+            redact.service, redact.out_type, job_args
+        ):
+            log.info(
+                f"Job {entry.output_id} of '{file}' from the journal was started with other settings, starting a "
+                f"new one"
+            )
+            return None
+
+        job = RedactJob(
+            redact_requests=redact.redact_requests,
+            service=redact.service,
+            out_type=redact.out_type,
+            output_id=entry.output_id,
+        )
+        try:
+            job.get_status()
+        except RedactResponseError as e:
+            log.info(
+                f"Job {entry.output_id} of '{file}' from the journal can't be resumed, starting a new one: {e}"
+            )
+            return None
+
+        log.debug(f"Reattached to job {entry.output_id} for input {file}")
+        return job
+
+
+def _ends_with_newline(path: Path) -> bool:
+    with open(path, "rb") as f:
+        f.seek(-1, 2)
+        return f.read(1) == b"\n"
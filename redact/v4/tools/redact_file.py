@@ -1,9 +1,14 @@
+import functools
 import logging
 from pathlib import Path
-from typing import Dict, Optional, Union
+from typing import IO, Dict, Optional, Union
 
+from redact.commons.deletion_queue import JobDeletionQueue
+from redact.commons.polling import PollingStrategy
+from redact.commons.result_cache import ResultCache, result_status_id
 from redact.commons.utils import normalize_path
 from redact.settings import Settings
+from redact.utils import normalize_url
 from redact.v4 import (
     JobArguments,
     JobState,
@@ -14,6 +19,8 @@ from redact.v4 import (
     RedactRequests,
     ServiceType,
 )
+from redact.v4.job_status_poller import JobStatusPoller
+from redact.v4.tools.job_journal import JobJournal, JobJournalState, job_settings_hash
 
 log = logging.getLogger()
 
@@ -32,15 +39,32 @@ def redact_file(
     api_key: Optional[str] = None,
     ignore_warnings: bool = False,
     skip_existing: bool = True,
+    create_output_dir: bool = True,
     auto_delete_job: bool = True,
     auto_delete_input_file: bool = False,
     waiting_time_between_job_status_checks: Optional[float] = None,
     redact_requests_param: Optional[RedactRequests] = None,
     custom_headers: Optional[Dict[str, str]] = None,
     start_job_timeout: Optional[float] = None,
+    job_status_poller: Optional[JobStatusPoller] = None,
+    polling_strategy: Optional[PollingStrategy] = None,
+    job_journal: Optional[JobJournal] = None,
+    result_cache: Optional[ResultCache] = None,
+    deletion_queue: Optional[JobDeletionQueue] = None,
 ) -> Optional[JobStatus]:
     """
     If no out_path is given, <input_filename_redacted> will be used.
+
+    If a job_status_poller is given, the job is handed over to it instead of polling its status in this thread.
+
+    If a job_journal is given, the progress of the job is recorded in it and a job that was started for the same
+    file by an earlier (interrupted) run is reused instead of uploading the file again.
+
+    If a result_cache is given, a cached result of the same input and arguments is reused instead of starting a job.
+
+    If a deletion_queue is given, the job is deleted in the background instead of before returning.
+
+    Without create_output_dir, the folder of output_path must exist already (e.g. created by redact_folder).
     """
 
     # input and output path
@@ -48,11 +72,10 @@ def redact_file(
     output_path = _get_out_path(
         output_path=output_path, file_path=file_path, output_type=output_type
     )
-    output_path.parent.mkdir(parents=True, exist_ok=True)
     log.debug(f"Anonymize {file_path}, writing result to {output_path} ...")
 
     # skip?
-    if skip_existing and Path(output_path).exists():
+    if _prepare_output_path(output_path, skip_existing, create_output_dir):
         log.debug(f"Skipping because output already exists: {output_path}")
         return
 
@@ -61,6 +84,35 @@ def redact_file(
         job_args = JobArguments()
     log.debug(f"Job arguments: {job_args}")
 
+    # result of an identical input from the cache?
+    result_cache_key = None
+    if result_cache is not None:
+        result_cache_key = ResultCache.key(
+            file_path,
+            service=service,
+            output_type=output_type,
+            job_args=job_args,
+            extra_files=[licence_plate_custom_stamp_path],
+            api_version="v4",
+            ignore_warnings=ignore_warnings,
+            redact_urls=sorted(
+                redact_requests_param.redact_urls
+                if redact_requests_param
+                else [normalize_url(redact_url)]
+            ),
+        )
+        cached_output_path = result_cache.materialize(result_cache_key, output_path)
+        if cached_output_path is not None:
+            log.debug(f"Took result for {file_path} from cache: {cached_output_path}")
+            if auto_delete_input_file:
+                log.debug(f"Deleting {file_path}")
+                Path(file_path).unlink()
+            return JobStatus(
+                output_id=result_status_id(result_cache_key),
+                state=JobState.finished,
+                progress=1.0,
+            )
+
     # custom LP stamps
     licence_plate_custom_stamp = None
     if licence_plate_custom_stamp_path:
@@ -84,23 +136,30 @@ def redact_file(
                 custom_headers=custom_headers,
                 start_job_timeout=start_job_timeout,
             )
-        with open(file_path, "rb") as file:
-            job: RedactJob = redact.start_job(
-                file=file,
-                job_args=job_args,
-                licence_plate_custom_stamp=licence_plate_custom_stamp,
-            )
+        job = _reattach_or_start_job(
+            redact,
+            file_path=file_path,
+            job_args=job_args,
+            licence_plate_custom_stamp=licence_plate_custom_stamp,
+            job_journal=job_journal,
+        )
 
-            log.debug(
-                f"Started job for input {file_path} successfully. Output_id: {job.output_id}"
-            )
-
-        if waiting_time_between_job_status_checks is not None:
-            job.wait_until_finished(waiting_time_between_job_status_checks)
+        if job_status_poller is not None:
+            job_status = job_status_poller.watch(
+                job,
+                interval=waiting_time_between_job_status_checks,
+                polling_strategy=polling_strategy,
+            ).result()
         else:
-            job.wait_until_finished()
+            if waiting_time_between_job_status_checks is not None:
+                job.wait_until_finished(
+                    waiting_time_between_job_status_checks,
+                    polling_strategy=polling_strategy,
+                )
+            else:
+                job.wait_until_finished(polling_strategy=polling_strategy)
 
-        job_status = job.get_status()
+            job_status = job.get_status()
         if job_status.warnings:
             for warning in job_status.warnings:
                 log.warning(f"Warning for '{file_path}': {warning}")
@@ -113,10 +172,17 @@ def redact_file(
             log.error(
                 f"Job{error_output_id} failed for '{file_path}': {job_status.error}"
             )
+            _record(job_journal, file_path, job, JobJournalState.failed)
             return job_status
+        _record(job_journal, file_path, job, JobJournalState.finished)
 
         # stream result to file
-        job.download_result_to_file(file=output_path, ignore_warnings=ignore_warnings)
+        result_path = job.download_result_to_file(
+            file=output_path, ignore_warnings=ignore_warnings
+        )
+        if result_cache_key is not None:
+            result_cache.store(result_cache_key, result_path)
+        _record(job_journal, file_path, job, JobJournalState.downloaded)
 
         # delete input file only if processing was successful
         if auto_delete_input_file:
@@ -125,15 +191,29 @@ def redact_file(
 
         return job_status
 
+    except KeyboardInterrupt:
+        # journaled jobs are kept, so the next run reattaches them instead of uploading the files again
+        if job_journal is not None:
+            auto_delete_job = False
+        raise
+
     finally:
         if licence_plate_custom_stamp:
             licence_plate_custom_stamp.close()
 
         try:
             # delete job in finally, to also delete and cancel server-side jobs if redact-client is killed (e.g. CTRL+C)
-            if auto_delete_job:
+            if auto_delete_job and deletion_queue is not None:
+                deletion_queue.put(
+                    job,
+                    on_deleted=functools.partial(
+                        _record, job_journal, file_path, job, JobJournalState.deleted
+                    ),
+                )
+            elif auto_delete_job:
                 log.debug(f"Deleting job {job.output_id}")
                 job.delete()
+                _record(job_journal, file_path, job, JobJournalState.deleted)
         except UnboundLocalError:
             # if the starting the job failed, there is no job variable and this Exception will be thrown
             pass
@@ -141,6 +221,37 @@ def redact_file(
         # End of finally. Delete input file intentionally not included in finally.
 
 
+def _reattach_or_start_job(
+    redact: RedactInstance,
+    file_path: Path,
+    job_args: JobArguments,
+    licence_plate_custom_stamp: Optional[IO],
+    job_journal: Optional[JobJournal],
+) -> RedactJob:
+    if job_journal is not None:
+        resumed_job = job_journal.reattach_job(file_path, redact, job_args)
+        if resumed_job is not None:
+            return resumed_job
+
+    with open(file_path, "rb") as file:
+        job = redact.start_job(
+            file=file,
+            job_args=job_args,
+            licence_plate_custom_stamp=licence_plate_custom_stamp,
+        )
+    log.debug(
+        f"Started job for input {file_path} successfully. Output_id: {job.output_id}"
+    )
+    _record(
+        job_journal,
+        file_path,
+        job,
+        JobJournalState.uploaded,
+        settings=job_settings_hash(redact.service, redact.out_type, job_args),
+    )
+    return job
+
+
 def _get_out_path(
     output_path: Union[str, Path], file_path: Path, output_type: OutputType
 ) -> Path:
@@ -151,3 +262,25 @@ def _get_out_path(
         f"{file_path.stem}_redacted{file_path.suffix}"
     )
     return normalize_path(anonymized_path)
+
+
+def _prepare_output_path(
+    output_path: Path, skip_existing: bool, create_output_dir: bool
+) -> bool:
+    """
+    Creates the folder of output_path if needed, returns whether an existing output is to be skipped.
+    """
+    if create_output_dir:
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+    return skip_existing and output_path.exists()
+
+
+def _record(
+    job_journal: Optional[JobJournal],
+    file_path: Path,
+    job: RedactJob,
+    state: JobJournalState,
+    settings: Optional[str] = None,
+) -> None:
+    if job_journal is not None:
+        job_journal.record(file_path, job.output_id, state, settings=settings)
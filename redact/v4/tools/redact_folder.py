@@ -1,26 +1,45 @@
 import functools
 import logging
 import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import queue
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple, Union
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Union
 
 import tqdm
 from tqdm.contrib.logging import logging_redirect_tqdm
 
-from redact.commons.summary import JobsSummary, summary
-from redact.commons.utils import (
-    files_in_dir,
-    is_archive,
-    is_image,
-    is_video,
-    normalize_path,
+from redact.commons.deletion_queue import JobDeletionQueue
+from redact.commons.load_balancing import LoadBalancingPolicyType
+from redact.commons.output_index import OutputIndex
+from redact.commons.polling import (
+    FixedPollingStrategy,
+    PollingStrategyType,
+    create_polling_strategy,
 )
+from redact.commons.result_cache import ResultCache
+from redact.commons.scheduling import SchedulingPolicy, iter_scheduled_files_in_dir
+from redact.commons.summary import JobsSummary, summary
+from redact.commons.utils import is_archive, is_image, is_video, normalize_path
+from redact.commons.watch import FolderWatcher, WatchOptions, create_folder_watcher
 from redact.errors import RedactConnectError, RedactResponseError
 from redact.settings import Settings
-from redact.v4 import InputType, JobArguments, JobStatus, OutputType, ServiceType
+from redact.v4 import (
+    InputType,
+    JobArguments,
+    JobStatus,
+    OutputType,
+    RedactRequests,
+    RedactRequestsPool,
+    ServiceType,
+)
+from redact.v4.job_status_poller import JobStatusPoller
+from redact.v4.tools.job_journal import JobJournal
 from redact.v4.tools.redact_file import redact_file
-from redact.v4.utils import calculate_jobs_summary
+from redact.v4.tools.redact_folder_pipeline import PipelineOptions, RedactFolderPipeline
+from redact.v4.utils import add_to_jobs_summary, calculate_jobs_summary
+from redact.v4.webhook_receiver import StatusWebhookReceiver, WebhookReceiverOptions
 
 log = logging.getLogger()
 
@@ -37,7 +56,7 @@ def redact_folder(
     service: ServiceType,
     job_args: Optional[JobArguments] = None,
     licence_plate_custom_stamp_path: Optional[str] = None,
-    redact_url: str = settings.redact_url_default,
+    redact_url: Union[str, List[str]] = settings.redact_url_default,
     api_key: Optional[str] = None,
     n_parallel_jobs: int = 1,
     ignore_warnings: bool = False,
@@ -46,7 +65,26 @@ def redact_folder(
     auto_delete_input_file: bool = False,
     custom_headers: Optional[Dict[str, str]] = None,
     start_job_timeout: Optional[float] = None,
+    pipelined: bool = False,
+    pipeline_options: Optional[PipelineOptions] = None,
+    shared_status_poller: bool = False,
+    polling_strategy: Optional[PollingStrategyType] = None,
+    webhook_receiver_options: Optional[WebhookReceiverOptions] = None,
+    journal: bool = False,
+    n_discovery_workers: int = 1,
+    result_cache: Optional[ResultCache] = None,
+    scheduling_policy: SchedulingPolicy = SchedulingPolicy.discovery,
+    priority_patterns: Optional[List[str]] = None,
+    load_balancing_policy: LoadBalancingPolicyType = LoadBalancingPolicyType.least_outstanding,
+    watch_options: Optional[WatchOptions] = None,
 ) -> JobsSummary:
+    """
+    With several redact_urls, the jobs are distributed across these Redact instances according to
+    load_balancing_policy, see RedactRequestsPool.
+
+    With watch_options, files added to input_dir later on are processed too, until the process is interrupted
+    (CTRL+C). The files are then taken in the order they arrive, scheduling_policy and priority_patterns don't apply.
+    """
     # Normalize paths, e.g.: '~/..' -> '/home'
     in_dir_path = normalize_path(input_dir)
     out_dir_path = normalize_path(output_dir)
@@ -61,84 +99,301 @@ def redact_folder(
     if not Path(out_dir_path).exists():
         os.makedirs(out_dir_path)
 
-    # List of relative input paths (only img/vid)
-    relative_file_paths = _get_relative_file_paths(
-        input_dir=in_dir_path, input_type=input_type
-    )
-    log.info(f"Found {len(relative_file_paths)} {input_type.value} to process")
-
-    # Fix input arguments to make method mappable
-    worker_function = functools.partial(
-        _try_redact_file_with_relative_path,
-        base_dir_in=in_dir_path,
-        base_dir_out=out_dir_path,
-        service=service,
-        input_type=input_type,
-        output_type=output_type,
-        job_args=job_args,
-        licence_plate_custom_stamp_path=licence_plate_custom_stamp_path,
-        redact_url=redact_url,
-        api_key=api_key,
-        ignore_warnings=ignore_warnings,
-        skip_existing=skip_existing,
-        auto_delete_job=auto_delete_job,
-        auto_delete_input_file=auto_delete_input_file,
-        custom_headers=custom_headers,
-        start_job_timeout=start_job_timeout,
-    )
+    folder_watcher: Optional[FolderWatcher] = None
+    if watch_options is not None:
+        log.info(f"Watching {in_dir_path} for new files, stop with CTRL+C ...")
+        folder_watcher = create_folder_watcher(
+            in_dir_path,
+            file_filter=_input_type_filter(input_type),
+            options=watch_options,
+        )
+        relative_file_paths = (
+            Path(file_path).relative_to(in_dir_path)
+            for file_path in folder_watcher.files()
+        )
+    else:
+        # Relative input paths (only img/vid), discovered while the first files are already processed
+        relative_file_paths = _get_relative_file_paths(
+            input_dir=in_dir_path,
+            input_type=input_type,
+            n_discovery_workers=n_discovery_workers,
+            scheduling_policy=scheduling_policy,
+            priority_patterns=priority_patterns,
+        )
 
-    log.info(f"Starting {n_parallel_jobs} parallel jobs to anonymize files ...")
+    # existing outputs are listed once, and their files are dropped before any job is submitted
+    output_index: Optional[OutputIndex] = None
+    if skip_existing:
+        output_index = OutputIndex.scan(
+            out_dir_path,
+            n_workers=n_discovery_workers,
+            # images and archives keep their suffix, the server names the other outputs
+            match_stems=output_type not in (OutputType.images, OutputType.archives),
+            input_dir=in_dir_path,
+            input_filter=_input_type_filter(input_type),
+        )
+        # while watching, outputs are written during the run
+        relative_file_paths = output_index.filter_missing(
+            relative_file_paths, refresh=folder_watcher is not None
+        )
 
-    job_statuses, exceptions = _parallel_map(
-        func=worker_function, items=relative_file_paths, n_parallel_jobs=n_parallel_jobs
-    )
+    job_status_poller: Optional[JobStatusPoller] = None
+    webhook_receiver: Optional[StatusWebhookReceiver] = None
+    if webhook_receiver_options is not None:
+        # the webhooks complete the jobs, polling is only the safety net for lost callbacks
+        job_status_poller = JobStatusPoller(
+            polling_strategy=FixedPollingStrategy(
+                webhook_receiver_options.fallback_poll_interval
+            )
+        )
+        webhook_receiver = StatusWebhookReceiver.from_options(
+            job_status_poller, webhook_receiver_options
+        )
+        webhook_receiver.start()
+        job_args = _with_status_webhook_url(job_args, webhook_receiver.url)
+    elif shared_status_poller:
+        job_status_poller = JobStatusPoller()
+
+    redact_requests_pool: Optional[RedactRequestsPool] = None
+    if not isinstance(redact_url, str):
+        if len(redact_url) == 1:
+            redact_url = redact_url[0]
+        else:
+            log.info(f"Distributing jobs across {', '.join(redact_url)}")
+            redact_requests_pool = RedactRequestsPool.from_urls(
+                redact_url,
+                policy=load_balancing_policy,
+                api_key=api_key,
+                custom_headers=custom_headers,
+                start_job_timeout=start_job_timeout,
+            )
+
+    # jobs of an interrupted earlier run are reattached instead of uploading their files again
+    job_journal: Optional[JobJournal] = None
+    if journal:
+        job_journal = JobJournal.in_dir(out_dir_path)
+
+    deletion_queue: Optional[JobDeletionQueue] = None
+    try:
+        if pipelined:
+            log.info(
+                "Starting pipeline with separate upload, poll, download and delete stages ..."
+            )
+            redact_requests = redact_requests_pool or RedactRequests(
+                redact_url=redact_url,
+                api_key=api_key,
+                custom_headers=custom_headers,
+                start_job_timeout=start_job_timeout,
+            )
+            pipeline = RedactFolderPipeline(
+                base_dir_in=in_dir_path,
+                base_dir_out=out_dir_path,
+                input_type=input_type,
+                output_type=output_type,
+                service=service,
+                redact_requests=redact_requests,
+                n_parallel_jobs=n_parallel_jobs,
+                options=pipeline_options,
+                job_args=job_args,
+                licence_plate_custom_stamp_path=licence_plate_custom_stamp_path,
+                ignore_warnings=ignore_warnings,
+                skip_existing=False,
+                create_output_dirs=output_index is None,
+                auto_delete_job=auto_delete_job,
+                auto_delete_input_file=auto_delete_input_file,
+                polling_strategy=polling_strategy,
+                job_status_poller=job_status_poller,
+                job_journal=job_journal,
+                result_cache=result_cache,
+            )
+            job_statuses, exceptions = pipeline.run(relative_file_paths)
+            return calculate_jobs_summary(job_statuses, exceptions)
+
+        # jobs are deleted in the background, so the workers can go on with the next file
+        if auto_delete_job:
+            deletion_queue = JobDeletionQueue()
+
+        # Fix input arguments to make method mappable
+        worker_function = functools.partial(
+            _try_redact_file_with_relative_path,
+            base_dir_in=in_dir_path,
+            base_dir_out=out_dir_path,
+            service=service,
+            input_type=input_type,
+            output_type=output_type,
+            job_args=job_args,
+            licence_plate_custom_stamp_path=licence_plate_custom_stamp_path,
+            redact_url=redact_url,
+            api_key=api_key,
+            ignore_warnings=ignore_warnings,
+            skip_existing=False,
+            create_output_dir=output_index is None,
+            auto_delete_job=auto_delete_job,
+            auto_delete_input_file=auto_delete_input_file,
+            custom_headers=custom_headers,
+            start_job_timeout=start_job_timeout,
+            polling_strategy=polling_strategy,
+            job_status_poller=job_status_poller,
+            job_journal=job_journal,
+            result_cache=result_cache,
+            redact_requests_param=redact_requests_pool,
+            deletion_queue=deletion_queue,
+        )
+
+        log.info(f"Starting {n_parallel_jobs} parallel jobs to anonymize files ...")
+
+        return _parallel_map(
+            func=worker_function,
+            items=relative_file_paths,
+            n_parallel_jobs=n_parallel_jobs,
+            stop=folder_watcher.stop if folder_watcher is not None else None,
+        )
+    finally:
+        if folder_watcher is not None:
+            folder_watcher.close()
+        if redact_requests_pool is not None:
+            redact_requests_pool.close()
+        if deletion_queue is not None:
+            # also on KeyboardInterrupt, so no server-side jobs are left behind
+            deletion_queue.shutdown()
+        if webhook_receiver is not None:
+            webhook_receiver.shutdown()
+        if job_status_poller is not None:
+            job_status_poller.shutdown()
+        if job_journal is not None:
+            job_journal.close()
 
-    return calculate_jobs_summary(job_statuses, exceptions)
+
+def _with_status_webhook_url(
+    job_args: Optional[JobArguments], status_webhook_url: str
+) -> JobArguments:
+    job_args = job_args or JobArguments()
+    if job_args.status_webhook_url:
+        log.warning(
+            f"Replacing status webhook URL {job_args.status_webhook_url} by the one of the embedded receiver."
+        )
+    return JobArguments(**{**job_args.dict(), "status_webhook_url": status_webhook_url})
 
 
 def _parallel_map(
-    func, items: List, n_parallel_jobs=1
-) -> Tuple[List[Optional[JobStatus]], Any]:
-    job_statuses = []
-    exceptions = []
+    func,
+    items: Iterable,
+    n_parallel_jobs=1,
+    stop: Optional[Callable[[], None]] = None,
+) -> JobsSummary:
+    """
+    Maps func over items with n_parallel_jobs threads and sums up the job statuses it returns. items are consumed
+    lazily in a separate thread, only a few more than n_parallel_jobs of them are submitted at a time. Results are
+    collected as they come in, also while items waits for new files (watch mode).
 
-    with logging_redirect_tqdm(), ThreadPoolExecutor(
-        max_workers=n_parallel_jobs
-    ) as executor:
-        futures = {executor.submit(func, item): item for item in items}
-        for future in tqdm.tqdm(as_completed(futures), total=len(futures)):
-            item = futures[future]
+    With stop (e.g. stopping a folder watcher), CTRL+C stops taking new items, waits for the submitted ones and
+    returns the summary so far instead of raising KeyboardInterrupt.
+    """
+    jobs_summary = JobsSummary()
+    futures = {}
+    pending_items: "queue.Queue[Any]" = queue.Queue(maxsize=n_parallel_jobs)
+    threading.Thread(
+        target=_feed_items, args=(items, pending_items), daemon=True
+    ).start()
+
+    def collect(done_futures) -> None:
+        for future in done_futures:
+            item = futures.pop(future)
             try:
-                job_statuses.append(future.result())
+                add_to_jobs_summary(jobs_summary, future.result())
             except Exception as e:
                 log.warning(
                     f"An exception occurred while processing the following file '{item}': {e}"
                 )
-                exceptions.append(e)
+                jobs_summary.failed += 1
+            progress.update()
+
+    with logging_redirect_tqdm(), ThreadPoolExecutor(
+        max_workers=n_parallel_jobs
+    ) as executor, tqdm.tqdm(total=0) as progress:
+        try:
+            while True:
+                if len(futures) >= 2 * n_parallel_jobs:
+                    collect(wait(futures, return_when=FIRST_COMPLETED).done)
+                    continue
+                collect([future for future in futures if future.done()])
+                try:
+                    item = pending_items.get(timeout=_COLLECT_INTERVAL)
+                except queue.Empty:
+                    continue
+                if item is _END_OF_ITEMS:
+                    break
+                if isinstance(item, _ItemsError):
+                    raise item.exception
+                futures[executor.submit(func, item)] = item
+                progress.total += 1
+                progress.refresh()
+            log.info(f"Found {progress.total} files to process")
+        except KeyboardInterrupt:
+            if stop is None:
+                raise
+            log.info(
+                f"Stopping, waiting for {len(futures)} running jobs (CTRL+C again to abort) ..."
+            )
+            stop()
+        while futures:
+            collect(wait(futures, return_when=FIRST_COMPLETED).done)
+
+    return jobs_summary
+
 
-    return job_statuses, exceptions
+# how long to wait for the next item before collecting finished jobs again
+_COLLECT_INTERVAL = 0.5
 
+_END_OF_ITEMS = object()
 
-def _get_relative_file_paths(input_dir: Path, input_type: InputType) -> List[Path]:
+
+class _ItemsError:
+    def __init__(self, exception: Exception):
+        self.exception = exception
+
+
+def _feed_items(items: Iterable, pending_items: "queue.Queue[Any]") -> None:
+    try:
+        for item in items:
+            pending_items.put(item)
+    except Exception as e:
+        pending_items.put(_ItemsError(e))
+    else:
+        pending_items.put(_END_OF_ITEMS)
+
+
+def _get_relative_file_paths(
+    input_dir: Path,
+    input_type: InputType,
+    n_discovery_workers: int = 1,
+    scheduling_policy: SchedulingPolicy = SchedulingPolicy.discovery,
+    priority_patterns: Optional[List[str]] = None,
+) -> Iterator[Path]:
     """
-    Return a list of all files in in_dir. But only relative to in_dir itself.
+    Return an iterator over all files in in_dir, but only relative to in_dir itself. The tree is walked lazily, unless
+    the files are ordered by a scheduling_policy or priority_patterns (see schedule_files).
 
-    Example: in_dir/sub/file[1-3].foo -> [sub/file1.foo, sub/file2.foo, sub/file3.foo]
+    Example: in_dir/sub/file[1-3].foo -> sub/file1.foo, sub/file2.foo, sub/file3.foo
     """
+    file_paths = iter_scheduled_files_in_dir(
+        dir=input_dir,
+        n_workers=n_discovery_workers,
+        file_filter=_input_type_filter(input_type),
+        policy=scheduling_policy,
+        priority_patterns=priority_patterns,
+    )
+    return (Path(file_path).relative_to(input_dir) for file_path in file_paths)
 
-    file_paths: List[str] = files_in_dir(dir=input_dir)
 
+def _input_type_filter(input_type: InputType) -> Callable[[str], bool]:
     if input_type == InputType.images:
-        file_paths = [fp for fp in file_paths if is_image(fp)]
-    elif input_type == InputType.videos:
-        file_paths = [fp for fp in file_paths if is_video(fp)]
-    elif input_type == InputType.archives:
-        file_paths = [fp for fp in file_paths if is_archive(fp)]
-    else:
-        raise ValueError(f"Unsupported input type {input_type}.")
-
-    relative_file_paths = [Path(fp).relative_to(input_dir) for fp in file_paths]
-    return relative_file_paths
+        return is_image
+    if input_type == InputType.videos:
+        return is_video
+    if input_type == InputType.archives:
+        return is_archive
+    raise ValueError(f"Unsupported input type {input_type}.")
 
 
 def _try_redact_file_with_relative_path(
@@ -168,6 +423,7 @@ def _redact_file_with_relative_path(
     base_dir_in: str,
     base_dir_out: str,
     input_type: InputType,
+    polling_strategy: Optional[PollingStrategyType] = None,
     **kwargs,
 ) -> Optional[JobStatus]:
     """This is an internal helper function."""
@@ -179,6 +435,10 @@ def _redact_file_with_relative_path(
             "Detecting images input, lowering waiting time between status checks."
         )
         waiting_time = 1.5
+    if polling_strategy is not None:
+        kwargs["polling_strategy"] = create_polling_strategy(
+            polling_strategy, interval=waiting_time
+        )
     return redact_file(
         file_path=in_path,
         output_path=out_path,
@@ -0,0 +1,414 @@
+import functools
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Tuple
+
+import tqdm
+from pydantic import BaseModel, conint
+from tqdm.contrib.logging import logging_redirect_tqdm
+
+from redact.commons.polling import PollingStrategyType, create_polling_strategy
+from redact.commons.result_cache import ResultCache, result_status_id
+from redact.v4 import (
+    InputType,
+    JobArguments,
+    JobState,
+    JobStatus,
+    OutputType,
+    RedactInstance,
+    RedactJob,
+    RedactRequests,
+    ServiceType,
+)
+from redact.v4.job_status_poller import JobStatusPoller
+from redact.v4.tools.job_journal import JobJournal, JobJournalState, job_settings_hash
+
+log = logging.getLogger()
+
+_STOP = object()
+
+
+class PipelineOptions(BaseModel):
+    """
+    Sizing of the staged redact_folder pipeline. Worker counts that are not set are derived from n_parallel_jobs.
+    """
+
+    n_upload_workers: Optional[conint(ge=1)] = None
+    n_poll_workers: Optional[conint(ge=1)] = None
+    n_download_workers: Optional[conint(ge=1)] = None
+    n_delete_workers: Optional[conint(ge=1)] = None
+    max_jobs_in_flight: Optional[conint(ge=1)] = None
+    queue_size: Optional[conint(ge=1)] = None
+
+
+class _PipelineItem:
+    def __init__(self, relative_file_path: Path, in_path: Path, out_path: Path):
+        self.relative_file_path = relative_file_path
+        self.in_path = in_path
+        self.out_path = out_path
+        self.job: Optional[RedactJob] = None
+        self.job_status: Optional[JobStatus] = None
+        self.result_cache_key: Optional[str] = None
+        self.holds_slot = False
+
+
+class RedactFolderPipeline:
+    """
+    Runs redact_folder as a pipeline of separately sized worker pools for uploading, status polling, downloading and
+    deleting jobs. Status polling of all jobs is done by one shared JobStatusPoller. Stages are connected by queues,
+    so uploads of later files overlap with the processing and download of earlier ones while the number of jobs on
+    the backend stays limited.
+    """
+
+    def __init__(
+        self,
+        base_dir_in: Path,
+        base_dir_out: Path,
+        input_type: InputType,
+        output_type: OutputType,
+        service: ServiceType,
+        redact_requests: RedactRequests,
+        n_parallel_jobs: int = 1,
+        options: Optional[PipelineOptions] = None,
+        job_args: Optional[JobArguments] = None,
+        licence_plate_custom_stamp_path: Optional[str] = None,
+        ignore_warnings: bool = False,
+        skip_existing: bool = True,
+        create_output_dirs: bool = True,
+        auto_delete_job: bool = True,
+        auto_delete_input_file: bool = False,
+        polling_strategy: Optional[PollingStrategyType] = None,
+        job_status_poller: Optional[JobStatusPoller] = None,
+        job_journal: Optional[JobJournal] = None,
+        result_cache: Optional[ResultCache] = None,
+    ):
+        options = options or PipelineOptions()
+        self.base_dir_in = Path(base_dir_in)
+        self.base_dir_out = Path(base_dir_out)
+        self.job_args = job_args or JobArguments()
+        self.licence_plate_custom_stamp_path = licence_plate_custom_stamp_path
+        self.ignore_warnings = ignore_warnings
+        self.skip_existing = skip_existing
+        self.create_output_dirs = create_output_dirs
+        self.auto_delete_job = auto_delete_job
+        self.auto_delete_input_file = auto_delete_input_file
+        self.polling_strategy = polling_strategy
+        self.job_journal = job_journal
+        self.result_cache = result_cache
+        self.service = service
+        self.output_type = output_type
+
+        self.n_upload_workers = options.n_upload_workers or n_parallel_jobs
+        self.n_poll_workers = options.n_poll_workers or 1
+        self.n_download_workers = options.n_download_workers or n_parallel_jobs
+        self.n_delete_workers = options.n_delete_workers or 1
+        max_jobs_in_flight = options.max_jobs_in_flight or 2 * n_parallel_jobs
+        queue_size = options.queue_size or 2 * n_parallel_jobs
+
+        self.poll_interval = 1.5 if input_type == InputType.images else 10
+
+        self._redact = RedactInstance(
+            redact_requests, service=service, out_type=output_type
+        )
+
+        self._upload_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        # a given poller is shared with the caller, who is in charge of shutting it down
+        self._owns_status_poller = job_status_poller is None
+        self._status_poller = job_status_poller or JobStatusPoller(
+            n_workers=self.n_poll_workers
+        )
+        self._download_queue: queue.Queue = queue.Queue()
+        self._delete_queue: queue.Queue = queue.Queue()
+        self._jobs_in_flight = threading.BoundedSemaphore(max_jobs_in_flight)
+        self._stopped = threading.Event()
+        self._keep_leftover_jobs = False
+
+        self._lock = threading.Condition()
+        self._n_submitted = 0
+        self._n_finished = 0
+        self._pending_items: List[_PipelineItem] = []
+        self._progress: Optional[tqdm.tqdm] = None
+
+        self.job_statuses: List[Optional[JobStatus]] = []
+        self.exceptions: List[Exception] = []
+
+    def run(
+        self, relative_file_paths: Iterable[Path]
+    ) -> Tuple[List[Optional[JobStatus]], List[Exception]]:
+        stages: List[Tuple[Callable, int]] = [
+            (self._upload_worker, self.n_upload_workers),
+            (self._download_worker, self.n_download_workers),
+            (self._delete_worker, self.n_delete_workers),
+        ]
+        threads = [
+            threading.Thread(target=worker, daemon=True)
+            for worker, n_workers in stages
+            for _ in range(n_workers)
+        ]
+
+        with logging_redirect_tqdm(), tqdm.tqdm() as self._progress:
+            self._status_poller.start()
+            for thread in threads:
+                thread.start()
+            try:
+                for relative_file_path in relative_file_paths:
+                    self._submit(Path(relative_file_path))
+                log.info(f"Found {self._n_submitted} files to process")
+                with self._lock:
+                    self._progress.total = self._n_submitted
+                    self._progress.refresh()
+                    while self._n_finished < self._n_submitted:
+                        self._lock.wait()
+            except KeyboardInterrupt:
+                # journaled jobs are kept, so the next run reattaches them instead of uploading the files again
+                if self.job_journal is not None:
+                    self._keep_leftover_jobs = True
+                raise
+            finally:
+                self._stop()
+
+        return self.job_statuses, self.exceptions
+
+    def _submit(self, relative_file_path: Path) -> None:
+        item = _PipelineItem(
+            relative_file_path=relative_file_path,
+            in_path=self.base_dir_in.joinpath(relative_file_path),
+            out_path=self.base_dir_out.joinpath(relative_file_path),
+        )
+        with self._lock:
+            self._n_submitted += 1
+            self._pending_items.append(item)
+            # files are still being discovered, the progress bar grows with them
+            self._progress.total = self._n_submitted
+            self._progress.refresh()
+        self._upload_queue.put(item)
+
+    def _stop(self) -> None:
+        self._stopped.set()
+        if self._owns_status_poller:
+            self._status_poller.shutdown()
+        for _ in range(self.n_download_workers):
+            self._download_queue.put(_STOP)
+        for _ in range(self.n_delete_workers):
+            self._delete_queue.put(_STOP)
+
+        # interrupted runs: also delete and cancel server-side jobs which did not make it through the pipeline
+        with self._lock:
+            leftover_jobs = [item.job for item in self._pending_items if item.job]
+            self._pending_items = []
+        if self.auto_delete_job and not self._keep_leftover_jobs:
+            for job in leftover_jobs:
+                try:
+                    job.delete()
+                except Exception as e:
+                    log.debug(f"Failed to delete job {job.output_id}: {e}")
+
+    def _finish(
+        self,
+        item: _PipelineItem,
+        job_status: Optional[JobStatus] = None,
+        exception: Optional[Exception] = None,
+    ) -> None:
+        if item.holds_slot:
+            item.holds_slot = False
+            self._jobs_in_flight.release()
+        with self._lock:
+            if exception is not None:
+                self.exceptions.append(exception)
+            else:
+                self.job_statuses.append(job_status)
+            self._n_finished += 1
+            if item in self._pending_items:
+                self._pending_items.remove(item)
+            self._progress.update()
+            self._lock.notify_all()
+
+    def _fail(self, item: _PipelineItem, exception: Exception) -> None:
+        log.debug(f"Unexpected exception: {exception}", exc_info=exception)
+        log.error(f"Error while anonymize {item.relative_file_path}: {str(exception)}")
+        if item.job is not None and self.auto_delete_job:
+            self._delete_queue.put((item, None, exception))
+        else:
+            self._finish(item, exception=exception)
+
+    def _upload_worker(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                item = self._upload_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                if self.create_output_dirs:
+                    item.out_path.parent.mkdir(parents=True, exist_ok=True)
+                if self.skip_existing and item.out_path.exists():
+                    log.debug(
+                        f"Skipping because output already exists: {item.out_path}"
+                    )
+                    self._finish(item)
+                    continue
+
+                while not self._jobs_in_flight.acquire(timeout=0.5):
+                    if self._stopped.is_set():
+                        return
+                item.holds_slot = True
+                # checked after waiting for a slot, so results of earlier jobs that finished meanwhile are found
+                if self._take_from_result_cache(item):
+                    continue
+                item.job = self._reattach_job(item)
+                if item.job is None:
+                    item.job = self._start_job(item)
+                    log.debug(
+                        f"Started job for input {item.in_path} successfully. Output_id: {item.job.output_id}"
+                    )
+                    self._record(
+                        item,
+                        JobJournalState.uploaded,
+                        settings=job_settings_hash(
+                            self.service, self.output_type, self.job_args
+                        ),
+                    )
+                self._watch(item)
+            except Exception as e:
+                self._fail(item, e)
+
+    def _watch(self, item: _PipelineItem) -> None:
+        polling_strategy = None
+        if self.polling_strategy is not None:
+            polling_strategy = create_polling_strategy(
+                self.polling_strategy, interval=self.poll_interval
+            )
+        future = self._status_poller.watch(
+            item.job, interval=self.poll_interval, polling_strategy=polling_strategy
+        )
+        future.add_done_callback(functools.partial(self._on_job_finished, item))
+
+    def _take_from_result_cache(self, item: _PipelineItem) -> bool:
+        if self.result_cache is None:
+            return False
+        item.result_cache_key = ResultCache.key(
+            item.in_path,
+            service=self.service,
+            output_type=self.output_type,
+            job_args=self.job_args,
+            extra_files=[self.licence_plate_custom_stamp_path],
+            api_version="v4",
+            ignore_warnings=self.ignore_warnings,
+            redact_urls=sorted(self._redact.redact_requests.redact_urls),
+        )
+        cached_output_path = self.result_cache.materialize(
+            item.result_cache_key, item.out_path
+        )
+        if cached_output_path is None:
+            return False
+
+        log.debug(f"Took result for {item.in_path} from cache: {cached_output_path}")
+        if self.auto_delete_input_file:
+            log.debug(f"Deleting {item.in_path}")
+            item.in_path.unlink()
+        self._finish(
+            item,
+            job_status=JobStatus(
+                output_id=result_status_id(item.result_cache_key),
+                state=JobState.finished,
+                progress=1.0,
+            ),
+        )
+        return True
+
+    def _reattach_job(self, item: _PipelineItem) -> Optional[RedactJob]:
+        if self.job_journal is None:
+            return None
+        return self.job_journal.reattach_job(item.in_path, self._redact, self.job_args)
+
+    def _record(
+        self,
+        item: _PipelineItem,
+        state: JobJournalState,
+        settings: Optional[str] = None,
+    ) -> None:
+        if self.job_journal is not None:
+            self.job_journal.record(
+                item.in_path, item.job.output_id, state, settings=settings
+            )
+
+    def _start_job(self, item: _PipelineItem) -> RedactJob:
+        licence_plate_custom_stamp = None
+        if self.licence_plate_custom_stamp_path:
+            licence_plate_custom_stamp = open(
+                self.licence_plate_custom_stamp_path, "rb"
+            )
+        try:
+            with open(item.in_path, "rb") as file:
+                return self._redact.start_job(
+                    file=file,
+                    job_args=self.job_args,
+                    licence_plate_custom_stamp=licence_plate_custom_stamp,
+                )
+        finally:
+            if licence_plate_custom_stamp:
+                licence_plate_custom_stamp.close()
+
+    def _on_job_finished(self, item: _PipelineItem, future: Future) -> None:
+        if future.cancelled():
+            # the pipeline is shutting down, the job is deleted with the other leftovers
+            return
+        try:
+            job_status = future.result()
+            item.job_status = job_status
+            for warning in job_status.warnings:
+                log.warning(f"Warning for '{item.in_path}': {warning}")
+            if job_status.state == JobState.failed:
+                log.error(
+                    f"Job {job_status.output_id} failed for '{item.in_path}': {job_status.error}"
+                )
+                self._record(item, JobJournalState.failed)
+                self._delete_queue.put((item, job_status, None))
+            else:
+                self._record(item, JobJournalState.finished)
+                self._download_queue.put(item)
+        except Exception as e:
+            self._fail(item, e)
+
+    def _download_worker(self) -> None:
+        while True:
+            item = self._download_queue.get()
+            if item is _STOP:
+                return
+            try:
+                result_path = item.job.download_result_to_file(
+                    file=item.out_path, ignore_warnings=self.ignore_warnings
+                )
+                if item.result_cache_key is not None:
+                    self.result_cache.store(item.result_cache_key, result_path)
+                self._record(item, JobJournalState.downloaded)
+                if item.holds_slot:
+                    item.holds_slot = False
+                    self._jobs_in_flight.release()
+
+                # delete input file only if processing was successful
+                if self.auto_delete_input_file:
+                    log.debug(f"Deleting {item.in_path}")
+                    item.in_path.unlink()
+
+                self._delete_queue.put((item, item.job_status, None))
+            except Exception as e:
+                self._fail(item, e)
+
+    def _delete_worker(self) -> None:
+        while True:
+            entry = self._delete_queue.get()
+            if entry is _STOP:
+                return
+            item, job_status, exception = entry
+            try:
+                if self.auto_delete_job:
+                    log.debug(f"Deleting job {item.job.output_id}")
+                    item.job.delete()
+                    self._record(item, JobJournalState.deleted)
+            except Exception as e:
+                log.error(f"Error while deleting job {item.job.output_id}: {str(e)}")
+                exception = exception or e
+            self._finish(item, job_status=job_status, exception=exception)
@@ -10,15 +10,26 @@ def calculate_jobs_summary(
     jobs_summary = JobsSummary()
 
     for job_status in job_statuses:
-        if job_status is not None:
-            if job_status.warnings:
-                jobs_summary.warnings += 1
-
-            if job_status.state == JobState.failed:
-                jobs_summary.failed += 1
-            elif job_status.state == JobState.finished:
-                jobs_summary.successful += 1
+        add_to_jobs_summary(jobs_summary, job_status)
 
     jobs_summary.failed += len(exceptions)
 
     return jobs_summary
+
+
+def add_to_jobs_summary(
+    jobs_summary: JobsSummary, job_status: Optional[JobStatus]
+) -> None:
+    """
+    Counts a single job into jobs_summary, for summing up results as they come in instead of keeping them all.
+    """
+    if job_status is None:
+        return
+
+    if job_status.warnings:
+        jobs_summary.warnings += 1
+
+    if job_status.state == JobState.failed:
+        jobs_summary.failed += 1
+    elif job_status.state == JobState.finished:
+        jobs_summary.successful += 1
@@ -0,0 +1,158 @@
+import json
+import logging
+import secrets
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from uuid import UUID
+
+from pydantic import BaseModel
+
+from redact.v4.job_status_poller import JobStatusPoller
+
+log = logging.getLogger("redact-requests")
+
+
+class WebhookReceiverOptions(BaseModel):
+    """
+    Settings of the embedded status webhook receiver. public_url is the URL under which Redact can reach the
+    receiver, by default it is derived from the host name of this machine and the port. The receiver only listens on
+    localhost by default, set host to "0.0.0.0" if Redact runs on another machine.
+    """
+
+    host: str = "127.0.0.1"
+    port: int = 0
+    public_url: Optional[str] = None
+    fallback_poll_interval: float = 60.0
+
+
+class StatusWebhookReceiver:
+    """
+    Lightweight HTTP server receiving the status webhook calls of Redact jobs (see JobArguments.status_webhook_url)
+    and forwarding them to a JobStatusPoller, which checks the status of the job right away instead of waiting for
+    its next poll.
+
+    Requests are expected to carry the job's output_id in a JSON body, or as the last segment of the request path.
+    As the requests are not authenticated, they are only taken as a hint: the status is always requested from Redact,
+    never taken from the request. Only requests under the random path of the receiver (part of url) are accepted.
+    """
+
+    def __init__(
+        self,
+        job_status_poller: JobStatusPoller,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        public_url: Optional[str] = None,
+    ):
+        self.job_status_poller = job_status_poller
+        self.host = host
+        self.port = port
+        self._public_url = public_url
+        # unguessable path, so only Redact (which gets it with the job) can trigger status checks
+        self.token = secrets.token_urlsafe(16)
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_options(
+        cls, job_status_poller: JobStatusPoller, options: WebhookReceiverOptions
+    ) -> "StatusWebhookReceiver":
+        return cls(
+            job_status_poller=job_status_poller,
+            host=options.host,
+            port=options.port,
+            public_url=options.public_url,
+        )
+
+    def __enter__(self) -> "StatusWebhookReceiver":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.shutdown()
+
+    @property
+    def url(self) -> str:
+        if self._public_url:
+            return f"{self._public_url.rstrip('/')}/{self.token}/"
+        host = self.host
+        if host in ("", "0.0.0.0", "::"):
+            host = socket.gethostname()
+        return f"http://{host}:{self.port}/{self.token}/"
+
+    def start(self) -> None:
+        if self._server is not None:
+            return
+        self._server = ThreadingHTTPServer(
+            (self.host, self.port), self._create_handler()
+        )
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(
+            target=self._server.serve_forever,
+            name="redact-webhook-receiver",
+            daemon=True,
+        )
+        self._thread.start()
+        log.info(f"Receiving job status webhooks on port {self.port}")
+
+    def shutdown(self) -> None:
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+        self._server = None
+        self._thread = None
+
+    def handle_notification(self, path: str, body: bytes) -> bool:
+        """
+        Triggers a status check of the job of a webhook call. Returns False if the call is not for this receiver or
+        did not identify a job.
+        """
+        prefix = f"/{self.token}/"
+        if not (path.rstrip("/") + "/").startswith(prefix):
+            return False
+        try:
+            payload = json.loads(body) if body else {}
+        except ValueError:
+            payload = {}
+
+        output_id: Optional[UUID] = None
+        if isinstance(payload, dict):
+            output_id = _parse_uuid(payload.get("output_id"))
+        if output_id is None:
+            output_id = _parse_uuid(path.rstrip("/").rsplit("/", 1)[-1])
+        if output_id is None:
+            return False
+
+        log.debug(f"Received status webhook for job {output_id}")
+        self.job_status_poller.notify(output_id)
+        return True
+
+    def _create_handler(self):
+        receiver = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length)
+                known = receiver.handle_notification(self.path, body)
+                self.send_response(200 if known else 400)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            do_PUT = do_POST
+
+            def log_message(self, format, *args):
+                log.debug(f"Webhook receiver: {format % args}")
+
+        return _Handler
+
+
+def _parse_uuid(value) -> Optional[UUID]:
+    try:
+        return UUID(str(value))
+    except ValueError:
+        return None
@@ -0,0 +1,74 @@
+import threading
+import uuid
+
+import httpx
+
+from redact.commons.deletion_queue import JobDeletionQueue
+from redact.errors import RedactConnectError, RedactResponseError
+
+
+class FakeJob:
+    def __init__(self, errors=()):
+        self.output_id = uuid.uuid4()
+        self.errors = list(errors)
+        self.n_attempts = 0
+        self.deleted = threading.Event()
+
+    def delete(self):
+        self.n_attempts += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        self.deleted.set()
+
+
+def _response_error(status_code: int) -> RedactResponseError:
+    return RedactResponseError(httpx.Response(status_code))
+
+
+def test_queue_deletes_all_jobs_before_shutdown():
+    # GIVEN many queued jobs
+    jobs = [FakeJob() for _ in range(50)]
+    deleted = []
+
+    # WHEN the queue is shut down
+    with JobDeletionQueue(n_workers=3, batch_size=4) as deletion_queue:
+        for job in jobs:
+            deletion_queue.put(job, on_deleted=lambda job=job: deleted.append(job))
+
+    # THEN all jobs were deleted once and reported
+    assert all(job.deleted.is_set() and job.n_attempts == 1 for job in jobs)
+    assert len(deleted) == len(jobs)
+    assert deletion_queue.n_deleted == len(jobs)
+    assert deletion_queue.n_pending == 0
+
+
+def test_queue_retries_failed_deletions():
+    # GIVEN jobs that fail temporarily, are gone already and fail permanently
+    flaky = FakeJob(errors=[RedactConnectError("down"), _response_error(503)])
+    gone = FakeJob(errors=[_response_error(404)])
+    broken = FakeJob(errors=[_response_error(500)] * 3)
+
+    # WHEN they are deleted by the queue
+    with JobDeletionQueue(max_attempts=3, retry_delay=0.01) as deletion_queue:
+        for job in (flaky, gone, broken):
+            deletion_queue.put(job)
+
+    # THEN temporary errors are retried, missing jobs count as deleted and the queue gives up eventually
+    assert flaky.deleted.is_set() and flaky.n_attempts == 3
+    assert gone.n_attempts == 1
+    assert broken.n_attempts == 3
+    assert deletion_queue.n_deleted == 2
+    assert deletion_queue.failed == [broken]
+
+
+def test_queue_deletes_right_away_after_shutdown():
+    # GIVEN a queue that was shut down
+    deletion_queue = JobDeletionQueue()
+    deletion_queue.shutdown()
+
+    # WHEN another job is queued
+    job = FakeJob()
+    deletion_queue.put(job)
+
+    # THEN it is deleted in the calling thread
+    assert job.deleted.is_set()
@@ -0,0 +1,73 @@
+import uuid
+from pathlib import Path
+
+import httpx
+
+from redact.commons.download import (
+    DownloadOptions,
+    FsyncPolicy,
+    parse_content_range,
+    split_ranges,
+)
+from redact.v4 import OutputType, RedactRequests, ServiceType
+
+
+def test_split_ranges_covers_all_bytes():
+    # GIVEN the remaining bytes of a download after a first segment
+    start, total = 100, 1000
+
+    # WHEN they are split into segments
+    ranges = split_ranges(start, total, n_segments=4, min_segment_size=10)
+
+    # THEN the segments are contiguous and cover every byte once
+    assert ranges == [(100, 324), (325, 549), (550, 774), (775, 999)]
+
+
+def test_split_ranges_respects_min_segment_size():
+    assert split_ranges(0, 1000, n_segments=8, min_segment_size=400) == [
+        (0, 399),
+        (400, 799),
+        (800, 999),
+    ]
+    assert split_ranges(1000, 1000, n_segments=8, min_segment_size=400) == []
+
+
+def test_parse_content_range():
+    assert parse_content_range("bytes 0-99/1000") == (0, 99, 1000)
+    assert parse_content_range("bytes 0-99/*") == (0, 99, None)
+    assert parse_content_range("items 0-99/1000") is None
+    assert parse_content_range(None) is None
+
+
+def test_download_with_tuned_options(tmp_path: Path):
+    # GIVEN a result whose Content-Length is larger than its body
+    content = bytes(range(256)) * 1000
+    client = httpx.Client(
+        transport=httpx.MockTransport(
+            lambda request: httpx.Response(
+                200,
+                headers={
+                    "Content-Length": str(len(content) + 100),
+                    "Content-Disposition": 'attachment; filename="output.mp4"',
+                },
+                content=iter([content[:1000], content[1000:]]),
+            )
+        )
+    )
+    options = DownloadOptions(
+        chunk_size=4096, buffer_size=0, fsync=FsyncPolicy.file_and_dir
+    )
+
+    # WHEN it is downloaded with a preallocated file and fsync
+    result_path = RedactRequests(
+        httpx_client=client, download_options=options
+    ).write_output_to_file(
+        service=ServiceType.blur,
+        out_type=OutputType.videos,
+        output_id=uuid.uuid4(),
+        file=tmp_path / "video.mp4",
+    )
+
+    # THEN the file holds exactly the received bytes
+    assert result_path == tmp_path / "video.mp4"
+    assert result_path.read_bytes() == content
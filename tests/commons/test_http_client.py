@@ -0,0 +1,114 @@
+import sys
+
+import httpcore
+import pytest
+
+from redact.commons.http_client import (
+    HttpClientOptions,
+    HttpClientRegistry,
+    create_http_client,
+)
+
+
+def test_client_uses_pool_limits():
+    # GIVEN explicit pool limits
+    options = HttpClientOptions(
+        max_connections=7, max_keepalive_connections=3, keepalive_expiry=1.5
+    )
+
+    # WHEN a client is created with them
+    with create_http_client(options, timeout=10) as client:
+        pool = client._transport._pool
+
+        # THEN its connection pool is sized accordingly
+        assert pool._max_connections == 7
+        assert pool._max_keepalive_connections == 3
+        assert pool._keepalive_expiry == 1.5
+        assert client.timeout.read == 10
+
+
+def test_http2_without_h2_gives_helpful_error(monkeypatch):
+    # GIVEN an environment without the h2 package
+    monkeypatch.setitem(sys.modules, "h2", None)
+
+    # WHEN a client with HTTP/2 is created
+    # THEN the error tells how to install it
+    with pytest.raises(ImportError, match=r"redact\[http2\]"):
+        create_http_client(HttpClientOptions(http2=True))
+
+
+def test_registry_gives_each_node_its_own_pool():
+    # GIVEN a registry
+    registry = HttpClientRegistry()
+    options = HttpClientOptions(max_connections=4)
+
+    # WHEN clients for two nodes are requested (one of them twice, spelled differently)
+    node_a = registry.get("http://node-a:8787", options=options)
+    node_a_again = registry.get("node-a:8787", options=options)
+    node_b = registry.get("http://node-b:8787", options=options)
+
+    # THEN each node gets one client with its own pool of the requested size
+    assert node_a is node_a_again
+    assert node_a is not node_b
+    assert node_a._transport is not node_b._transport
+    assert node_b._transport._pool._max_connections == 4
+    registry.close()
+
+
+def test_registry_shares_pool_between_timeouts():
+    # GIVEN a registry
+    registry = HttpClientRegistry()
+    options = HttpClientOptions()
+
+    # WHEN clients with different timeouts (like v3 and v4) are requested for the same node
+    v3_client = registry.get("http://node:8787", options=options)
+    v4_client = registry.get("http://node:8787", options=options, timeout=60)
+
+    # THEN they keep their timeouts but share one connection pool
+    assert v3_client.timeout.read == 5
+    assert v4_client.timeout.read == 60
+    assert v3_client._transport is v4_client._transport
+
+    # WHEN the pool size changes
+    resized = registry.get(
+        "http://node:8787", options=HttpClientOptions(max_connections=1)
+    )
+
+    # THEN the node gets a new pool
+    assert resized._transport is not v3_client._transport
+    registry.close()
+
+
+def test_registry_close():
+    # GIVEN a registry with a client
+    registry = HttpClientRegistry()
+    client = registry.get("http://node:8787", options=HttpClientOptions())
+
+    # WHEN the registry is closed
+    registry.close()
+
+    # THEN the client is closed and a new one is created afterwards
+    assert client.is_closed
+    new_client = registry.get("http://node:8787", options=HttpClientOptions())
+    assert new_client is not client
+    assert not new_client.is_closed
+    registry.close()
+
+
+def test_registry_uses_proxy_of_environment(monkeypatch):
+    # GIVEN a proxy for HTTPS in the environment, except for one host
+    monkeypatch.setenv("HTTPS_PROXY", "http://proxy:3128")
+    monkeypatch.setenv("NO_PROXY", "internal-node")
+    registry = HttpClientRegistry()
+
+    # WHEN clients for nodes are requested
+    proxied = registry.get("https://redact.example.com", options=HttpClientOptions())
+    plain_http = registry.get("http://node:8787", options=HttpClientOptions())
+    excluded = registry.get("https://internal-node", options=HttpClientOptions())
+
+    # THEN the HTTPS node is reached through the proxy, like with a plain httpx.Client, the others directly
+    assert isinstance(proxied._transport._pool, httpcore.HTTPProxy)
+    assert proxied._transport._pool._proxy_url.host == b"proxy"
+    assert not isinstance(plain_http._transport._pool, httpcore.HTTPProxy)
+    assert not isinstance(excluded._transport._pool, httpcore.HTTPProxy)
+    registry.close()
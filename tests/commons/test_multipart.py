@@ -0,0 +1,85 @@
+import asyncio
+from io import BytesIO
+from pathlib import Path
+
+import pytest
+from httpx._multipart import MultipartStream
+
+from redact.commons.multipart import StreamingMultipartBody
+
+
+@pytest.fixture
+def some_file(tmp_path: Path):
+    path = tmp_path / 'some "video".mp4'
+    path.write_bytes(bytes(range(256)) * 1000)
+    with open(path, "rb") as f:
+        yield f
+
+
+def test_body_is_encoded_like_httpx(some_file):
+    # GIVEN files as they are posted with a job
+    files = {"file": some_file, "custom_labels": b'{"faces": []}'}
+
+    # WHEN they are encoded as streaming body and by httpx
+    body = StreamingMultipartBody(files, chunk_size=1000, boundary=b"boundary")
+    expected = b"".join(MultipartStream(data={}, files=files, boundary=b"boundary"))
+
+    # THEN the bodies are the same and the length is known up front
+    assert b"".join(body) == expected
+    assert len(body) == len(expected)
+    assert body.headers["Content-Length"] == str(len(expected))
+
+
+def test_body_is_streamed_in_chunks(some_file):
+    # GIVEN a streaming body with a progress callback
+    progress = []
+    body = StreamingMultipartBody(
+        {"file": some_file},
+        chunk_size=4096,
+        progress_callback=lambda sent, total: progress.append((sent, total)),
+    )
+
+    # WHEN the body is iterated twice (e.g. for a retry)
+    first = list(body)
+    first_progress, progress[:] = list(progress), []
+    second = list(body)
+
+    # THEN no chunk is larger than the chunk size, both iterations are the same and the progress reaches the total
+    assert max(len(chunk) for chunk in first) <= 4096
+    assert first == second
+    sent = [p[0] for p in first_progress]
+    assert sent == sorted(sent)
+    assert first_progress[-1] == (len(body), len(body))
+    assert progress == first_progress
+
+
+def test_body_from_bytes_io():
+    # GIVEN an in-memory file without a name
+    file = BytesIO(b"some content")
+    file.read(4)
+
+    # WHEN it is encoded
+    body = StreamingMultipartBody({"file": file}, boundary=b"boundary")
+
+    # THEN the whole content is sent
+    assert b"".join(body) == b"".join(
+        MultipartStream(
+            data={}, files={"file": BytesIO(b"some content")}, boundary=b"boundary"
+        )
+    )
+
+
+def test_body_is_streamed_asynchronously(some_file):
+    # GIVEN a streaming body
+    body = StreamingMultipartBody({"file": some_file}, chunk_size=4096)
+
+    async def read_twice():
+        first = [chunk async for chunk in body.aiter_bytes()]
+        second = [chunk async for chunk in body.aiter_bytes()]
+        return first, second
+
+    # WHEN it is read by an event loop, twice
+    first, second = asyncio.run(read_twice())
+
+    # THEN both iterations are the same as the synchronous one
+    assert first == second == list(body)
@@ -0,0 +1,91 @@
+from pathlib import Path
+
+from redact.commons.output_index import OutputIndex
+from redact.commons.utils import is_image
+
+
+def test_outputs_are_found_by_stem(tmp_path: Path):
+    # GIVEN an output dir with results, the job journal and partial downloads
+    (tmp_path / "a").mkdir()
+    (tmp_path / "a/video.mp4").write_bytes(b"result")
+    (tmp_path / "image.jpeg").write_bytes(b"result")
+    (tmp_path / ".redact_journal.jsonl").write_bytes(b"{}")
+    (tmp_path / "a/tmpk2_x9q0b").write_bytes(b"partial")
+    (tmp_path / "a/.other.mp4.1f2e.tmp").write_bytes(b"partial")
+
+    # WHEN it is indexed
+    index = OutputIndex.scan(tmp_path, n_workers=2)
+
+    # THEN the results are found whatever the suffix of the input, the other files are ignored
+    assert len(index) == 2
+    assert Path("a/video.avi") in index
+    assert Path("image.jpeg") in index
+    assert Path("video.avi") not in index
+    assert Path("a/other.mp4") not in index
+    assert Path(".redact_journal.jsonl") not in index
+    assert Path("a/tmpk2_x9q0b") not in index
+
+
+def test_outputs_are_found_by_name_only_without_match_stems(tmp_path: Path):
+    # GIVEN an index of outputs whose suffix is known
+    index = OutputIndex(tmp_path, ["a/done.jpeg"], match_stems=False)
+
+    # THEN only inputs with the same name are processed already
+    assert Path("a/done.jpeg") in index
+    assert Path("a/done.png") not in index
+
+
+def test_ambiguous_stems_are_not_skipped(tmp_path: Path, caplog):
+    # GIVEN inputs with the same stem in one folder, and the output of one of them
+    input_dir = tmp_path / "in"
+    (input_dir / "a").mkdir(parents=True)
+    for name in ("img.jpeg", "img.png", "other.jpeg", "other.txt"):
+        (input_dir / "a" / name).write_bytes(b"image")
+    index = OutputIndex(
+        tmp_path / "out",
+        ["a/img.mp4", "a/other.mp4"],
+        input_dir=input_dir,
+        input_filter=is_image,
+    )
+
+    # WHEN the inputs are filtered
+    missing = list(
+        index.filter_missing(
+            [Path("a/img.jpeg"), Path("a/img.png"), Path("a/other.jpeg")],
+            create_dirs=False,
+        )
+    )
+
+    # THEN the inputs which can't be told apart are processed, with a warning, while a stem of one input is matched
+    assert missing == [Path("a/img.jpeg"), Path("a/img.png")]
+    assert caplog.text.count("several inputs") == 1
+
+
+def test_filter_missing_creates_output_dirs(tmp_path: Path):
+    # GIVEN an index with one output
+    index = OutputIndex(tmp_path, ["a/done.jpeg"])
+
+    # WHEN input paths are filtered
+    missing = list(
+        index.filter_missing(
+            iter([Path("a/done.png"), Path("a/new.jpeg"), Path("b/c/new.jpeg")])
+        )
+    )
+
+    # THEN the paths without output are left, and their output dirs exist
+    assert missing == [Path("a/new.jpeg"), Path("b/c/new.jpeg")]
+    assert (tmp_path / "b/c").is_dir()
+
+
+def test_filter_missing_refreshes_outputs(tmp_path: Path):
+    # GIVEN an index scanned before an output was written (e.g. while watching the input folder)
+    index = OutputIndex.scan(tmp_path)
+    (tmp_path / "a").mkdir()
+    (tmp_path / "a/new.jpeg").write_bytes(b"result")
+
+    # WHEN the input is yielded again and filtered with refresh
+    missing = list(index.filter_missing([Path("a/new.jpeg")], refresh=True))
+
+    # THEN its output is found
+    assert missing == []
+    assert Path("a/new.jpeg") in index
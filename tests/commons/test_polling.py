@@ -0,0 +1,77 @@
+import uuid
+from typing import Optional
+
+import pytest
+
+from redact.commons.polling import (
+    AdaptivePollingStrategy,
+    BackoffPollingStrategy,
+    FixedPollingStrategy,
+    PollingStrategyType,
+    create_polling_strategy,
+)
+from redact.v4 import JobState, JobStatus
+
+
+def _status(progress: Optional[float] = None, eta: Optional[float] = None) -> JobStatus:
+    return JobStatus(
+        output_id=uuid.uuid4(),
+        state=JobState.active,
+        progress=progress,
+        estimated_time_to_completion=eta,
+    )
+
+
+def test_fixed_polling_strategy():
+    strategy = FixedPollingStrategy(interval=2)
+    assert strategy.first_interval() == 2
+    assert strategy.next_interval(2, _status()) == 2
+
+
+def test_backoff_polling_strategy_is_bounded():
+    strategy = BackoffPollingStrategy(interval=1, factor=2, max_interval=5)
+    intervals = [strategy.first_interval()]
+    for _ in range(5):
+        intervals.append(strategy.next_interval(intervals[-1], _status()))
+    assert intervals == [1, 2, 4, 5, 5, 5]
+
+
+@pytest.mark.parametrize("eta, expected_interval", [(0.1, 0.5), (10, 5), (1000, 30)])
+def test_adaptive_polling_follows_eta_within_bounds(eta, expected_interval):
+    # GIVEN an adaptive strategy without jitter
+    strategy = AdaptivePollingStrategy(
+        min_interval=0.5, max_interval=30, remaining_time_fraction=0.5, jitter=0
+    )
+    # WHEN the server reports an estimated time to completion
+    # THEN the next check happens after half of it, clamped to the bounds
+    assert strategy.next_interval(1, _status(eta=eta)) == expected_interval
+
+
+def test_adaptive_polling_extrapolates_progress_rate():
+    # GIVEN a job without ETA that made 10% progress within 2 seconds
+    strategy = AdaptivePollingStrategy(remaining_time_fraction=0.5, jitter=0)
+    previous_status, job_status = _status(progress=0.2), _status(progress=0.3)
+
+    # WHEN the next interval is calculated
+    interval = strategy.next_interval(2, job_status, previous_status)
+
+    # THEN it is half of the extrapolated 14 remaining seconds
+    assert interval == pytest.approx(7)
+
+
+def test_adaptive_polling_backs_off_without_estimate():
+    strategy = AdaptivePollingStrategy(backoff_factor=2, jitter=0)
+    assert strategy.next_interval(1, _status(), _status()) == 2
+
+
+def test_adaptive_polling_jitter_stays_in_bounds():
+    strategy = AdaptivePollingStrategy(min_interval=1, max_interval=2, jitter=0.5)
+    intervals = [strategy.next_interval(1, _status(eta=3)) for _ in range(100)]
+    assert all(1 <= interval <= 2 for interval in intervals)
+    assert len(set(intervals)) > 1
+
+
+@pytest.mark.parametrize("polling_strategy_type", list(PollingStrategyType))
+def test_create_polling_strategy(polling_strategy_type: PollingStrategyType):
+    strategy = create_polling_strategy(polling_strategy_type, interval=1.5)
+    assert strategy.first_interval() > 0
@@ -0,0 +1,106 @@
+import multiprocessing
+import time
+from pathlib import Path
+
+import httpx
+import pytest
+
+from redact.commons.rate_limit import (
+    EndpointClass,
+    FileRateLimiter,
+    RateLimiter,
+    parse_rate_limits,
+)
+from redact.v4 import OutputType, RedactRequests, ServiceType
+
+
+def _acquire_from_file(state_file: str, n: int) -> None:
+    limiter = FileRateLimiter(state_file, rates={EndpointClass.status: 20})
+    for _ in range(n):
+        limiter.acquire(EndpointClass.status)
+
+
+def test_rate_limiter_spaces_requests():
+    # GIVEN a limit of 20 status requests per second
+    limiter = RateLimiter(rates={EndpointClass.status: 20})
+
+    # WHEN 30 requests are made
+    start = time.monotonic()
+    for _ in range(30):
+        limiter.acquire(EndpointClass.status)
+    elapsed = time.monotonic() - start
+
+    # THEN the burst of 20 requests is free and the others wait for their token
+    assert elapsed == pytest.approx(0.5, abs=0.1)
+
+
+def test_rate_limiter_ignores_endpoint_classes_without_limit():
+    # GIVEN a limit for posts only
+    limiter = RateLimiter(rates={EndpointClass.post: 1})
+
+    # WHEN many downloads are made
+    waited = [limiter.acquire(EndpointClass.download) for _ in range(100)]
+
+    # THEN none of them waits
+    assert sum(waited) == 0
+
+
+def test_file_rate_limiter_shares_budget_between_processes(tmp_path: Path):
+    # GIVEN two processes sharing a limit of 20 requests per second through a file
+    state_file = str(tmp_path / "rate_limits.json")
+    processes = [
+        multiprocessing.Process(target=_acquire_from_file, args=(state_file, 20))
+        for _ in range(2)
+    ]
+
+    # WHEN both make 20 requests
+    start = time.monotonic()
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    elapsed = time.monotonic() - start
+
+    # THEN together they don't exceed the shared budget
+    assert all(process.exitcode == 0 for process in processes)
+    assert elapsed >= 0.9
+
+
+def test_parse_rate_limits():
+    assert parse_rate_limits(["post=0.5", "status=10"]) == {
+        EndpointClass.post: 0.5,
+        EndpointClass.status: 10.0,
+    }
+    with pytest.raises(ValueError):
+        parse_rate_limits(["upload=1"])
+
+
+def test_requests_go_through_rate_limiter():
+    # GIVEN a RedactRequests with a rate limiter counting the requests
+    acquired = []
+
+    class CountingRateLimiter(RateLimiter):
+        def acquire(self, endpoint_class: EndpointClass) -> float:
+            acquired.append(endpoint_class)
+            return 0.0
+
+    client = httpx.Client(
+        transport=httpx.MockTransport(
+            lambda request: httpx.Response(
+                200, json={"output_id": "a0e5f3c4-64d7-4a2c-8a47-4b9ae6b1d2c1"}
+            )
+        )
+    )
+    redact_requests = RedactRequests(
+        httpx_client=client, rate_limiter=CountingRateLimiter()
+    )
+
+    # WHEN the output of a job is deleted
+    redact_requests.delete_output(
+        service=ServiceType.blur,
+        out_type=OutputType.images,
+        output_id="a0e5f3c4-64d7-4a2c-8a47-4b9ae6b1d2c1",
+    )
+
+    # THEN the request took a token of its endpoint class
+    assert acquired == [EndpointClass.delete]
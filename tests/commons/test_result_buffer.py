@@ -0,0 +1,69 @@
+import uuid
+
+import httpx
+import pytest
+
+from redact.commons.result_buffer import ResultBuffer
+from redact.v4 import OutputType, RedactRequests, ServiceType
+
+CONTENT = bytes(range(256)) * 100
+
+
+def _redact_requests(content: bytes, content_length: bool = True) -> RedactRequests:
+    def handler(request: httpx.Request) -> httpx.Response:
+        headers = {
+            "Content-Type": "image/jpeg",
+            "Content-Disposition": 'attachment; filename="output.jpeg"',
+        }
+        if content_length:
+            headers["Content-Length"] = str(len(content))
+        chunks = [content[i : i + 1000] for i in range(0, len(content), 1000)]
+        return httpx.Response(200, headers=headers, content=iter(chunks))
+
+    return RedactRequests(
+        httpx_client=httpx.Client(transport=httpx.MockTransport(handler))
+    )
+
+
+def _get_output_buffer(redact_requests: RedactRequests, **kwargs) -> ResultBuffer:
+    return redact_requests.get_output_buffer(
+        service=ServiceType.blur,
+        out_type=OutputType.images,
+        output_id=uuid.uuid4(),
+        **kwargs,
+    )
+
+
+@pytest.mark.parametrize(argnames="content_length", argvalues=[True, False])
+def test_small_result_is_kept_in_memory(content_length: bool):
+    # GIVEN a result smaller than the memory limit
+    redact_requests = _redact_requests(CONTENT, content_length=content_length)
+
+    # WHEN it is downloaded into a buffer
+    with _get_output_buffer(redact_requests) as result:
+        # THEN it is kept in memory and readable as view and as file
+        assert not result.spilled
+        assert result.view() == CONTENT
+        with result.open() as f:
+            f.seek(100)
+            assert f.read() == CONTENT[100:]
+        assert result.file_name == "output.jpeg"
+        assert result.media_type == "image/jpeg"
+
+
+@pytest.mark.parametrize(argnames="content_length", argvalues=[True, False])
+def test_large_result_spills_to_temp_file(content_length: bool, tmp_path):
+    # GIVEN a result larger than the memory limit
+    redact_requests = _redact_requests(CONTENT, content_length=content_length)
+
+    # WHEN it is downloaded into a buffer
+    with _get_output_buffer(redact_requests, max_memory_size=5000) as result:
+        # THEN it is written to a temp file, which is removed with the buffer
+        assert result.spilled
+        with result.open() as f:
+            assert f.read() == CONTENT
+        view = result.view()
+        assert view[:10] == CONTENT[:10]
+        view.release()
+        path = result.path
+    assert not path.exists()
@@ -0,0 +1,83 @@
+import os
+from pathlib import Path
+
+from redact.commons.result_cache import ResultCache
+from redact.v4 import JobArguments, OutputType, ServiceType
+
+
+def _write(path: Path, content: bytes) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+    return path
+
+
+def test_key_depends_on_content_and_arguments(tmp_path: Path):
+    # GIVEN two files with identical content and one with different content
+    a = _write(tmp_path / "a.jpeg", b"same")
+    b = _write(tmp_path / "sub/b.jpeg", b"same")
+    c = _write(tmp_path / "c.jpeg", b"other")
+
+    def key(file: Path, **job_args) -> str:
+        return ResultCache.key(
+            file,
+            service=ServiceType.blur,
+            output_type=OutputType.images,
+            job_args=JobArguments(**job_args),
+        )
+
+    # WHEN the keys are calculated
+    # THEN only content and result-relevant arguments distinguish them
+    assert key(a) == key(b)
+    assert key(a) != key(c)
+    assert key(a) != key(a, face=False)
+    assert key(a) == key(a, status_webhook_url="http://localhost:1234/")
+
+
+def test_materialize_cached_result(tmp_path: Path):
+    # GIVEN a cache that stored a result
+    cache = ResultCache(tmp_path / "cache")
+    result = _write(tmp_path / "result.jpeg", b"redacted")
+    cache.store("a" * 64, result)
+
+    # WHEN the result is materialized for another output (which got a different suffix)
+    output_path = cache.materialize("a" * 64, tmp_path / "out/other.jpg")
+    missing = cache.materialize("b" * 64, tmp_path / "out/missing.jpeg")
+
+    # THEN the output is an independent copy with the suffix of the result
+    assert output_path == tmp_path / "out/other.jpeg"
+    assert output_path.read_bytes() == b"redacted"
+    assert os.stat(output_path).st_ino != os.stat(result).st_ino
+    assert missing is None
+
+
+def test_hardlinked_result(tmp_path: Path):
+    # GIVEN a cache that may hardlink
+    cache = ResultCache(tmp_path / "cache", allow_hardlinks=True)
+    result = _write(tmp_path / "result.jpeg", b"redacted")
+    cache.store("a" * 64, result)
+
+    # WHEN the result is materialized
+    output_path = cache.materialize("a" * 64, tmp_path / "out.jpeg")
+
+    # THEN the output shares the data with the cache (unless the file system clones it)
+    assert output_path.read_bytes() == b"redacted"
+    assert os.stat(output_path).st_nlink >= 2 or os.stat(result).st_nlink == 1
+
+
+def test_least_recently_used_results_are_evicted(tmp_path: Path):
+    # GIVEN a cache with room for two results
+    cache = ResultCache(tmp_path / "cache", max_size=20)
+    for key in ["a", "b"]:
+        cache.store(key * 64, _write(tmp_path / f"{key}.jpeg", b"0123456789"))
+    cache.get("a" * 64)
+
+    # WHEN a third result is stored
+    cache.store("c" * 64, _write(tmp_path / "c.jpeg", b"0123456789"))
+
+    # THEN the least recently used one is evicted, also after reloading the cache
+    assert cache.get("b" * 64) is None
+    assert cache.size == 20
+    reloaded = ResultCache(tmp_path / "cache", max_size=20)
+    assert len(reloaded) == 2
+    assert reloaded.get("a" * 64) is not None
+    assert reloaded.get("c" * 64) is not None
@@ -0,0 +1,155 @@
+import email.utils
+import time
+from pathlib import Path
+
+import httpx
+import pytest
+
+from redact.commons.retry import RetryBackoff, StatusRetryPolicy, parse_retry_after
+from redact.errors import RedactResponseError
+from redact.v4 import OutputType, RedactRequests, ServiceType
+from tests.v4.integration.mock_backend import MockRedactBackend
+
+
+class OverloadedBackend(MockRedactBackend):
+    """
+    Answers the first n_overloaded requests with the given status code before handling them normally.
+    """
+
+    def __init__(self, n_overloaded: int, status_code: int = 503, **kwargs):
+        super().__init__(**kwargs)
+        self.n_overloaded = n_overloaded
+        self.status_code = status_code
+        self.n_rejected = 0
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        if self.n_rejected < self.n_overloaded:
+            self.n_rejected += 1
+            return httpx.Response(self.status_code, headers={"Retry-After": "0"})
+        return super().handler(request)
+
+
+def _redact_requests(backend: MockRedactBackend, **kwargs) -> RedactRequests:
+    return RedactRequests(
+        httpx_client=backend.client(),
+        status_retry_policy=StatusRetryPolicy(base_delay=0.01, max_delay=0.01),
+        **kwargs,
+    )
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("120") == 120.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    in_a_minute = email.utils.formatdate(time.time() + 60, usegmt=True)
+    assert parse_retry_after(in_a_minute) == pytest.approx(60, abs=2)
+
+
+def test_retry_after_is_lower_bound_of_delay():
+    # GIVEN a policy with short delays
+    policy = StatusRetryPolicy(base_delay=0.1, max_delay=1.0)
+
+    # WHEN the server asks to retry after 30s
+    response = httpx.Response(429, headers={"Retry-After": "30"})
+    delay = policy.next_delay(0.1, response)
+
+    # THEN the retry waits as long as asked
+    assert delay == 30.0
+    assert 0.1 <= policy.next_delay(0.1, httpx.Response(503)) <= 0.3
+
+
+def test_network_errors_are_retried_with_doubling_delays(mocker):
+    # GIVEN the backoff of a request with 10s to retry
+    now = mocker.patch("redact.commons.retry.time.time", return_value=100.0)
+    backoff = RetryBackoff(10, StatusRetryPolicy())
+    error = httpx.ConnectError("refused")
+
+    # WHEN its attempts keep failing
+    delays = [backoff.after_network_error(error) for _ in range(3)]
+    now.return_value = 108.0
+    last_delay = backoff.after_network_error(error)
+    now.return_value = 111.0
+
+    # THEN the delays double up to the time left, and the request is given up after the limit
+    assert delays == [2, 4, 8]
+    assert last_delay == 2
+    assert backoff.after_network_error(error) is None
+
+
+def test_post_job_is_retried_on_overload(tmp_path: Path):
+    # GIVEN a backend which is overloaded for the first two requests
+    backend = OverloadedBackend(n_overloaded=2, status_code=429)
+    file_path = tmp_path / "img.jpeg"
+    file_path.write_bytes(b"image")
+
+    # WHEN a job is posted
+    with open(file_path, "rb") as f:
+        response = _redact_requests(backend).post_job(
+            file=f, service=ServiceType.blur, out_type=OutputType.images
+        )
+
+    # THEN the job is posted once the backend recovered
+    assert backend.n_rejected == 2
+    assert backend.n_posts == 1
+    assert str(response.output_id) in backend.jobs
+
+
+@pytest.mark.parametrize(argnames="status_code", argvalues=[502, 504])
+def test_post_job_is_not_retried_on_gateway_errors(tmp_path: Path, status_code: int):
+    # GIVEN a gateway failing for the first request, maybe after the backend accepted the upload
+    backend = OverloadedBackend(n_overloaded=1, status_code=status_code)
+    file_path = tmp_path / "img.jpeg"
+    file_path.write_bytes(b"image")
+
+    # WHEN a job is posted
+    # THEN the error is raised instead of posting the job again, which could start a second job
+    with open(file_path, "rb") as f, pytest.raises(RedactResponseError) as error:
+        _redact_requests(backend).post_job(
+            file=f, service=ServiceType.blur, out_type=OutputType.images
+        )
+    assert error.value.status_code == status_code
+    assert backend.n_rejected == 1
+    assert backend.n_posts == 0
+
+
+def test_download_is_retried_on_bad_gateway(tmp_path: Path):
+    # GIVEN a finished job and a gateway failing for the next request
+    backend = MockRedactBackend()
+    redact_requests = _redact_requests(backend)
+    file_path = tmp_path / "img.jpeg"
+    file_path.write_bytes(b"image")
+    with open(file_path, "rb") as f:
+        output_id = redact_requests.post_job(
+            file=f, service=ServiceType.blur, out_type=OutputType.images
+        ).output_id
+    redact_requests.get_status(ServiceType.blur, OutputType.images, output_id)
+    overloaded = OverloadedBackend(n_overloaded=1, status_code=502)
+    overloaded.jobs = backend.jobs
+    redact_requests = _redact_requests(overloaded)
+
+    # WHEN the result is streamed to a file
+    result_path = redact_requests.write_output_to_file(
+        ServiceType.blur, OutputType.images, output_id, tmp_path / "out.jpeg"
+    )
+
+    # THEN the download succeeds after the retry
+    assert overloaded.n_rejected == 1
+    assert result_path.read_bytes() == b"redacted:img.jpeg"
+
+
+def test_retries_stop_at_total_time_limit():
+    # GIVEN a backend that stays unavailable
+    backend = OverloadedBackend(n_overloaded=1000)
+
+    # WHEN the status is requested with a short retry limit
+    redact_requests = _redact_requests(backend, retry_total_time_limit=0.1)
+    with pytest.raises(RedactResponseError) as error:
+        redact_requests.get_status(
+            ServiceType.blur,
+            OutputType.images,
+            "a0e5f3c4-64d7-4a2c-8a47-4b9ae6b1d2c1",
+        )
+
+    # THEN the last response is surfaced after a few retries
+    assert error.value.status_code == 503
+    assert 1 < backend.n_rejected < 1000
@@ -0,0 +1,94 @@
+import os
+from pathlib import Path
+
+from redact.commons.scheduling import (
+    SchedulingPolicy,
+    iter_scheduled_files_in_dir,
+    schedule_files,
+)
+from redact.commons.utils import FileInfo, is_image
+
+FILES = [
+    FileInfo("a.mp4", size=30, mtime=1.0),
+    FileInfo("urgent/b.mp4", size=10, mtime=3.0),
+    FileInfo("c.mp4", size=50, mtime=2.0),
+    FileInfo("urgent/d.mp4", size=20, mtime=4.0),
+]
+
+
+def _paths(files):
+    return [file.path for file in files]
+
+
+def test_discovery_order_stays_lazy():
+    # GIVEN files that are still being discovered
+    files = iter(FILES)
+
+    # WHEN they are scheduled in discovery order
+    scheduled = schedule_files(files)
+
+    # THEN nothing was consumed up front and the order is kept
+    assert next(files) == FILES[0]
+    assert _paths(scheduled) == _paths(FILES[1:])
+
+
+def test_size_and_mtime_policies():
+    # GIVEN files of different sizes and ages
+    # WHEN they are scheduled by the different policies
+    # THEN they are ordered accordingly
+    largest_first = schedule_files(FILES, SchedulingPolicy.largest_first)
+    assert _paths(largest_first) == ["c.mp4", "a.mp4", "urgent/d.mp4", "urgent/b.mp4"]
+    smallest_first = schedule_files(FILES, SchedulingPolicy.smallest_first)
+    assert _paths(smallest_first) == ["urgent/b.mp4", "urgent/d.mp4", "a.mp4", "c.mp4"]
+    newest_first = schedule_files(FILES, SchedulingPolicy.newest_first)
+    assert _paths(newest_first) == ["urgent/d.mp4", "urgent/b.mp4", "c.mp4", "a.mp4"]
+    oldest_first = schedule_files(FILES, SchedulingPolicy.oldest_first)
+    assert _paths(oldest_first) == ["a.mp4", "c.mp4", "urgent/b.mp4", "urgent/d.mp4"]
+
+
+def test_priority_patterns_come_first():
+    # GIVEN a priority pattern
+    # WHEN the files are scheduled largest first
+    scheduled = schedule_files(
+        FILES, SchedulingPolicy.largest_first, priority_patterns=["urgent/*"]
+    )
+
+    # THEN the matching files come first, each group ordered by size
+    assert _paths(scheduled) == ["urgent/d.mp4", "urgent/b.mp4", "c.mp4", "a.mp4"]
+
+
+def test_scheduled_files_in_dir(tmp_path: Path):
+    # GIVEN a folder with images of different sizes and modification times
+    for i, (name, size) in enumerate(
+        [("s.jpeg", 1), ("sub/l.jpeg", 100), ("m.jpeg", 10)]
+    ):
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"x" * size)
+        os.utime(path, (1000 + i, 1000 + i))
+    (tmp_path / "ignored.txt").write_bytes(b"x" * 1000)
+
+    # WHEN the images are listed by size, by mtime and with the sub folder as priority
+    largest_first = iter_scheduled_files_in_dir(
+        tmp_path, file_filter=is_image, policy=SchedulingPolicy.largest_first
+    )
+    newest_first = iter_scheduled_files_in_dir(
+        tmp_path,
+        n_workers=2,
+        file_filter=is_image,
+        policy=SchedulingPolicy.newest_first,
+    )
+    prioritized = iter_scheduled_files_in_dir(
+        tmp_path,
+        file_filter=is_image,
+        policy=SchedulingPolicy.smallest_first,
+        priority_patterns=["sub/*"],
+    )
+
+    # THEN sizes and mtimes of the walk decide the order
+    def relative(paths):
+        return [str(Path(p).relative_to(tmp_path)) for p in paths]
+
+    assert relative(largest_first) == ["sub/l.jpeg", "m.jpeg", "s.jpeg"]
+    assert relative(newest_first) == ["m.jpeg", "sub/l.jpeg", "s.jpeg"]
+    assert relative(prioritized) == ["sub/l.jpeg", "s.jpeg", "m.jpeg"]
@@ -0,0 +1,159 @@
+import asyncio
+import threading
+import time
+from pathlib import Path
+
+import httpx
+import pytest
+
+from redact.commons.upload_concurrency import (
+    AdaptiveUploadConcurrency,
+    UploadConcurrencyController,
+)
+from redact.errors import RedactResponseError
+from redact.v4 import OutputType, RedactRequests, ServiceType
+
+
+def _upload(controller: UploadConcurrencyController, n_bytes: int = 0, throttled=False):
+    with controller.slot() as slot:
+        if throttled:
+            slot.throttled()
+        else:
+            slot.succeeded(n_bytes)
+
+
+def test_fixed_controller_limits_concurrent_uploads():
+    # GIVEN a controller allowing two concurrent uploads
+    controller = UploadConcurrencyController(limit=2)
+    max_in_flight = 0
+    lock = threading.Lock()
+
+    def upload():
+        nonlocal max_in_flight
+        with controller.slot() as slot:
+            with lock:
+                max_in_flight = max(max_in_flight, controller.in_flight)
+            time.sleep(0.01)
+            slot.succeeded(1)
+
+    # WHEN many threads upload at the same time
+    threads = [threading.Thread(target=upload) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # THEN never more than two uploads were in flight
+    assert max_in_flight == 2
+    assert controller.in_flight == 0
+    assert controller.limit == 2
+
+
+def test_adaptive_controller_raises_limit_while_throughput_improves(monkeypatch):
+    # GIVEN an adaptive controller and a clock
+    now = [0.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    controller = AdaptiveUploadConcurrency(initial_limit=1, max_limit=3)
+
+    # WHEN every round of uploads transfers more bytes per second
+    for n_bytes in (100, 200, 400, 800):
+        for _ in range(controller.limit):
+            now[0] += 1.0
+            _upload(controller, n_bytes=n_bytes)
+
+    # THEN the limit grows up to its maximum
+    assert controller.limit == 3
+
+
+def test_adaptive_controller_keeps_limit_without_improvement(monkeypatch):
+    # GIVEN an adaptive controller and a clock
+    now = [0.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    controller = AdaptiveUploadConcurrency(initial_limit=1, max_limit=8)
+
+    # WHEN the throughput stays the same after the first round
+    for _ in range(5):
+        for _ in range(controller.limit):
+            now[0] += 1.0
+            _upload(controller, n_bytes=100)
+
+    # THEN the limit is raised once for the first measurement only
+    assert controller.limit == 2
+
+
+def test_adaptive_controller_backs_off_when_throttled():
+    # GIVEN an adaptive controller at a high limit
+    controller = AdaptiveUploadConcurrency(initial_limit=8, min_limit=1)
+
+    # WHEN uploads are throttled
+    _upload(controller, throttled=True)
+    after_first = controller.limit
+    for _ in range(5):
+        _upload(controller, throttled=True)
+
+    # THEN the limit is halved, but never drops below the minimum
+    assert after_first == 4
+    assert controller.limit == 1
+
+
+def test_post_job_reports_throttling(tmp_path: Path):
+    # GIVEN a backend that rejects uploads with 429
+    controller = AdaptiveUploadConcurrency(initial_limit=4)
+    client = httpx.Client(
+        transport=httpx.MockTransport(lambda request: httpx.Response(429))
+    )
+    redact_requests = RedactRequests(
+        httpx_client=client, upload_concurrency=controller, retry_total_time_limit=0
+    )
+    file_path = tmp_path / "img.jpeg"
+    file_path.write_bytes(b"image")
+
+    # WHEN a job is posted
+    with open(file_path, "rb") as f, pytest.raises(RedactResponseError):
+        redact_requests.post_job(
+            file=f, service=ServiceType.blur, out_type=OutputType.images
+        )
+
+    # THEN the controller backs off
+    assert controller.limit == 2
+    assert controller.in_flight == 0
+
+
+def test_async_slots_share_the_limit_with_threads():
+    # GIVEN a controller allowing one upload, taken by a thread
+    controller = UploadConcurrencyController(limit=1)
+    taken, release = threading.Event(), threading.Event()
+
+    def thread_upload():
+        with controller.slot() as slot:
+            taken.set()
+            release.wait()
+            slot.succeeded(1)
+
+    thread = threading.Thread(target=thread_upload)
+    thread.start()
+    taken.wait()
+
+    max_in_flight = 0
+
+    async def upload():
+        nonlocal max_in_flight
+        async with controller.async_slot() as slot:
+            max_in_flight = max(max_in_flight, controller.in_flight)
+            await asyncio.sleep(0.01)
+            slot.succeeded(1)
+
+    async def run():
+        uploads = asyncio.gather(*[upload() for _ in range(4)])
+        # WHEN coroutines upload while the thread holds the slot
+        await asyncio.sleep(0.1)
+        assert max_in_flight == 0
+        release.set()
+        await uploads
+
+    asyncio.run(run())
+    thread.join()
+
+    # THEN they waited for the thread without blocking the loop, and uploaded one at a time
+    assert max_in_flight == 1
+    assert controller.in_flight == 0
@@ -9,6 +9,8 @@ from redact.commons.utils import (
     files_in_dir,
     get_filesize_in_gb,
     images_in_dir,
+    is_image,
+    iter_files_in_dir,
     normalize_path,
     parse_key_value_pairs,
 )
@@ -66,6 +68,50 @@ def test_images_in_dir(images_path: Path):
     ]
 
 
+def test_iter_files_in_dir_skips_hidden_entries(tmp_path: Path):
+    # GIVEN a directory tree with hidden files and folders
+    for relative_path in ["a.jpeg", "sub/b.jpeg", ".hidden.jpeg", ".cache/c.jpeg"]:
+        (tmp_path / relative_path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / relative_path).write_bytes(b"")
+    # WHEN the files are iterated
+    files = iter_files_in_dir(tmp_path)
+    # THEN the paths are yielded lazily and hidden entries are left out, like with glob
+    assert not isinstance(files, list)
+    assert sorted(str(Path(p).relative_to(tmp_path)) for p in files) == [
+        "a.jpeg",
+        "sub/b.jpeg",
+    ]
+
+
+def test_iter_files_in_dir_non_recursive(tmp_path: Path):
+    # GIVEN a directory with a file and a subfolder
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub/b.jpeg").write_bytes(b"")
+    (tmp_path / "a.jpeg").write_bytes(b"")
+    # WHEN the files are iterated without recursion
+    # THEN only the top-level file is found
+    assert list(iter_files_in_dir(tmp_path, recursive=False)) == [
+        str(tmp_path / "a.jpeg")
+    ]
+
+
+def test_iter_files_in_dir_parallel(tmp_path: Path):
+    # GIVEN a tree with many folders and files of different types
+    expected = []
+    for i in range(5):
+        for j in range(4):
+            (tmp_path / f"d{i}/s{j}").mkdir(parents=True)
+            (tmp_path / f"d{i}/s{j}/b.jpeg").write_bytes(b"")
+            (tmp_path / f"d{i}/s{j}/a.jpeg").write_bytes(b"")
+            (tmp_path / f"d{i}/s{j}/c.mp4").write_bytes(b"")
+            expected += [f"d{i}/s{j}/a.jpeg", f"d{i}/s{j}/b.jpeg"]
+    # WHEN the images are listed by several threads
+    files = iter_files_in_dir(tmp_path, n_workers=3, file_filter=is_image)
+    relative_paths = [str(Path(p).relative_to(tmp_path)) for p in files]
+    # THEN all images are found in deterministic (sorted) order
+    assert relative_paths == expected
+
+
 @pytest.mark.parametrize(
     "input, expected",
     [
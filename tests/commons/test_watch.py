@@ -0,0 +1,116 @@
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+from redact.commons.utils import is_image
+from redact.commons.watch import (
+    FolderWatcher,
+    InotifyFolderWatcher,
+    PollingFolderWatcher,
+    WatchOptions,
+    create_folder_watcher,
+    inotify_available,
+)
+
+QUIET_PERIOD = 0.3
+
+
+def _make_watcher(kind: str, dir: Path) -> FolderWatcher:
+    if kind == "polling":
+        return PollingFolderWatcher(
+            dir, file_filter=is_image, quiet_period=QUIET_PERIOD, poll_interval=0.05
+        )
+    if not inotify_available():
+        pytest.skip("inotify is not available")
+    return InotifyFolderWatcher(dir, file_filter=is_image, quiet_period=QUIET_PERIOD)
+
+
+@pytest.fixture(params=["polling", "inotify"])
+def watched(request, tmp_path: Path) -> Iterator["queue.Queue[str]"]:
+    """
+    The watcher of tmp_path runs in a thread and puts the files it yields into the returned queue.
+    """
+    old = tmp_path / "old.jpeg"
+    old.write_bytes(b"old")
+    # long unchanged, so it is due right away
+    os.utime(old, (time.time() - 60, time.time() - 60))
+
+    watcher = _make_watcher(request.param, tmp_path)
+    yielded: "queue.Queue[str]" = queue.Queue()
+
+    def consume():
+        for path in watcher.files():
+            yielded.put(path)
+
+    thread = threading.Thread(target=consume, daemon=True)
+    thread.start()
+    yield yielded
+    watcher.stop()
+    thread.join(timeout=5)
+    watcher.close()
+    assert not thread.is_alive()
+
+
+def test_existing_files_are_yielded(watched: "queue.Queue[str]", tmp_path: Path):
+    # GIVEN a watched folder with an old file
+    # WHEN the watcher starts
+    # THEN the file is yielded right away
+    assert watched.get(timeout=2) == str(tmp_path / "old.jpeg")
+
+
+def test_new_files_wait_for_quiet_period(watched: "queue.Queue[str]", tmp_path: Path):
+    # GIVEN a watched folder
+    assert watched.get(timeout=2) == str(tmp_path / "old.jpeg")
+
+    # WHEN a file is written in several steps, and files of other types and hidden ones are added
+    (tmp_path / "notes.txt").write_bytes(b"text")
+    (tmp_path / ".partial.jpeg").write_bytes(b"hidden")
+    new = tmp_path / "sub_dir" / "new.jpeg"
+    new.parent.mkdir()
+    new.write_bytes(b"first part")
+    started = time.monotonic()
+    for _ in range(3):
+        time.sleep(QUIET_PERIOD / 2)
+        with open(new, "ab") as f:
+            f.write(b"more")
+
+    # THEN the file is yielded only after it stayed unchanged for the quiet period
+    assert watched.get(timeout=5) == str(new)
+    assert time.monotonic() - started >= QUIET_PERIOD * 2.5
+
+    # THEN the other files, and the same file again, are never yielded
+    time.sleep(QUIET_PERIOD * 2)
+    assert watched.empty()
+
+
+def test_create_folder_watcher_falls_back_to_polling(tmp_path: Path):
+    # GIVEN options without inotify
+    options = WatchOptions(quiet_period=1.0, poll_interval=0.5, use_inotify=False)
+
+    # WHEN a watcher is created
+    with create_folder_watcher(tmp_path, options=options) as watcher:
+        # THEN it polls with the options
+        assert isinstance(watcher, PollingFolderWatcher)
+        assert watcher.poll_interval == 0.5
+        assert watcher.quiet_period == 1.0
+
+
+def test_recreated_file_is_yielded_again(watched: "queue.Queue[str]", tmp_path: Path):
+    # GIVEN a watched folder whose file was yielded
+    old = tmp_path / "old.jpeg"
+    assert watched.get(timeout=2) == str(old)
+
+    # WHEN the file is deleted (e.g. after processing it) and a new one with the same name is dropped in
+    old.unlink()
+    time.sleep(0.1)
+    old.write_bytes(b"new")
+
+    # THEN it is yielded again, once
+    assert watched.get(timeout=5) == str(old)
+    time.sleep(QUIET_PERIOD * 2)
+    assert watched.empty()
@@ -0,0 +1,92 @@
+import threading
+import uuid
+from typing import Dict, List, Optional
+
+import httpx
+
+from redact.v4 import JobState
+
+
+class MockRedactBackend:
+    """
+    In-process fake of the Redact job lifecycle (post -> status -> download -> delete) to be used with
+    httpx.MockTransport. Jobs finish after a configurable number of status requests, the result is the uploaded
+    file name prefixed with b"redacted:".
+    """
+
+    def __init__(
+        self,
+        polls_until_finished: int = 1,
+        failing_file_names: Optional[List[str]] = None,
+    ):
+        self.polls_until_finished = polls_until_finished
+        self.failing_file_names = failing_file_names or []
+        self.jobs: Dict[str, Dict] = {}
+        self.deleted: List[str] = []
+        self.n_posts = 0
+        self.n_status_requests = 0
+        self._lock = threading.Lock()
+
+    def client(self) -> httpx.Client:
+        return httpx.Client(transport=httpx.MockTransport(self.handler))
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        with self._lock:
+            if request.method == "POST":
+                return self._post(request)
+            output_id = self._output_id(request)
+            if output_id not in self.jobs:
+                return httpx.Response(404, json={"detail": "Job not found"})
+            if request.url.path.endswith("/status"):
+                return self._status(output_id)
+            if request.method == "DELETE":
+                self.deleted.append(output_id)
+                del self.jobs[output_id]
+                return httpx.Response(200, json={"output_id": output_id})
+            return self._download(output_id)
+
+    @staticmethod
+    def _output_id(request: httpx.Request) -> str:
+        parts = request.url.path.strip("/").split("/")
+        return parts[3] if len(parts) > 3 else ""
+
+    def _post(self, request: httpx.Request) -> httpx.Response:
+        request.read()
+        body = request.content
+        file_name = body.split(b'filename="', 1)[1].split(b'"', 1)[0].decode()
+        output_id = str(uuid.uuid4())
+        self.n_posts += 1
+        self.jobs[output_id] = {"file_name": file_name, "polls": 0}
+        return httpx.Response(200, json={"output_id": output_id})
+
+    def _status(self, output_id: str) -> httpx.Response:
+        self.n_status_requests += 1
+        job = self.jobs[output_id]
+        job["polls"] += 1
+        state = JobState.active
+        error = None
+        if job["polls"] >= self.polls_until_finished:
+            if job["file_name"] in self.failing_file_names:
+                state, error = JobState.failed, "Mocked failure"
+            else:
+                state = JobState.finished
+        return httpx.Response(
+            200,
+            json={
+                "output_id": output_id,
+                "state": state.value,
+                "error": error,
+                "progress": 1.0 if state != JobState.active else 0.5,
+            },
+        )
+
+    def _download(self, output_id: str) -> httpx.Response:
+        file_name = self.jobs[output_id]["file_name"]
+        return httpx.Response(
+            200,
+            content=b"redacted:" + file_name.encode(),
+            headers={
+                "Content-Type": "application/octet-stream",
+                "Content-Disposition": f'attachment; filename="{file_name}"',
+            },
+        )
@@ -1,3 +1,4 @@
+import hashlib
 import time
 import uuid
 from contextlib import contextmanager
@@ -6,6 +7,7 @@ from typing import Optional
 
 import uvicorn
 from fastapi import FastAPI, Request, Response
+from fastapi.responses import StreamingResponse
 
 from redact.v4 import JobArguments, JobPostResponse
 
@@ -16,8 +18,29 @@ def _mock_server_main(
     expected_form_content: Optional[dict] = None,
     expected_headers_contain: Optional[dict] = None,
     expected_timeout: Optional[float] = None,
+    drain_body: bool = False,
+    output_content: Optional[bytes] = None,
+    interrupt_output_after: Optional[int] = None,
+    accept_ranges: bool = True,
 ):
     app = FastAPI()
+    n_output_requests = 0
+
+    @app.get("/{path:path}")
+    async def get_output(request: Request):
+        nonlocal n_output_requests
+        n_output_requests += 1
+        return _mock_output_handler(
+            request=request,
+            content=output_content or b"",
+            interrupt_after=interrupt_output_after if n_output_requests == 1 else None,
+            accept_ranges=accept_ranges,
+            expected_range_start=(
+                interrupt_output_after
+                if accept_ranges and n_output_requests == 2
+                else None
+            ),
+        )
 
     @app.post("/{path:path}")
     async def get_all_routes(request: Request):
@@ -28,9 +51,10 @@ def _mock_server_main(
             expected_form_content=expected_form_content,
             expected_headers_contain=expected_headers_contain,
             expected_timeout=expected_timeout,
+            drain_body=drain_body,
         )
 
-    uvicorn.run(app=app, port=8787)
+    uvicorn.run(app=app, port=8787, log_level="warning" if drain_body else "info")
 
 
 @contextmanager
@@ -40,10 +64,19 @@ def mock_redact_server(
     expected_form_content: Optional[dict] = None,
     expected_headers_contain: Optional[dict] = None,
     expected_timeout: Optional[float] = None,
+    drain_body: bool = False,
+    output_content: Optional[bytes] = None,
+    interrupt_output_after: Optional[int] = None,
+    accept_ranges: bool = True,
 ):
     """
     Context manager that starts a mock Redact server (127.0.0.1:8787) which returns a 500 error when the request does
-    not look as expected.
+    not look as expected. With drain_body, the request body is read and discarded chunk by chunk (e.g. to benchmark
+    uploads of large files).
+
+    GET requests download output_content, supporting HTTP range requests if accept_ranges. With
+    interrupt_output_after, the connection of the first download is dropped after that many bytes and the second
+    download is expected to resume there (if accept_ranges).
     """
 
     server = Process(
@@ -54,6 +87,10 @@ def mock_redact_server(
             expected_form_content,
             expected_headers_contain,
             expected_timeout,
+            drain_body,
+            output_content,
+            interrupt_output_after,
+            accept_ranges,
         ),
         daemon=True,
     )
@@ -71,6 +108,7 @@ async def _mock_redact_request_handler(
     expected_form_content: Optional[dict] = None,
     expected_headers_contain: Optional[dict] = None,
     expected_timeout: Optional[float] = None,
+    drain_body: bool = False,
 ) -> Response:
     """
     Handle requests by taking a look at the requested path and the query arguments and comparing them to expected ones.
@@ -93,6 +131,10 @@ async def _mock_redact_request_handler(
             content=f"Received query args {repr(actual_job_args)} != expected query args {repr(expected_job_args)}",
         )
 
+    if drain_body:
+        async for _ in request.stream():
+            pass
+
     if expected_form_content is not None:
         form = await request.form()
         success = True
@@ -128,3 +170,49 @@ async def _mock_redact_request_handler(
     return Response(
         status_code=200, content=JobPostResponse(output_id=uuid.uuid4()).json()
     )
+
+
+def _mock_output_handler(
+    request: Request,
+    content: bytes,
+    interrupt_after: Optional[int],
+    accept_ranges: bool,
+    expected_range_start: Optional[int],
+) -> Response:
+    etag = f'"{hashlib.sha256(content).hexdigest()}"'
+    headers = {"Content-Disposition": 'attachment; filename="output.mp4"', "ETag": etag}
+    if accept_ranges:
+        headers["Accept-Ranges"] = "bytes"
+
+    start, end = 0, len(content) - 1
+    range_header = request.headers.get("Range")
+    if_range = request.headers.get("If-Range")
+    if accept_ranges and range_header and if_range in (None, etag):
+        first, last = range_header.split("=", 1)[1].split("-", 1)
+        start = int(first)
+        end = min(int(last), end) if last else end
+        if start >= len(content):
+            return Response(status_code=416)
+    if expected_range_start is not None and start != expected_range_start:
+        return Response(
+            status_code=500,
+            content=f"Expected a download resuming at byte {expected_range_start}, got range {range_header}",
+        )
+
+    status_code = 200
+    if range_header and accept_ranges and if_range in (None, etag):
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{len(content)}"
+    headers["Content-Length"] = str(end + 1 - start)
+
+    async def body():
+        if interrupt_after is None:
+            yield content[start : end + 1]
+            return
+        yield content[start:interrupt_after]
+        # drop the connection before the whole body was sent
+        raise ConnectionAbortedError()
+
+    return StreamingResponse(
+        body(), status_code=status_code, headers=headers, media_type="video/mp4"
+    )
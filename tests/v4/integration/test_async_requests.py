@@ -0,0 +1,312 @@
+import asyncio
+import time
+import uuid
+from pathlib import Path
+
+import httpx
+import pytest
+
+from redact.commons.rate_limit import EndpointClass, RateLimiter
+from redact.commons.retry import StatusRetryPolicy
+from redact.errors import RedactConnectError, RedactResponseError
+from redact.v4 import (
+    AsyncRedactInstance,
+    AsyncRedactRequests,
+    JobArguments,
+    JobState,
+    OutputType,
+    Region,
+    ServiceType,
+)
+from tests.v4.integration.mock_server import mock_redact_server
+
+API_VERSION = "v4"
+
+
+def test_async_job_args_are_sent_to_server(some_image):
+    # GIVEN a (mocked) Redact server and a job to send there
+    service = ServiceType.blur
+    out_type = OutputType.images
+    job_args = JobArguments(region=Region.germany, face=True)
+
+    async def post():
+        async with AsyncRedactRequests() as redact_requests:
+            return await redact_requests.post_job(
+                file=some_image, service=service, out_type=out_type, job_args=job_args
+            )
+
+    with mock_redact_server(
+        expected_path=f"{service.value}/{API_VERSION}/{out_type.value}",
+        expected_job_args=job_args,
+    ):
+        # WHEN the job is posted asynchronously
+        # THEN the server receives the expected job arguments and returns an output_id
+        post_response = asyncio.run(post())
+        assert post_response.output_id is not None
+
+
+def test_async_post_job_reports_upload_progress(some_image):
+    # GIVEN a (mocked) Redact server and a progress callback
+    service = ServiceType.blur
+    out_type = OutputType.images
+    progress = []
+
+    async def post():
+        async with AsyncRedactRequests() as redact_requests:
+            return await redact_requests.post_job(
+                file=some_image,
+                service=service,
+                out_type=out_type,
+                progress_callback=lambda sent, total: progress.append((sent, total)),
+            )
+
+    with mock_redact_server(
+        expected_path=f"{service.value}/{API_VERSION}/{out_type.value}"
+    ):
+        # WHEN the job is posted asynchronously
+        asyncio.run(post())
+
+    # THEN the progress grows up to the size of the request body
+    sent = [p[0] for p in progress]
+    assert sent == sorted(sent)
+    assert progress[-1][0] == progress[-1][1] > some_image.seek(0, 2)
+
+
+def test_async_mock_server_gives_error_on_unexpected_argument(some_image):
+    # GIVEN a (mocked) Redact server expecting different job arguments
+    service = ServiceType.blur
+    out_type = OutputType.images
+
+    async def post():
+        async with AsyncRedactRequests() as redact_requests:
+            await redact_requests.post_job(
+                file=some_image,
+                service=service,
+                out_type=out_type,
+                job_args=JobArguments(face=False),
+            )
+
+    with mock_redact_server(
+        expected_path=f"{service.value}/{API_VERSION}/{out_type.value}",
+        expected_job_args=JobArguments(face=True),
+    ):
+        # WHEN a different job is posted
+        # THEN the server returns an error
+        with pytest.raises(RedactResponseError):
+            asyncio.run(post())
+
+
+def _mock_backend(output_id: uuid.UUID, polls_until_finished: int = 2):
+    """Tiny in-process backend implementing the job lifecycle for httpx.MockTransport."""
+    calls = {"status": 0, "delete": 0}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.method == "POST":
+            return httpx.Response(200, json={"output_id": str(output_id)})
+        if request.url.path.endswith("/status"):
+            calls["status"] += 1
+            state = (
+                JobState.finished
+                if calls["status"] >= polls_until_finished
+                else JobState.active
+            )
+            return httpx.Response(
+                200, json={"output_id": str(output_id), "state": state.value}
+            )
+        if request.method == "DELETE":
+            calls["delete"] += 1
+            return httpx.Response(200, json={"output_id": str(output_id)})
+        return httpx.Response(
+            200,
+            content=b"redacted",
+            headers={
+                "Content-Type": "image/png",
+                "Content-Disposition": 'attachment; filename="out.png"',
+            },
+        )
+
+    return handler, calls
+
+
+def test_async_job_lifecycle(some_image, tmp_path: Path):
+    # GIVEN an asyncio client talking to a backend that finishes after a few status polls
+    output_id = uuid.uuid4()
+    handler, calls = _mock_backend(output_id)
+
+    async def run() -> Path:
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        async with client:
+            redact = AsyncRedactInstance(
+                AsyncRedactRequests(httpx_client=client),
+                service=ServiceType.blur,
+                out_type=OutputType.images,
+            )
+            job = await redact.start_job(file=some_image)
+            await job.wait_until_finished(sleep=0.01)
+            out_path = await job.download_result_to_file(file=tmp_path / "out.jpeg")
+            await job.delete()
+            return out_path
+
+    # WHEN the job is started, awaited, downloaded and deleted
+    out_path = asyncio.run(run())
+
+    # THEN the result is written with the suffix announced by the server and the job is cleaned up
+    assert out_path == tmp_path / "out.png"
+    assert out_path.read_bytes() == b"redacted"
+    assert calls["status"] == 2
+    assert calls["delete"] == 1
+
+
+def test_async_many_concurrent_jobs_share_one_loop(some_image):
+    # GIVEN one client and many jobs on the same event loop
+    output_id = uuid.uuid4()
+    handler, _ = _mock_backend(output_id, polls_until_finished=1)
+
+    async def run():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        async with client:
+            redact_requests = AsyncRedactRequests(httpx_client=client)
+            return await asyncio.gather(
+                *[
+                    redact_requests.get_status(
+                        service=ServiceType.blur,
+                        out_type=OutputType.images,
+                        output_id=output_id,
+                    )
+                    for _ in range(200)
+                ]
+            )
+
+    # WHEN all of them are polled concurrently
+    statuses = asyncio.run(run())
+
+    # THEN every single call succeeds
+    assert len(statuses) == 200
+    assert all(s["state"] == JobState.finished for s in statuses)
+
+
+def test_async_retry_gives_up_after_time_limit():
+    # GIVEN a backend that is unreachable
+    def handler(request: httpx.Request) -> httpx.Response:
+        raise httpx.ConnectError("unreachable", request=request)
+
+    async def run():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        async with client:
+            redact_requests = AsyncRedactRequests(
+                httpx_client=client, retry_total_time_limit=1
+            )
+            await redact_requests.get_status(
+                service=ServiceType.blur,
+                out_type=OutputType.images,
+                output_id=uuid.uuid4(),
+            )
+
+    # WHEN the status is requested
+    # THEN the request is retried with backoff and finally fails with a RedactConnectError
+    with pytest.raises(RedactConnectError):
+        asyncio.run(run())
+
+
+def test_async_requests_are_rate_limited_without_blocking_the_loop():
+    # GIVEN a client limited to 20 status requests per second
+    output_id = uuid.uuid4()
+    handler, _ = _mock_backend(output_id, polls_until_finished=1)
+    rate_limiter = RateLimiter(rates={EndpointClass.status: 20}, burst=0)
+    ticks = 0
+
+    async def tick():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.01)
+
+    async def run():
+        ticker = asyncio.ensure_future(tick())
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        async with client:
+            redact_requests = AsyncRedactRequests(
+                httpx_client=client, rate_limiter=rate_limiter
+            )
+            await asyncio.gather(
+                *[
+                    redact_requests.get_status(
+                        service=ServiceType.blur,
+                        out_type=OutputType.images,
+                        output_id=output_id,
+                    )
+                    for _ in range(6)
+                ]
+            )
+        ticker.cancel()
+
+    # WHEN several statuses are requested at once
+    start = time.monotonic()
+    asyncio.run(run())
+
+    # THEN they are spread according to the rate, while the loop kept running
+    assert time.monotonic() - start >= 0.2
+    assert ticks >= 10
+
+
+def test_async_overloaded_responses_are_retried():
+    # GIVEN a backend answering the first requests with 429 and 503
+    output_id = uuid.uuid4()
+    handler, _ = _mock_backend(output_id, polls_until_finished=1)
+    responses = [
+        httpx.Response(429, headers={"Retry-After": "0"}),
+        httpx.Response(503),
+    ]
+
+    def overloaded_handler(request: httpx.Request) -> httpx.Response:
+        if responses:
+            return responses.pop(0)
+        return handler(request)
+
+    async def run():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(overloaded_handler))
+        async with client:
+            redact_requests = AsyncRedactRequests(
+                httpx_client=client,
+                status_retry_policy=StatusRetryPolicy(base_delay=0.01, max_delay=0.05),
+            )
+            return await redact_requests.get_status(
+                service=ServiceType.blur,
+                out_type=OutputType.images,
+                output_id=output_id,
+            )
+
+    # WHEN the status is requested
+    status = asyncio.run(run())
+
+    # THEN the request is sent again until it succeeds
+    assert status["state"] == JobState.finished
+    assert responses == []
+
+
+@pytest.mark.parametrize(argnames="accept_ranges", argvalues=[True, False])
+def test_async_interrupted_download_is_resumed(tmp_path: Path, accept_ranges: bool):
+    # GIVEN a (mocked) Redact server dropping the first download halfway
+    content = bytes(range(256)) * 4096
+
+    async def download() -> Path:
+        async with AsyncRedactRequests() as redact_requests:
+            return await redact_requests.write_output_to_file(
+                service=ServiceType.blur,
+                out_type=OutputType.videos,
+                output_id=uuid.UUID("a0e5f3c4-64d7-4a2c-8a47-4b9ae6b1d2c1"),
+                file=tmp_path / "video.mp4",
+            )
+
+    with mock_redact_server(
+        output_content=content,
+        interrupt_output_after=len(content) // 2,
+        accept_ranges=accept_ranges,
+    ):
+        # WHEN the result is downloaded asynchronously
+        # THEN the download continues at the interrupted byte if the server supports ranges, else it starts over
+        result_path = asyncio.run(download())
+
+    # AND the complete result is written without leftover temp files
+    assert result_path.read_bytes() == content
+    assert list(tmp_path.iterdir()) == [result_path]
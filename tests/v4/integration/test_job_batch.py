@@ -0,0 +1,157 @@
+import io
+from pathlib import Path
+
+import httpx
+import pytest
+
+from redact.commons.polling import FixedPollingStrategy
+from redact.v4 import JobState, OutputType, RedactInstance, RedactRequests, ServiceType
+from tests.conftest import NUMBER_OF_IMAGES
+from tests.v4.integration.mock_backend import MockRedactBackend
+
+
+@pytest.fixture
+def backend() -> MockRedactBackend:
+    return MockRedactBackend(polls_until_finished=2, failing_file_names=["img_1.jpeg"])
+
+
+@pytest.fixture
+def redact_instance(backend) -> RedactInstance:
+    return RedactInstance(
+        RedactRequests(httpx_client=backend.client()),
+        service=ServiceType.blur,
+        out_type=OutputType.images,
+    )
+
+
+def _image_paths(images_path: Path):
+    return [images_path / f"sub_dir/img_{i}.jpeg" for i in range(NUMBER_OF_IMAGES)]
+
+
+def test_batch_downloads_and_deletes_all_jobs(
+    redact_instance, backend, images_path, tmp_path
+):
+    # GIVEN a batch of jobs, one of which fails
+    with redact_instance.start_jobs(
+        _image_paths(images_path),
+        n_parallel_uploads=2,
+        polling_strategy=FixedPollingStrategy(0.01),
+    ) as batch:
+        # WHEN all results are downloaded
+        result_paths = batch.download_all(tmp_path)
+
+    # THEN the results of the successful jobs are in the output dir, in the order of the files
+    for i, result_path in enumerate(result_paths):
+        if i == 1:
+            assert result_path is None
+            assert batch.jobs[i].status.state == JobState.failed
+            continue
+        assert result_path == tmp_path / f"img_{i}.jpeg"
+        assert result_path.read_bytes() == f"redacted:img_{i}.jpeg".encode()
+
+    # THEN all jobs were deleted when the batch was left
+    assert backend.n_posts == NUMBER_OF_IMAGES
+    assert backend.jobs == {}
+
+
+def test_batch_as_completed_and_wait_all(redact_instance, images_path):
+    # GIVEN a batch of jobs
+    with redact_instance.start_jobs(
+        _image_paths(images_path), polling_strategy=FixedPollingStrategy(0.01)
+    ) as batch:
+        # WHEN the jobs are consumed as they complete
+        completed = list(batch.as_completed(timeout=10))
+
+        # THEN every job is yielded once and wait_all returns right away
+        assert sorted(j.name for j in completed) == sorted(j.name for j in batch)
+        assert all(j.future.done() for j in batch.wait_all(timeout=0))
+        assert [j.succeeded for j in batch] == [i != 1 for i in range(NUMBER_OF_IMAGES)]
+
+
+def test_batch_reports_failed_uploads(redact_instance, images_path, tmp_path):
+    # GIVEN a batch with a file that doesn't exist
+    missing = tmp_path / "missing.jpeg"
+    with redact_instance.start_jobs(
+        [missing, images_path / "sub_dir/img_0.jpeg"],
+        polling_strategy=FixedPollingStrategy(0.01),
+    ) as batch:
+        # WHEN waiting for the jobs
+        failed, succeeded = batch.wait_all(timeout=10)
+
+    # THEN the upload error is reported without affecting the other job
+    assert isinstance(failed.error, FileNotFoundError)
+    assert failed.job is None
+    assert succeeded.succeeded
+
+
+def test_batch_results_keep_their_relative_paths(redact_instance, tmp_path):
+    # GIVEN a batch of files with the same name in different folders
+    inputs = [tmp_path / "in" / sub / "img.jpeg" for sub in ("a", "b")]
+    for path in inputs:
+        path.parent.mkdir(parents=True)
+        path.write_bytes(b"image")
+
+    with redact_instance.start_jobs(
+        inputs, polling_strategy=FixedPollingStrategy(0.01)
+    ) as batch:
+        # WHEN all results are downloaded
+        result_paths = batch.download_all(tmp_path / "out")
+
+    # THEN both results are kept, under their path relative to the common input folder
+    assert result_paths == [tmp_path / "out" / sub / "img.jpeg" for sub in ("a", "b")]
+    assert all(path.exists() for path in result_paths)
+
+
+def test_batch_refuses_colliding_result_names(redact_instance, tmp_path):
+    # GIVEN a batch of file objects with the same name
+    files = []
+    for _ in range(2):
+        file = io.BytesIO(b"image")
+        file.name = "img.jpeg"
+        files.append(file)
+
+    with redact_instance.start_jobs(
+        files, polling_strategy=FixedPollingStrategy(0.01)
+    ) as batch:
+        # WHEN the results are downloaded
+        # THEN it fails before anything is written
+        with pytest.raises(ValueError, match="img.jpeg"):
+            batch.download_all(tmp_path / "out")
+    assert not (tmp_path / "out").exists()
+
+
+def test_batch_bounds_jobs_in_flight(images_path):
+    # GIVEN a backend recording how many unfinished jobs it has when a job is posted
+    backend = MockRedactBackend(polls_until_finished=3)
+    unfinished_at_post = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.method == "POST":
+            unfinished_at_post.append(
+                sum(
+                    job["polls"] < backend.polls_until_finished
+                    for job in backend.jobs.values()
+                )
+            )
+        return backend.handler(request)
+
+    redact_instance = RedactInstance(
+        RedactRequests(
+            httpx_client=httpx.Client(transport=httpx.MockTransport(handler))
+        ),
+        service=ServiceType.blur,
+        out_type=OutputType.images,
+    )
+
+    # WHEN a batch with at most one job in flight is processed
+    with redact_instance.start_jobs(
+        _image_paths(images_path),
+        n_parallel_uploads=2,
+        max_jobs_in_flight=1,
+        polling_strategy=FixedPollingStrategy(0.01),
+    ) as batch:
+        batch.wait_all(timeout=10)
+
+    # THEN every job was posted only after the previous one finished
+    assert all(j.succeeded for j in batch)
+    assert unfinished_at_post == [0] * NUMBER_OF_IMAGES
@@ -0,0 +1,248 @@
+import uuid
+from pathlib import Path
+
+import pytest
+
+from redact.v4 import (
+    InputType,
+    JobArguments,
+    OutputType,
+    RedactInstance,
+    RedactJob,
+    RedactRequests,
+    ServiceType,
+)
+from redact.v4.tools.job_journal import JobJournal, JobJournalState, job_settings_hash
+from redact.v4.tools.redact_file import redact_file
+from redact.v4.tools.redact_folder import _get_relative_file_paths
+from redact.v4.tools.redact_folder_pipeline import PipelineOptions, RedactFolderPipeline
+from tests.conftest import NUMBER_OF_IMAGES
+from tests.v4.integration.mock_backend import MockRedactBackend
+
+SETTINGS = job_settings_hash(ServiceType.blur, OutputType.images, JobArguments())
+
+
+def _start_job(backend: MockRedactBackend, file_path: Path):
+    redact = RedactInstance(
+        RedactRequests(httpx_client=backend.client()),
+        service=ServiceType.blur,
+        out_type=OutputType.images,
+    )
+    with open(file_path, "rb") as f:
+        return redact.start_job(file=f)
+
+
+def test_journal_entries_are_persisted(tmp_path: Path):
+    # GIVEN a journal with a few state transitions
+    output_id = uuid.uuid4()
+    with JobJournal.in_dir(tmp_path) as journal:
+        journal.record("a.jpeg", output_id, JobJournalState.uploaded)
+        journal.record("a.jpeg", output_id, JobJournalState.finished)
+        journal.record("b.jpeg", uuid.uuid4(), JobJournalState.deleted)
+
+    # WHEN the journal is opened again
+    with JobJournal.in_dir(tmp_path) as journal:
+        entry = journal.get("a.jpeg")
+
+    # THEN the last state of every file is restored
+    assert entry.output_id == output_id
+    assert entry.state == JobJournalState.finished
+    assert journal.get("b.jpeg").state == JobJournalState.deleted
+
+
+def test_journal_ignores_truncated_line(tmp_path: Path):
+    # GIVEN a journal whose last line was cut off by a crash
+    output_id = uuid.uuid4()
+    with JobJournal.in_dir(tmp_path) as journal:
+        journal.record("a.jpeg", output_id, JobJournalState.uploaded)
+    with open(tmp_path / JobJournal.FILE_NAME, "a") as f:
+        f.write('{"file": "b.jpeg", "outp')
+
+    # WHEN the journal is reopened and appended to
+    with JobJournal.in_dir(tmp_path) as journal:
+        journal.record("c.jpeg", output_id, JobJournalState.uploaded)
+    journal = JobJournal.in_dir(tmp_path)
+    journal.close()
+
+    # THEN the valid entries survive and the broken one is dropped
+    assert journal.get("a.jpeg").output_id == output_id
+    assert journal.get("b.jpeg") is None
+    assert journal.get("c.jpeg").output_id == output_id
+
+
+def test_redact_file_reattaches_to_journaled_job(images_path: Path, tmp_path_factory):
+    # GIVEN a job that an interrupted run started and recorded in the journal
+    output_path = tmp_path_factory.mktemp("imgs_dir_out")
+    file_path = images_path / "sub_dir/img_0.jpeg"
+    backend = MockRedactBackend()
+    job = _start_job(backend, file_path)
+    journal = JobJournal.in_dir(output_path)
+    journal.record(file_path, job.output_id, JobJournalState.uploaded, SETTINGS)
+
+    # WHEN the file is redacted again with the journal
+    redact_file(
+        file_path=str(file_path),
+        output_type=OutputType.images,
+        service=ServiceType.blur,
+        output_path=str(output_path / "img_0.jpeg"),
+        redact_requests_param=RedactRequests(httpx_client=backend.client()),
+        waiting_time_between_job_status_checks=0.01,
+        job_journal=journal,
+    )
+    journal.close()
+
+    # THEN the existing job is downloaded without uploading the file again
+    assert backend.n_posts == 1
+    assert (output_path / "img_0.jpeg").read_bytes() == b"redacted:img_0.jpeg"
+    assert backend.deleted == [str(job.output_id)]
+    assert journal.get(file_path).state == JobJournalState.deleted
+
+
+def test_redact_file_uploads_again_if_journaled_job_is_gone(
+    images_path: Path, tmp_path_factory
+):
+    # GIVEN a journal entry for a job the backend does not know (anymore)
+    output_path = tmp_path_factory.mktemp("imgs_dir_out")
+    file_path = images_path / "sub_dir/img_0.jpeg"
+    backend = MockRedactBackend()
+    journal = JobJournal.in_dir(output_path)
+    journal.record(file_path, uuid.uuid4(), JobJournalState.uploaded, SETTINGS)
+
+    # WHEN the file is redacted with the journal
+    redact_file(
+        file_path=str(file_path),
+        output_type=OutputType.images,
+        service=ServiceType.blur,
+        output_path=str(output_path / "img_0.jpeg"),
+        redact_requests_param=RedactRequests(httpx_client=backend.client()),
+        waiting_time_between_job_status_checks=0.01,
+        job_journal=journal,
+    )
+    journal.close()
+
+    # THEN a new job is started for the file
+    assert backend.n_posts == 1
+    assert (output_path / "img_0.jpeg").read_bytes() == b"redacted:img_0.jpeg"
+
+
+def test_pipeline_reattaches_to_journaled_jobs(images_path: Path, tmp_path_factory):
+    # GIVEN jobs for all images that were started by an interrupted run
+    output_path = tmp_path_factory.mktemp("imgs_dir_out")
+    backend = MockRedactBackend(polls_until_finished=2)
+    relative_file_paths = list(
+        _get_relative_file_paths(input_dir=images_path, input_type=InputType.images)
+    )
+    journal = JobJournal.in_dir(output_path)
+    for relative_file_path in relative_file_paths:
+        file_path = images_path / relative_file_path
+        job = _start_job(backend, file_path)
+        journal.record(file_path, job.output_id, JobJournalState.uploaded, SETTINGS)
+
+    # WHEN the folder is processed by the pipeline with the journal
+    pipeline = RedactFolderPipeline(
+        base_dir_in=images_path,
+        base_dir_out=output_path,
+        input_type=InputType.images,
+        output_type=OutputType.images,
+        service=ServiceType.blur,
+        redact_requests=RedactRequests(httpx_client=backend.client()),
+        n_parallel_jobs=2,
+        options=PipelineOptions(max_jobs_in_flight=2),
+        job_journal=journal,
+    )
+    pipeline.poll_interval = 0.01
+    pipeline.run(relative_file_paths)
+    journal.close()
+
+    # THEN no file is uploaded again and all results are downloaded
+    assert backend.n_posts == NUMBER_OF_IMAGES
+    for i in range(NUMBER_OF_IMAGES):
+        assert (output_path / f"sub_dir/img_{i}.jpeg").read_bytes() == (
+            f"redacted:img_{i}.jpeg".encode()
+        )
+    assert backend.jobs == {}
+
+
+def test_journaled_job_with_other_settings_is_not_reattached(
+    images_path: Path, tmp_path_factory
+):
+    # GIVEN a job that an earlier run started with other job arguments
+    output_path = tmp_path_factory.mktemp("imgs_dir_out")
+    file_path = images_path / "sub_dir/img_0.jpeg"
+    backend = MockRedactBackend()
+    job = _start_job(backend, file_path)
+    journal = JobJournal.in_dir(output_path)
+    journal.record(file_path, job.output_id, JobJournalState.uploaded, SETTINGS)
+
+    # WHEN the file is redacted again with other job arguments
+    redact_file(
+        file_path=str(file_path),
+        output_type=OutputType.images,
+        service=ServiceType.blur,
+        job_args=JobArguments(face=False),
+        output_path=str(output_path / "img_0.jpeg"),
+        redact_requests_param=RedactRequests(httpx_client=backend.client()),
+        waiting_time_between_job_status_checks=0.01,
+        job_journal=journal,
+    )
+    journal.close()
+
+    # THEN a new job is started, and journaled with its settings
+    assert backend.n_posts == 2
+    assert journal.get(file_path).output_id != job.output_id
+    assert journal.get(file_path).settings == job_settings_hash(
+        ServiceType.blur, OutputType.images, JobArguments(face=False)
+    )
+
+
+def test_journaled_job_is_kept_on_keyboard_interrupt(
+    images_path: Path, tmp_path_factory, monkeypatch
+):
+    # GIVEN a run that is interrupted while waiting for its job
+    output_path = tmp_path_factory.mktemp("imgs_dir_out")
+    file_path = images_path / "sub_dir/img_0.jpeg"
+    backend = MockRedactBackend()
+    journal = JobJournal.in_dir(output_path)
+
+    def interrupt(*args, **kwargs):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(RedactJob, "wait_until_finished", interrupt)
+
+    # WHEN the file is redacted with the journal
+    with pytest.raises(KeyboardInterrupt):
+        redact_file(
+            file_path=str(file_path),
+            output_type=OutputType.images,
+            service=ServiceType.blur,
+            output_path=str(output_path / "img_0.jpeg"),
+            redact_requests_param=RedactRequests(httpx_client=backend.client()),
+            waiting_time_between_job_status_checks=0.01,
+            job_journal=journal,
+        )
+    journal.close()
+
+    # THEN the job is not deleted, so the next run can reattach it
+    assert backend.deleted == []
+    assert journal.get(file_path).state == JobJournalState.uploaded
+    assert str(journal.get(file_path).output_id) in backend.jobs
+
+
+def test_journal_is_compacted_on_load(tmp_path: Path, monkeypatch):
+    # GIVEN a journal with many state transitions of few files
+    monkeypatch.setattr(JobJournal, "COMPACTION_MIN_LINES", 10)
+    output_id = uuid.uuid4()
+    with JobJournal.in_dir(tmp_path) as journal:
+        for _ in range(10):
+            journal.record("a.jpeg", output_id, JobJournalState.uploaded, SETTINGS)
+        journal.record("b.jpeg", output_id, JobJournalState.deleted)
+
+    # WHEN the journal is opened again and appended to
+    with JobJournal.in_dir(tmp_path) as journal:
+        journal.record("a.jpeg", output_id, JobJournalState.finished)
+
+    # THEN only the last line of every file was kept, with the settings of the job
+    lines = (tmp_path / JobJournal.FILE_NAME).read_text().splitlines()
+    assert len(lines) == 3
+    assert journal.get("a.jpeg").state == JobJournalState.finished
+    assert journal.get("a.jpeg").settings == SETTINGS
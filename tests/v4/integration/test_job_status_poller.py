@@ -0,0 +1,168 @@
+import threading
+import uuid
+from concurrent.futures import wait
+from pathlib import Path
+
+import httpx
+import pytest
+
+from redact.commons.polling import AdaptivePollingStrategy, FixedPollingStrategy
+from redact.errors import RedactResponseError
+from redact.v4 import (
+    JobState,
+    JobStatusPoller,
+    OutputType,
+    RedactInstance,
+    RedactJob,
+    RedactRequests,
+    ServiceType,
+)
+from redact.v4.tools.redact_file import redact_file
+from tests.v4.integration.mock_backend import MockRedactBackend
+
+
+@pytest.fixture
+def backend() -> MockRedactBackend:
+    return MockRedactBackend(polls_until_finished=3)
+
+
+@pytest.fixture
+def redact_instance(backend) -> RedactInstance:
+    return RedactInstance(
+        RedactRequests(httpx_client=backend.client()),
+        service=ServiceType.blur,
+        out_type=OutputType.images,
+    )
+
+
+def test_poller_resolves_all_jobs(redact_instance, backend, some_image):
+    # GIVEN many running jobs
+    jobs = []
+    for _ in range(20):
+        some_image.seek(0)
+        jobs.append(redact_instance.start_job(file=some_image))
+
+    # WHEN they are all watched by one poller
+    with JobStatusPoller(interval=0.01, n_workers=2) as poller:
+        futures = [poller.watch(job) for job in jobs]
+        wait(futures, timeout=10)
+
+        # THEN every future resolves to the final status of its job
+        assert all(f.result().state == JobState.finished for f in futures)
+        assert [f.result().output_id for f in futures] == [j.output_id for j in jobs]
+        assert poller.n_watched_jobs == 0
+
+    # AND each job was polled exactly until it finished
+    assert backend.n_status_requests == 20 * backend.polls_until_finished
+
+
+def test_poller_propagates_errors(redact_instance):
+    # GIVEN a job unknown to the backend
+    job = RedactJob(
+        redact_requests=redact_instance.redact_requests,
+        service=ServiceType.blur,
+        out_type=OutputType.images,
+        output_id=uuid.uuid4(),
+    )
+
+    # WHEN it is watched
+    with JobStatusPoller(interval=0.01) as poller:
+        future = poller.watch(job)
+
+        # THEN the error of the status request is raised from the future
+        with pytest.raises(RedactResponseError):
+            future.result(timeout=10)
+
+
+def test_poller_cancels_pending_jobs_on_shutdown(redact_instance, some_image):
+    # GIVEN a job that is watched with a long interval
+    job = redact_instance.start_job(file=some_image)
+    poller = JobStatusPoller()
+    future = poller.watch(job, interval=60)
+
+    # WHEN the poller is shut down
+    poller.shutdown()
+
+    # THEN the future is cancelled instead of waiting forever
+    assert future.cancelled()
+
+
+def test_redact_file_uses_poller(backend, image_path: Path):
+    # GIVEN a poller shared by the caller
+    with JobStatusPoller(interval=0.01) as poller:
+        # WHEN a file is redacted with it
+        job_status = redact_file(
+            file_path=image_path,
+            output_type=OutputType.images,
+            service=ServiceType.blur,
+            redact_requests_param=RedactRequests(httpx_client=backend.client()),
+            job_status_poller=poller,
+        )
+
+    # THEN the final status is returned and the result downloaded
+    assert job_status.state == JobState.finished
+    assert (image_path.parent / f"{image_path.stem}_redacted.jpeg").exists()
+    assert backend.jobs == {}
+
+
+def test_wait_until_finished_with_polling_strategy(
+    redact_instance, backend, some_image
+):
+    # GIVEN a running job
+    job = redact_instance.start_job(file=some_image)
+
+    # WHEN waiting for it with a polling strategy
+    job.wait_until_finished(polling_strategy=FixedPollingStrategy(interval=0.01))
+
+    # THEN the job is finished after the expected number of status checks
+    assert job.get_status().state == JobState.finished
+    assert backend.n_status_requests == backend.polls_until_finished + 1
+
+
+def test_poller_uses_polling_strategy(redact_instance, some_image):
+    # GIVEN a job and a poller whose default interval would never fire during the test
+    job = redact_instance.start_job(file=some_image)
+    with JobStatusPoller(interval=60) as poller:
+        # WHEN the job is watched with its own polling strategy
+        future = poller.watch(
+            job, polling_strategy=AdaptivePollingStrategy(min_interval=0.01)
+        )
+
+        # THEN the strategy decides when the job is polled
+        assert future.result(timeout=10).state == JobState.finished
+
+
+def test_notification_during_status_check_triggers_another_check(some_image):
+    # GIVEN a job whose first status check is slow, and finishes with the second one
+    backend = MockRedactBackend(polls_until_finished=2)
+    in_status_check = threading.Event()
+    release = threading.Event()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/status") and not release.is_set():
+            in_status_check.set()
+            release.wait(timeout=5)
+        return backend.handler(request)
+
+    redact = RedactInstance(
+        RedactRequests(
+            httpx_client=httpx.Client(transport=httpx.MockTransport(handler))
+        ),
+        service=ServiceType.blur,
+        out_type=OutputType.images,
+    )
+    job = redact.start_job(file=some_image)
+
+    # polling alone would not check the job again during the test
+    with JobStatusPoller(polling_strategy=FixedPollingStrategy(600)) as poller:
+        future = poller.watch(job)
+        poller.poll_now(job.output_id)
+        assert in_status_check.wait(timeout=5)
+
+        # WHEN a notification about the job arrives while its status is being checked
+        poller.notify(job.output_id)
+        release.set()
+
+        # THEN the job is checked again right after the running check
+        assert future.result(timeout=5).state == JobState.finished
+    assert backend.n_status_requests == 2
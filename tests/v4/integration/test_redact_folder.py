@@ -0,0 +1,232 @@
+import _thread
+import threading
+import time
+import uuid
+from pathlib import Path
+
+import pytest
+
+from redact.commons.result_cache import ResultCache
+from redact.v4 import InputType, JobState, JobStatus, OutputType, ServiceType
+from redact.v4.tools.redact_folder import _parallel_map, redact_folder
+from redact.v4.tools.redact_folder_pipeline import PipelineOptions
+from tests.conftest import NUMBER_OF_IMAGES
+from tests.v4.integration.mock_backend import MockRedactBackend
+
+
+@pytest.fixture
+def backend(mocker) -> MockRedactBackend:
+    backend = MockRedactBackend()
+    mocker.patch(
+        "redact.v4.redact_requests.get_singleton_client", return_value=backend.client()
+    )
+    return backend
+
+
+@pytest.mark.parametrize("pipelined", [False, True])
+def test_redact_folder_streams_discovered_files(
+    backend: MockRedactBackend, images_path: Path, tmp_path_factory, pipelined: bool
+):
+    # GIVEN an input dir with images and more files than parallel jobs
+    output_path = tmp_path_factory.mktemp("imgs_dir_out")
+
+    # WHEN the folder is redacted
+    jobs_summary = redact_folder(
+        input_dir=images_path,
+        output_dir=output_path,
+        input_type=InputType.images,
+        output_type=OutputType.images,
+        service=ServiceType.blur,
+        n_parallel_jobs=1,
+        pipelined=pipelined,
+    )
+
+    # THEN all discovered files are processed
+    assert jobs_summary.successful == NUMBER_OF_IMAGES
+    for i in range(NUMBER_OF_IMAGES):
+        assert (output_path / f"sub_dir/img_{i}.jpeg").read_bytes() == (
+            f"redacted:img_{i}.jpeg".encode()
+        )
+    assert backend.jobs == {}
+
+
+@pytest.mark.parametrize("pipelined", [False, True])
+def test_redact_folder_reuses_cached_results(
+    backend: MockRedactBackend, images_path: Path, tmp_path_factory, pipelined: bool
+):
+    # GIVEN an input dir with identical images and an empty result cache
+    output_path = tmp_path_factory.mktemp("imgs_dir_out")
+    result_cache = ResultCache(tmp_path_factory.mktemp("cache"))
+
+    # WHEN the folder is redacted one file after the other
+    jobs_summary = redact_folder(
+        input_dir=images_path,
+        output_dir=output_path,
+        input_type=InputType.images,
+        output_type=OutputType.images,
+        service=ServiceType.blur,
+        n_parallel_jobs=1,
+        pipelined=pipelined,
+        pipeline_options=PipelineOptions(max_jobs_in_flight=1),
+        result_cache=result_cache,
+    )
+
+    # THEN only the first image is uploaded, the others get its result
+    assert jobs_summary.successful == NUMBER_OF_IMAGES
+    assert backend.n_posts == 1
+    results = {
+        (output_path / f"sub_dir/img_{i}.jpeg").read_bytes()
+        for i in range(NUMBER_OF_IMAGES)
+    }
+    assert len(results) == 1
+
+
+@pytest.mark.parametrize("pipelined", [False, True])
+@pytest.mark.parametrize(
+    "changed_setting",
+    [{"ignore_warnings": True}, {"redact_url": "http://other-redact:8787"}],
+)
+def test_redact_folder_doesnt_reuse_results_of_other_settings(
+    backend: MockRedactBackend,
+    images_path: Path,
+    tmp_path_factory,
+    pipelined: bool,
+    changed_setting: dict,
+):
+    # GIVEN a result cache filled by redacting a folder of identical images
+    result_cache = ResultCache(tmp_path_factory.mktemp("cache"))
+    settings = dict(
+        input_dir=images_path,
+        input_type=InputType.images,
+        output_type=OutputType.images,
+        service=ServiceType.blur,
+        n_parallel_jobs=1,
+        pipelined=pipelined,
+        pipeline_options=PipelineOptions(max_jobs_in_flight=1),
+        result_cache=result_cache,
+    )
+    redact_folder(output_dir=tmp_path_factory.mktemp("imgs_dir_out"), **settings)
+
+    # WHEN the folder is redacted again with another setting
+    jobs_summary = redact_folder(
+        output_dir=tmp_path_factory.mktemp("imgs_dir_out"),
+        **{**settings, **changed_setting},
+    )
+
+    # THEN the cached result is not reused
+    assert jobs_summary.successful == NUMBER_OF_IMAGES
+    assert backend.n_posts == 2
+
+
+@pytest.mark.parametrize("pipelined", [False, True])
+def test_redact_folder_distributes_jobs_across_instances(
+    mocker, images_path: Path, tmp_path_factory, pipelined: bool
+):
+    # GIVEN two Redact instances
+    backends = {
+        "http://node-a:8787": MockRedactBackend(),
+        "http://node-b:8787": MockRedactBackend(),
+    }
+    mocker.patch(
+        "redact.v4.redact_requests.get_singleton_client",
+        side_effect=lambda redact_url: backends[redact_url].client(),
+    )
+    output_path = tmp_path_factory.mktemp("imgs_dir_out")
+
+    # WHEN the folder is redacted with both of them
+    jobs_summary = redact_folder(
+        input_dir=images_path,
+        output_dir=output_path,
+        input_type=InputType.images,
+        output_type=OutputType.images,
+        service=ServiceType.blur,
+        redact_url=list(backends),
+        n_parallel_jobs=2,
+        pipelined=pipelined,
+    )
+
+    # THEN all files are processed, by both instances
+    assert jobs_summary.successful == NUMBER_OF_IMAGES
+    assert all(backend.n_posts > 0 for backend in backends.values())
+    assert sum(backend.n_posts for backend in backends.values()) == NUMBER_OF_IMAGES
+    assert all(backend.jobs == {} for backend in backends.values())
+
+
+@pytest.mark.parametrize("pipelined", [False, True])
+def test_redact_folder_skips_outputs_with_other_suffix(
+    backend: MockRedactBackend, images_path: Path, tmp_path_factory, pipelined: bool
+):
+    # GIVEN an output dir with the overlay of one image under another suffix, and leftovers of an interrupted run
+    output_path = tmp_path_factory.mktemp("imgs_dir_out")
+    (output_path / "sub_dir").mkdir()
+    (output_path / "sub_dir/img_0.png").write_bytes(b"redacted")
+    (output_path / "sub_dir/tmpab12_xyz").write_bytes(b"partial")
+    (output_path / "sub_dir/.img_1.jpeg.0123.tmp").write_bytes(b"partial")
+
+    # WHEN the folder is redacted
+    jobs_summary = redact_folder(
+        input_dir=images_path,
+        output_dir=output_path,
+        input_type=InputType.images,
+        output_type=OutputType.overlays,
+        service=ServiceType.blur,
+        pipelined=pipelined,
+    )
+
+    # THEN only the images without result are uploaded
+    assert jobs_summary.successful == NUMBER_OF_IMAGES - 1
+    assert backend.n_posts == NUMBER_OF_IMAGES - 1
+    assert not (output_path / "sub_dir/img_0.jpeg").exists()
+
+
+def _finished(item) -> JobStatus:
+    return JobStatus(output_id=uuid.uuid4(), state=JobState.finished, file_name=item)
+
+
+def test_parallel_map_collects_results_while_waiting_for_items(caplog):
+    # GIVEN items like those of a watched folder, which stay idle after a first file
+    collected_while_idle = threading.Event()
+
+    def fail(item):
+        raise RuntimeError(f"broken {item}")
+
+    def watched_files():
+        yield "img_0.jpeg"
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            if any("broken img_0.jpeg" in record.message for record in caplog.records):
+                collected_while_idle.set()
+                return
+            time.sleep(0.05)
+
+    # WHEN they are mapped
+    jobs_summary = _parallel_map(fail, watched_files(), n_parallel_jobs=2)
+
+    # THEN the result of the first file is collected before the next item comes
+    assert collected_while_idle.is_set()
+    assert jobs_summary.failed == 1
+
+
+def test_parallel_map_finishes_running_jobs_on_interrupt():
+    # GIVEN items of a watched folder, which only end when the watcher is stopped
+    stopped = threading.Event()
+
+    def watched_files():
+        yield "img_0.jpeg"
+        stopped.wait(5)
+
+    def interrupt(item):
+        # CTRL+C while the job is running
+        time.sleep(0.2)
+        _thread.interrupt_main()
+        time.sleep(0.2)
+        return _finished(item)
+
+    # WHEN CTRL+C is pressed
+    jobs_summary = _parallel_map(
+        interrupt, watched_files(), n_parallel_jobs=2, stop=stopped.set
+    )
+
+    # THEN the watcher is stopped, and the running job is counted in the summary
+    assert stopped.is_set()
+    assert jobs_summary.successful == 1
@@ -0,0 +1,80 @@
+from pathlib import Path
+
+from redact.v4 import InputType, OutputType, RedactRequests, ServiceType
+from redact.v4.tools.redact_folder import _get_relative_file_paths
+from redact.v4.tools.redact_folder_pipeline import PipelineOptions, RedactFolderPipeline
+from redact.v4.utils import calculate_jobs_summary
+from tests.conftest import NUMBER_OF_IMAGES
+from tests.v4.integration.mock_backend import MockRedactBackend
+
+
+def _run_pipeline(
+    backend: MockRedactBackend, images_path: Path, output_path: Path, **kwargs
+):
+    pipeline = RedactFolderPipeline(
+        base_dir_in=images_path,
+        base_dir_out=output_path,
+        input_type=InputType.images,
+        output_type=OutputType.images,
+        service=ServiceType.blur,
+        redact_requests=RedactRequests(httpx_client=backend.client()),
+        n_parallel_jobs=2,
+        options=PipelineOptions(n_poll_workers=2, max_jobs_in_flight=2),
+        **kwargs,
+    )
+    pipeline.poll_interval = 0.01
+    relative_file_paths = _get_relative_file_paths(
+        input_dir=images_path, input_type=InputType.images
+    )
+    return pipeline.run(relative_file_paths)
+
+
+def test_pipeline_processes_all_files(images_path: Path, tmp_path_factory):
+    # GIVEN an input dir with images and a backend that needs a few status polls per job
+    output_path = tmp_path_factory.mktemp("imgs_dir_out")
+    backend = MockRedactBackend(polls_until_finished=3)
+
+    # WHEN the folder is processed by the staged pipeline
+    job_statuses, exceptions = _run_pipeline(backend, images_path, output_path)
+
+    # THEN every file is downloaded and every job is deleted on the backend
+    assert (
+        calculate_jobs_summary(job_statuses, exceptions).successful == NUMBER_OF_IMAGES
+    )
+    for i in range(NUMBER_OF_IMAGES):
+        assert (output_path / f"sub_dir/img_{i}.jpeg").read_bytes() == (
+            f"redacted:img_{i}.jpeg".encode()
+        )
+    assert len(backend.deleted) == NUMBER_OF_IMAGES
+    assert backend.jobs == {}
+
+
+def test_pipeline_deletes_failed_jobs(images_path: Path, tmp_path_factory):
+    # GIVEN a backend on which one of the jobs fails
+    output_path = tmp_path_factory.mktemp("imgs_dir_out")
+    backend = MockRedactBackend(failing_file_names=["img_1.jpeg"])
+
+    # WHEN the folder is processed by the staged pipeline
+    job_statuses, exceptions = _run_pipeline(backend, images_path, output_path)
+
+    # THEN the failed job is counted, not downloaded, and still cleaned up on the backend
+    jobs_summary = calculate_jobs_summary(job_statuses, exceptions)
+    assert jobs_summary.failed == 1
+    assert jobs_summary.successful == NUMBER_OF_IMAGES - 1
+    assert not (output_path / "sub_dir/img_1.jpeg").exists()
+    assert backend.jobs == {}
+
+
+def test_pipeline_skips_existing_outputs(images_path: Path, tmp_path_factory):
+    # GIVEN an output dir in which one result already exists
+    output_path = tmp_path_factory.mktemp("imgs_dir_out")
+    (output_path / "sub_dir").mkdir()
+    (output_path / "sub_dir/img_0.jpeg").write_bytes(b"existing")
+    backend = MockRedactBackend()
+
+    # WHEN the folder is processed by the staged pipeline
+    _run_pipeline(backend, images_path, output_path)
+
+    # THEN the existing output is neither uploaded again nor overwritten
+    assert backend.n_posts == NUMBER_OF_IMAGES - 1
+    assert (output_path / "sub_dir/img_0.jpeg").read_bytes() == b"existing"
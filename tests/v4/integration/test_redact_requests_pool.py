@@ -0,0 +1,239 @@
+import io
+import time
+from typing import List
+
+import httpx
+import pytest
+
+from redact.commons.load_balancing import LoadBalancingPolicyType
+from redact.v4 import (
+    OutputType,
+    RedactInstance,
+    RedactJob,
+    RedactRequests,
+    RedactRequestsPool,
+    ServiceType,
+)
+from tests.v4.integration.mock_backend import MockRedactBackend
+
+
+def _unreachable_client() -> httpx.Client:
+    def handler(request: httpx.Request) -> httpx.Response:
+        raise httpx.ConnectError("Connection refused", request=request)
+
+    return httpx.Client(transport=httpx.MockTransport(handler))
+
+
+def _start_jobs(pool: RedactRequestsPool, n_jobs: int) -> List[RedactJob]:
+    instance = RedactInstance(
+        pool, service=ServiceType.blur, out_type=OutputType.images
+    )
+    jobs = []
+    for i in range(n_jobs):
+        file = io.BytesIO(b"image")
+        file.name = f"img_{i}.jpeg"
+        jobs.append(instance.start_job(file=file))
+    return jobs
+
+
+@pytest.fixture
+def backends() -> List[MockRedactBackend]:
+    return [MockRedactBackend(polls_until_finished=2) for _ in range(2)]
+
+
+def test_jobs_stick_to_their_node(backends: List[MockRedactBackend]):
+    # GIVEN a pool of two nodes
+    pool = RedactRequestsPool(
+        [
+            RedactRequests(redact_url=f"http://node-{i}:8787", httpx_client=b.client())
+            for i, b in enumerate(backends)
+        ],
+        policy=LoadBalancingPolicyType.round_robin,
+    )
+
+    # WHEN jobs are started and processed
+    jobs = _start_jobs(pool, n_jobs=4)
+    for i, job in enumerate(jobs):
+        job.wait_until_finished(sleep=0)
+        result = job.download_result()
+        job.delete()
+
+        # THEN every request of a job reached the node that started it
+        assert result.content == f"redacted:img_{i}.jpeg".encode()
+
+    # THEN the jobs were distributed evenly and deleted on their nodes
+    assert [b.n_posts for b in backends] == [2, 2]
+    assert [len(b.deleted) for b in backends] == [2, 2]
+
+
+def test_least_outstanding_prefers_idle_node(backends: List[MockRedactBackend]):
+    # GIVEN a pool with a busy node
+    pool = RedactRequestsPool(
+        [
+            RedactRequests(redact_url=f"http://node-{i}:8787", httpx_client=b.client())
+            for i, b in enumerate(backends)
+        ],
+        policy=LoadBalancingPolicyType.least_outstanding,
+    )
+    busy_jobs = _start_jobs(pool, n_jobs=2)
+    assert [b.n_posts for b in backends] == [1, 1]
+
+    # WHEN the job of one node finishes and a new job is started
+    busy_jobs[0].wait_until_finished(sleep=0)
+    _start_jobs(pool, n_jobs=1)
+
+    # THEN the new job goes to the node without unfinished jobs
+    finished_on_first = str(busy_jobs[0].output_id) in backends[0].jobs
+    idle_backend = backends[0] if finished_on_first else backends[1]
+    assert idle_backend.n_posts == 2
+
+
+def test_unknown_jobs_are_looked_up_on_all_nodes(backends: List[MockRedactBackend]):
+    # GIVEN a job started on the second node by another pool (e.g. an earlier run)
+    requests = [
+        RedactRequests(redact_url=f"http://node-{i}:8787", httpx_client=b.client())
+        for i, b in enumerate(backends)
+    ]
+    [job] = _start_jobs(RedactRequestsPool(requests[1:]), n_jobs=1)
+
+    # WHEN its status is requested through a new pool of both nodes
+    pool = RedactRequestsPool(requests)
+    status = pool.get_status(ServiceType.blur, OutputType.images, job.output_id)
+
+    # THEN the job is found on its node and the following requests go there directly
+    assert status["output_id"] == str(job.output_id)
+    assert pool._node_of(ServiceType.blur, OutputType.images, job.output_id) is (
+        pool.nodes[1]
+    )
+
+
+def test_failing_node_is_ejected_and_upload_fails_over(
+    backends: List[MockRedactBackend],
+):
+    # GIVEN a pool with an unreachable node, which is ejected after its first failure
+    pool = RedactRequestsPool(
+        [
+            RedactRequests(
+                redact_url="http://down:8787",
+                httpx_client=_unreachable_client(),
+                retry_total_time_limit=0,
+            ),
+            RedactRequests(
+                redact_url="http://up:8787", httpx_client=backends[0].client()
+            ),
+        ],
+        policy=LoadBalancingPolicyType.round_robin,
+        max_failures=1,
+        ejection_time=0.2,
+    )
+
+    # WHEN jobs are started
+    _start_jobs(pool, n_jobs=3)
+
+    # THEN the upload to the unreachable node is retried on the other node, which gets all jobs
+    assert backends[0].n_posts == 3
+    assert pool.nodes[0].is_ejected()
+
+    # WHEN the ejection expired, but the node is still down
+    time.sleep(0.2)
+    _start_jobs(pool, n_jobs=1)
+
+    # THEN the health check keeps it ejected
+    assert backends[0].n_posts == 4
+    assert pool.nodes[0].is_ejected()
+
+
+def test_from_urls_gives_up_on_nodes_quickly():
+    # GIVEN a pool created from URLs
+    # WHEN no retry limit is passed for the nodes
+    pool = RedactRequestsPool.from_urls(
+        ["http://node-0:8787", "http://node-1:8787"], node_retry_time_limit=3.0
+    )
+
+    # THEN the requests of a node give up after the short limit, so failures reach the pool early
+    assert [n.redact_requests.retry_total_time_limit for n in pool.nodes] == [3, 3]
+    pool.close()
+
+
+def test_unreachable_node_is_ejected_by_periodic_health_check(
+    backends: List[MockRedactBackend],
+):
+    # GIVEN a pool checking its nodes periodically, one of which went down
+    with RedactRequestsPool(
+        [
+            RedactRequests(
+                redact_url="http://down:8787",
+                httpx_client=_unreachable_client(),
+                retry_total_time_limit=0,
+            ),
+            RedactRequests(
+                redact_url="http://up:8787", httpx_client=backends[0].client()
+            ),
+        ],
+        health_check_interval=0.05,
+    ) as pool:
+        # WHEN the pool is used and some time passes without requests to the node
+        _start_jobs(pool, n_jobs=1)
+        time.sleep(0.3)
+
+        # THEN the node is ejected, the other one not
+        assert pool.nodes[0].is_ejected()
+        assert not pool.nodes[1].is_ejected()
+
+    # THEN the health checks stop with the pool
+    assert pool._health_checker is None
+
+
+def test_downloaded_jobs_are_forgotten(backends: List[MockRedactBackend]):
+    # GIVEN a pool with jobs which are not deleted (e.g. auto_delete_job=False)
+    pool = RedactRequestsPool(
+        [
+            RedactRequests(redact_url=f"http://node-{i}:8787", httpx_client=b.client())
+            for i, b in enumerate(backends)
+        ],
+        health_check_interval=None,
+    )
+    jobs = _start_jobs(pool, n_jobs=2)
+
+    # WHEN their results are downloaded without the pool seeing them finish (e.g. through a status webhook)
+    for job in jobs:
+        pool.get_output(ServiceType.blur, OutputType.images, job.output_id)
+
+    # THEN the pool and its nodes don't keep the jobs and count no outstanding jobs
+    assert pool._nodes_by_output_id == {}
+    assert [n.outstanding_jobs for n in pool.nodes] == [0, 0]
+    assert all(not n._jobs for n in pool.nodes)
+
+
+def test_requests_of_a_job_are_retried_while_its_node_is_unreachable(
+    backends: List[MockRedactBackend],
+):
+    # GIVEN a pool with a job on a node that is briefly unreachable
+    backend = backends[0]
+    n_failures = [2]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.method == "GET" and n_failures[0] > 0:
+            n_failures[0] -= 1
+            raise httpx.ConnectError("Connection refused", request=request)
+        return backend.handler(request)
+
+    pool = RedactRequestsPool(
+        [
+            RedactRequests(
+                redact_url="http://node:8787",
+                httpx_client=httpx.Client(transport=httpx.MockTransport(handler)),
+                retry_total_time_limit=0,
+            )
+        ],
+        health_check_interval=None,
+        job_retry_time_limit=10.0,
+    )
+    [job] = _start_jobs(pool, n_jobs=1)
+
+    # WHEN its status is requested
+    status = pool.get_status(ServiceType.blur, OutputType.images, job.output_id)
+
+    # THEN the request is retried until the node answers
+    assert status["output_id"] == str(job.output_id)
+    assert n_failures == [0]
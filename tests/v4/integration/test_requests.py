@@ -139,3 +139,50 @@ def test_request_fail_by_timeout(some_image):
                 out_type=out_type,
                 job_args=job_args,
             )
+
+
+@pytest.mark.parametrize(argnames="accept_ranges", argvalues=[True, False])
+def test_interrupted_download_is_resumed(tmp_path, accept_ranges: bool):
+    # GIVEN a (mocked) Redact server dropping the first download halfway
+    content = bytes(range(256)) * 4096
+    output_id = "a0e5f3c4-64d7-4a2c-8a47-4b9ae6b1d2c1"
+
+    with mock_redact_server(
+        output_content=content,
+        interrupt_output_after=len(content) // 2,
+        accept_ranges=accept_ranges,
+    ):
+        # WHEN the result is downloaded
+        # THEN the download continues at the interrupted byte if the server supports ranges (otherwise a 500 is
+        # returned and an error thrown), else it starts over
+        result_path = RedactRequests().write_output_to_file(
+            service=ServiceType.blur,
+            out_type=OutputType.videos,
+            output_id=output_id,
+            file=tmp_path / "video.mp4",
+        )
+
+    # AND the complete result is written without leftover temp files
+    assert result_path.read_bytes() == content
+    assert list(tmp_path.iterdir()) == [result_path]
+
+
+@pytest.mark.parametrize(argnames="accept_ranges", argvalues=[True, False])
+def test_segmented_download(tmp_path, accept_ranges: bool):
+    # GIVEN a (mocked) Redact server with a result of 1 MB
+    content = bytes(range(256)) * 4096
+
+    with mock_redact_server(output_content=content, accept_ranges=accept_ranges):
+        # WHEN the result is downloaded in segments of 64 KB
+        result_path = RedactRequests().write_output_to_file(
+            service=ServiceType.blur,
+            out_type=OutputType.videos,
+            output_id="a0e5f3c4-64d7-4a2c-8a47-4b9ae6b1d2c1",
+            file=tmp_path / "video.mp4",
+            n_segments=4,
+            min_segment_size=64 * 1024,
+        )
+
+    # THEN the complete result is written (in one piece if the server doesn't support ranges)
+    assert result_path.read_bytes() == content
+    assert list(tmp_path.iterdir()) == [result_path]
@@ -0,0 +1,123 @@
+import httpx
+import pytest
+
+from redact.v4 import (
+    JobArguments,
+    JobState,
+    JobStatusPoller,
+    OutputType,
+    RedactInstance,
+    RedactRequests,
+    ServiceType,
+    StatusWebhookReceiver,
+)
+from redact.v4.tools.redact_folder import _with_status_webhook_url
+from tests.v4.integration.mock_backend import MockRedactBackend
+
+
+@pytest.fixture
+def backend() -> MockRedactBackend:
+    return MockRedactBackend(polls_until_finished=1)
+
+
+@pytest.fixture
+def job(backend, some_image):
+    redact = RedactInstance(
+        RedactRequests(httpx_client=backend.client()),
+        service=ServiceType.blur,
+        out_type=OutputType.images,
+    )
+    return redact.start_job(file=some_image)
+
+
+@pytest.fixture
+def poller():
+    # polling alone would not finish any job during the tests
+    with JobStatusPoller(interval=600) as poller:
+        yield poller
+
+
+@pytest.fixture
+def receiver(poller):
+    with StatusWebhookReceiver(poller, host="127.0.0.1") as receiver:
+        yield receiver
+
+
+def test_webhook_triggers_status_check(job, backend, poller, receiver):
+    # GIVEN a watched job
+    future = poller.watch(job)
+
+    # WHEN the webhook is called with a (made up) status of the job
+    response = httpx.post(
+        receiver.url,
+        json={"output_id": str(job.output_id), "state": JobState.failed.value},
+    )
+
+    # THEN the status is checked right away, and taken from Redact rather than from the request
+    assert response.status_code == 200
+    assert future.result(timeout=5).state == JobState.finished
+    assert backend.n_status_requests == 1
+
+
+def test_webhook_without_token_is_rejected(job, backend, poller, receiver):
+    # GIVEN a watched job
+    poller.watch(job)
+
+    # WHEN the webhook is called without the random path of the receiver
+    response = httpx.post(
+        f"http://127.0.0.1:{receiver.port}/jobs/{job.output_id}",
+        json={"output_id": str(job.output_id)},
+    )
+
+    # THEN the call is rejected and the job is not checked
+    assert response.status_code == 400
+    assert backend.n_status_requests == 0
+    assert receiver.token in receiver.url
+
+
+def test_receiver_listens_on_localhost_by_default(poller):
+    assert StatusWebhookReceiver(poller).host == "127.0.0.1"
+
+
+def test_webhook_with_output_id_triggers_status_check(job, backend, poller, receiver):
+    # GIVEN a watched job
+    future = poller.watch(job)
+
+    # WHEN the webhook only identifies the job by its path
+    response = httpx.post(f"{receiver.url}jobs/{job.output_id}")
+
+    # THEN its status is checked right away
+    assert response.status_code == 200
+    assert future.result(timeout=5).state == JobState.finished
+    assert backend.n_status_requests == 1
+
+
+def test_webhook_without_job_is_rejected(receiver):
+    response = httpx.post(receiver.url, json={"foo": "bar"})
+    assert response.status_code == 400
+
+
+def test_status_webhook_url_is_registered():
+    # GIVEN job arguments with another webhook URL
+    job_args = JobArguments(face=True, status_webhook_url="http://other:1234/")
+
+    # WHEN the receiver's URL is registered
+    job_args = _with_status_webhook_url(job_args, "http://receiver:8000/")
+
+    # THEN it replaces the other URL and keeps all other arguments
+    assert job_args.status_webhook_url == "http://receiver:8000/"
+    assert job_args.face is True
+
+
+def test_early_webhook_without_status_triggers_status_check(
+    job, backend, poller, receiver
+):
+    # GIVEN a webhook that only identifies a job that is not watched yet
+    httpx.post(f"{receiver.url}jobs/{job.output_id}")
+
+    # WHEN the job is watched
+    future = poller.watch(job)
+
+    # THEN its status is checked right away
+    assert future.result(timeout=5).state == JobState.finished
+    assert backend.n_status_requests == 1